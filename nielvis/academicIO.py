@@ -1,33 +1,105 @@
 import os
-import logging
-
+import math
 import time
-import pyvisa
+import logging
+import array
+import queue
 import threading
-from nifpga import Session
+from collections import namedtuple
 from .enums import *
+from .session import open_session, release_session, read_raw_fifo, fixed_point_format, supports_raw_reads
+from .tracing import trace_api, tracer
+from .polling import wait_until, PollTimeoutError
+
+def _float64_view(buffer, number_of_values):
+    """
+    Returns a flat float64 memoryview of the buffer, which must hold at least
+    number_of_values values.
+    """
+    view = memoryview(buffer)
+    assert not view.readonly and view.format == 'd' and view.c_contiguous, 'The buffer must be a writable, C-contiguous buffer of float64 values.'
+    view = view.cast('B').cast('d')
+    assert len(view) >= number_of_values, 'The buffer must hold at least %d values.' % number_of_values
+    return view
+
+
+def _describe_channel(channel):
+    """
+    Returns the bank, channel, and mode of an entry of the channel list of
+    AnalogInput.
+    """
+    differential = channel['channel'] >= 8
+    return {'bank': Bank(channel['bank']),
+            'channel': AIChannel(channel['channel'] - 8 if differential else channel['channel']),
+            'mode': AIMode(differential)}
+
 
 class ELVISIII(object):
-    """ Register NI ELVIS III bitfile. """
+    """
+    Register NI ELVIS III bitfile. All APIs opened on the same resource share
+    one FPGA session, which is closed when the last API is closed.
+    """
     ResourceName = "RIO0"
 
     def __init__(self):
         path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bitfile/ELVIS III v2.1 FPGA.lvbitx')
-        self.session = Session(path, ELVISIII.ResourceName)
+        self.session = open_session(path, ELVISIII.ResourceName)
 
     def __enter__(self):
         return self
 
+    @trace_api
     def close(self):
-        self.session.close(True)
+        if self.session is not None:
+            release_session(self.session)
+            self.session = None
 
     def __exit__(self, exception_type, exception_val, trace):
         self.close()
 
 
 class Analog(ELVISIII):
+    # the bounds, in elements, of the automatic depth of the host buffer of a
+    # DMA FIFO. The lower bound holds two chunks of the reads and writes.
+    minimum_dma_depth = 20000
+    maximum_dma_depth = 4000000
+
     def __init__(self):
         super(Analog, self).__init__()
+        self.dma_latency = 1.0
+        self.dma_depth_override = None
+
+    def configure_dma(self, latency=1.0, depth=None):
+        """
+        Configures the depth of the host buffers of the DMA FIFOs, which
+        takes effect when the next acquisition or generation starts. By
+        default, a buffer holds 1 second of data at the sample rate, within
+        minimum_dma_depth and maximum_dma_depth elements.
+
+        Args:
+            latency (number):
+                Specifies the time, in seconds, of data that a buffer holds,
+                that is, the longest time that your code may take between two
+                reads or writes. The default is 1.0.
+            depth (number):
+                Specifies the depth, in elements, of the buffers instead of
+                calculating it from the sample rate and latency. The default
+                is None.
+        """
+        assert latency > 0
+        assert depth is None or depth >= 10000, 'The depth of a DMA buffer must be at least 10,000 elements.'
+        self.dma_latency = latency
+        self.dma_depth_override = depth
+
+    def calculate_dma_depth(self, elements_per_second):
+        """
+        Calculate and return the depth, in elements, of the host buffer of a
+        DMA FIFO which transfers elements_per_second elements.
+        """
+        if self.dma_depth_override is not None:
+            return int(self.dma_depth_override)
+        depth = int(math.ceil(elements_per_second * self.dma_latency))
+        return max(self.minimum_dma_depth, min(self.maximum_dma_depth, depth))
 
     def calculate_sample_rate_to_ticks(self, sample_rate, minimum = 1000, maximum = 30000):
         """
@@ -54,12 +126,477 @@ class Analog(ELVISIII):
         return count, actual_sample_rate
 
 
+class AIStream(object):
+    """
+    Iterator over fixed-size blocks of a continuous analog input acquisition.
+    Create it with AnalogInput.stream(). The iteration ends when you call
+    stop() or stop_continuous_mode().
+    """
+    def __init__(self, analog_input, block_size, timeout, return_type):
+        """
+        Args:
+            analog_input (AnalogInput):
+                Specifies the analog input session in continuous mode.
+            block_size (number):
+                Specifies the number of samples per channel in each block.
+            timeout (number):
+                Specifies the period of time, in milliseconds, to wait for
+                each block. If you set timeout to -1, the stream waits
+                indefinitely.
+            return_type (string):
+                Specifies the type of the blocks. 'list' yields the lists
+                that read() returns. 'numpy' yields float64 NumPy arrays of
+                shape (channels, block_size). 'waveform' yields the
+                Waveforms of each bank, which Waveform.concatenate() joins.
+        """
+        assert return_type in ('list', 'numpy', 'waveform')
+        assert block_size > 0
+        self.analog_input = analog_input
+        self.block_size = block_size
+        self.timeout = timeout
+        self.return_type = return_type
+        self.is_stopped = False
+        self.free_blocks = []
+        # the bank, channel, and mode of each row of the NumPy blocks
+        self.channels = [_describe_channel(channel) for channel in analog_input.channel_list]
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        analog_input = self.analog_input
+        if self.is_stopped or not (analog_input.is_continuous[Bank.A.value] or analog_input.is_continuous[Bank.B.value]):
+            raise StopIteration
+        for bank in Bank:
+            if analog_input.is_continuous[bank.value] and analog_input.dma_full[bank.value].read():
+                raise OverflowError('The read buffer of bank %s has overflowed. Process the blocks faster, use larger blocks, or lower the sample rate.' % bank.value)
+        if self.return_type != 'numpy':
+            return analog_input.read(self.block_size, self.timeout, return_type=self.return_type)
+        if self.free_blocks:
+            block = self.free_blocks.pop()
+        else:
+            # NumPy is optional, so it is imported only when it is used
+            import numpy
+            block = numpy.empty((len(self.channels), self.block_size))
+        analog_input.read_into(block, self.block_size, self.timeout)
+        return block
+
+    def release(self, block):
+        """
+        Hand a NumPy block back to the stream, which fills it again instead of
+        allocating a new block. Do not use the block after you release it.
+        """
+        if self.return_type == 'numpy':
+            self.free_blocks.append(block)
+
+    def stop(self):
+        """ End the iteration. The acquisition keeps running. """
+        self.is_stopped = True
+
+
+class AIBackgroundReader(object):
+    """
+    Thread which drains the DMA FIFOs of a continuous analog input
+    acquisition into a host ring buffer, so that the FIFOs do not overflow
+    while the consumers are busy. Create it with
+    AnalogInput.start_background_reader().
+
+    The reader thread is the only writer of the ring buffer. It publishes the
+    number of drained samples after it copies each block, and the consumers
+    copy without a lock and retry when the writer overtook them.
+    """
+    def __init__(self, analog_input, sample_rate, seconds, block_size=None, near_overflow=0.75):
+        """
+        Args:
+            analog_input (AnalogInput):
+                Specifies the analog input session in continuous mode.
+            sample_rate (number):
+                Specifies the sample rate, in hertz, of the acquisition.
+            seconds (number):
+                Specifies the length, in seconds of data, of the ring buffer.
+            block_size (number):
+                Specifies the number of samples per channel to drain at a
+                time. The default is 10 ms of data.
+            near_overflow (number):
+                Specifies the fraction of the FIFO depth above which a
+                backlog counts as a near-overflow event. The default is 0.75.
+        """
+        # NumPy is optional, so it is imported only when it is used
+        import numpy
+        self.numpy = numpy
+        self.analog_input = analog_input
+        self.number_of_channels = len(analog_input.channel_list)
+        self.block_size = block_size or max(int(sample_rate * 0.01), 1)
+        self.capacity = max(int(sample_rate * seconds), self.block_size)
+        assert 0 < near_overflow <= 1
+        self.near_overflow = near_overflow
+        self.read_timeout = max(4000.0 * self.block_size / sample_rate, 100)
+        # the block being written is not readable, so the ring holds one
+        # block more than the capacity
+        self.ring_length = self.capacity + self.block_size
+        self.ring = numpy.zeros((self.number_of_channels, self.ring_length))
+        # the number of samples per channel drained since the start, which is
+        # also the cursor of the next sample
+        self.total = 0
+        self.peak_backlog = 0
+        self.near_overflow_events = 0
+        self.missed_samples = 0
+        self.error = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.__run, name='AIBackgroundReader')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __is_acquiring(self):
+        return self.analog_input.is_continuous[Bank.A.value] or self.analog_input.is_continuous[Bank.B.value]
+
+    def __check_backlog(self):
+        for bank in Bank:
+            bank = bank.value
+            dma = AnalogInput.dma[bank]
+            if not self.analog_input.is_continuous[bank] or dma is None:
+                continue
+            if self.analog_input.dma_full[bank].read():
+                raise OverflowError('The read buffer of bank %s has overflowed.' % bank)
+            backlog = dma.read(0, timeout_ms=0)[1]
+            self.peak_backlog = max(self.peak_backlog, backlog)
+            depth = AnalogInput.dma_depth[bank]
+            if depth and backlog >= depth * self.near_overflow:
+                self.near_overflow_events += 1
+
+    def __run(self):
+        block = self.numpy.empty((self.number_of_channels, self.block_size))
+        try:
+            while not self.stop_event.is_set() and self.__is_acquiring():
+                self.__check_backlog()
+                self.analog_input.read_into(block, self.block_size, self.read_timeout)
+                self.__write(block)
+        except Exception as error:
+            # stopping the acquisition under the reader ends the reader
+            if not self.stop_event.is_set() and self.__is_acquiring():
+                self.error = error
+
+    def __write(self, block):
+        start = self.total % self.ring_length
+        first = min(self.block_size, self.ring_length - start)
+        self.ring[:, start:start + first] = block[:, :first]
+        self.ring[:, :self.block_size - first] = block[:, first:]
+        self.total += self.block_size
+
+    def __copy(self, start, stop):
+        """
+        Returns a copy of the samples from the cursor start to the cursor
+        stop, or None when the writer overwrote them during the copy.
+        """
+        number_of_samples = stop - start
+        values = self.numpy.empty((self.number_of_channels, number_of_samples))
+        offset = start % self.ring_length
+        first = min(number_of_samples, self.ring_length - offset)
+        values[:, :first] = self.ring[:, offset:offset + first]
+        values[:, first:] = self.ring[:, :number_of_samples - first]
+        if self.total - self.capacity > start:
+            # the writer overwrote the oldest samples during the copy
+            return None
+        return values
+
+    def __raise_error(self):
+        if self.error is not None:
+            raise self.error
+
+    def latest(self, number_of_samples):
+        """
+        Returns the last samples drained, as a float64 NumPy array of shape
+        (channels, samples). Fewer samples are returned when fewer are
+        available.
+
+        Args:
+            number_of_samples (number):
+                Specifies the number of samples per channel to return. It
+                cannot exceed the length of the ring buffer.
+        """
+        assert 0 <= number_of_samples <= self.capacity
+        self.__raise_error()
+        while True:
+            total = self.total
+            values = self.__copy(total - min(number_of_samples, total), total)
+            if values is not None:
+                return values
+
+    def read_since(self, cursor):
+        """
+        Returns the samples drained since the cursor and the cursor of the
+        next sample. Start with cursor 0. Samples which the ring buffer no
+        longer holds are skipped and counted in missed_samples.
+
+        Args:
+            cursor (number):
+                Specifies the cursor returned by the previous call.
+
+        Returns:
+            values (ndarray):
+                Returns a float64 NumPy array of shape (channels, samples).
+            cursor (number):
+                Returns the cursor to pass to the next call.
+        """
+        self.__raise_error()
+        while True:
+            total = self.total
+            start = max(cursor, total - self.capacity)
+            values = self.__copy(start, total)
+            if values is not None:
+                self.missed_samples += start - cursor
+                return values, total
+
+    def statistics(self):
+        """
+        Returns a dict of the drained samples per channel, the peak FIFO
+        backlog in elements, the number of near-overflow events, and the
+        number of samples per channel which the consumers missed.
+        """
+        return {'drained_samples': self.total,
+                'peak_backlog': self.peak_backlog,
+                'near_overflow_events': self.near_overflow_events,
+                'missed_samples': self.missed_samples}
+
+    def stop(self):
+        """ Stop draining. The acquisition keeps running. """
+        self.stop_event.set()
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_val, trace):
+        self.stop()
+
+
+class AINSamplesTask(object):
+    """
+    An n samples acquisition which AnalogInput.prepare() configures once.
+    Each acquisition only triggers the banks and drains the DMA FIFOs, so
+    repeated identical captures skip the setup that read() performs.
+    """
+    def __init__(self, analog_input, acquire, number_of_samples, sample_rate, duration=None):
+        """
+        Args:
+            analog_input (AnalogInput):
+                Specifies the analog input session.
+            acquire (function):
+                Specifies the function, acquire(return_type, destination),
+                which performs one prepared acquisition.
+            number_of_samples (number):
+                Specifies the number of samples per channel of each
+                acquisition.
+            sample_rate (number):
+                Specifies the actual sampling frequency, in hertz, of each
+                channel.
+            duration (number):
+                Specifies the time, in seconds, that the slowest bank takes
+                to acquire number_of_samples samples. The default is
+                number_of_samples / sample_rate.
+        """
+        self.analog_input = analog_input
+        self.number_of_samples = number_of_samples
+        self.sample_rate = sample_rate
+        self.duration = number_of_samples / float(sample_rate) if duration is None else duration
+        self.__acquire = acquire
+
+    def acquire(self, return_type='list'):
+        """
+        Acquires number_of_samples samples of each channel.
+
+        Args:
+            return_type (string):
+                Specifies the type of the returned values. See
+                AnalogInput.read(). The default is 'list'.
+
+        Returns:
+            return_value (array):
+                Returns the values that read(number_of_samples, sample_rate)
+                returns.
+        """
+        assert return_type in ('list', 'numpy', 'raw', 'waveform')
+        return self.__acquire(return_type, None)
+
+    def acquire_into(self, buffer):
+        """
+        Acquires number_of_samples samples of each channel into a buffer
+        which you allocate. See AnalogInput.read_into().
+
+        Returns:
+            number_of_samples (number):
+                Returns the number of samples written per channel.
+        """
+        view = _float64_view(buffer, len(self.analog_input.channel_list) * self.number_of_samples)
+        return self.__acquire('numpy', view)
+
+
+# a record of AIRecordPipeline. start_time is the time.monotonic() time and
+# wall_time the time.time() time of the first sample, and gap is the time, in
+# seconds, from the last sample of the previous record to the first sample.
+AIRecord = namedtuple('AIRecord', 'index values start_time wall_time gap')
+
+
+class AIRecordPipeline(object):
+    """
+    Back-to-back n samples records of a prepared acquisition. A thread
+    acquires the next record into a free buffer while your code processes
+    the current one, so the gap between records does not include your
+    processing. Create it with AnalogInput.acquire_records(). The values of
+    a record are valid until the next iteration, which hands its buffer back
+    to the thread.
+
+    The thread owns the AnalogInput session until the records end or you
+    call stop(). Reading from the session, or starting another acquisition
+    on it, in the meantime raises an AssertionError.
+    """
+    def __init__(self, task, number_of_records=None, buffers=2):
+        """
+        Args:
+            task (AINSamplesTask):
+                Specifies the prepared acquisition of each record.
+            number_of_records (number):
+                Specifies the number of records to acquire. If you set
+                number_of_records to None, records are acquired until you
+                call stop(). The default is None.
+            buffers (number):
+                Specifies the number of record buffers. With 2 buffers, the
+                next record is acquired while you process one; more buffers
+                absorb the processing times which are longer than a record.
+                The default is 2.
+        """
+        # NumPy is optional, so it is imported only when it is used
+        import numpy
+        assert number_of_records is None or number_of_records > 0
+        assert buffers >= 2
+        self.task = task
+        self.number_of_records = number_of_records
+        self.duration = task.duration
+        self.free_buffers = queue.Queue()
+        self.records = queue.Queue()
+        for index in range(buffers):
+            self.free_buffers.put(numpy.empty((len(task.analog_input.channel_list), task.number_of_samples)))
+        self.current = None
+        self.error = None
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self.__run, name='AIRecordPipeline')
+        self.thread.daemon = True
+        assert task.analog_input.pipeline_thread is None, 'Another AIRecordPipeline is acquiring with this analog input session.'
+        task.analog_input.pipeline_thread = self.thread
+        self.thread.start()
+
+    def __run(self):
+        index = 0
+        previous_end_time = None
+        try:
+            while not self.stop_event.is_set() and (self.number_of_records is None or index < self.number_of_records):
+                buffer = self.free_buffers.get()
+                if buffer is None:
+                    break
+                call_time = time.monotonic()
+                self.task.acquire_into(buffer)
+                end_time = time.monotonic()
+                wall_end_time = time.time()
+                # the drain completes when the last sample arrives
+                start_time = max(call_time, end_time - self.duration)
+                gap = None if previous_end_time is None else start_time - previous_end_time
+                self.records.put(AIRecord(index, buffer, start_time, wall_end_time - (end_time - start_time), gap))
+                previous_end_time = end_time
+                index += 1
+        except Exception as error:
+            self.error = error
+        finally:
+            self.task.analog_input.pipeline_thread = None
+            self.records.put(None)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.current is not None:
+            self.free_buffers.put(self.current.values)
+            self.current = None
+        record = self.records.get()
+        if record is None:
+            # keep the end of the records for the next calls
+            self.records.put(None)
+            if self.error is not None:
+                raise self.error
+            raise StopIteration
+        self.current = record
+        return record
+
+    def stop(self):
+        """
+        Stops acquiring records after the record being acquired, and waits
+        for the thread.
+        """
+        self.stop_event.set()
+        self.free_buffers.put(None)
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_val, trace):
+        self.stop()
+
+
+class _BankWorker(object):
+    """
+    Thread which runs the calls of a two-bank read on the second bank, while
+    the calling thread runs the first bank. An AnalogInput session keeps one
+    worker until it is closed, so a read does not start and join a thread.
+    """
+    def __init__(self):
+        # the reads of the session use the worker one at a time
+        self.lock = threading.Lock()
+        self.requests = queue.Queue()
+        self.outcomes = queue.Queue()
+        self.thread = threading.Thread(target=self.__run, name='AIBankWorker')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __run(self):
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            function, bank, api = request
+            # count the accesses of the worker under the calling API
+            tracer.local.api = api
+            try:
+                self.outcomes.put((function(bank), None))
+            except BaseException as error:
+                self.outcomes.put((None, error))
+            finally:
+                tracer.local.api = None
+
+    def submit(self, function, bank, api):
+        """ Start function(bank) on the worker. """
+        self.requests.put((function, bank, api))
+
+    def outcome(self):
+        """
+        Wait for the next submitted call, and return its result and the
+        exception it raised, if any.
+        """
+        return self.outcomes.get()
+
+    def close(self):
+        """ End the thread after the calls which were submitted. """
+        self.requests.put(None)
+        self.thread.join()
+
+
 class AnalogInput(Analog):
     number_of_n_sample = { 'A': 0, 'B': 0 }
     dma = { 'A': None, 'B': None }
+    dma_depth = { 'A': None, 'B': None }
     is_continuous_started = { 'A': False, 'B': False }
 
     """ NI ELVIS III Analog Input (AI) API. """
+    @trace_api
     def __init__(self, *configuration):
         """
         Opens a session to one analog input channel or multiple analog input
@@ -100,6 +637,19 @@ class AnalogInput(Analog):
         self.dma_full = { 'A': None, 'B': None }
         self.sync = { 'A': None, 'B': None }
         self.is_continuous = { 'A': False, 'B': False }
+        # the time.monotonic() and time.time() times at which each bank was
+        # triggered, the samples read since, and the sample period of the
+        # continuous acquisition, which time the Waveforms
+        self.__trigger_times = { 'A': None, 'B': None }
+        self.__samples_read = { 'A': 0, 'B': 0 }
+        self.__scan_period = None
+        # the thread of the AIRecordPipeline which acquires with this
+        # session, if any; no other thread may acquire until it ends
+        self.pipeline_thread = None
+        # the _BankWorker which reads the second bank of two-bank reads,
+        # created on the first one
+        self.__bank_worker = None
+        self.__bank_worker_lock = threading.Lock()
         
         self.is_bank_A_n_sample_opened = False
         self.is_bank_B_n_sample_opened = False
@@ -108,17 +658,18 @@ class AnalogInput(Analog):
 
         def __set_registration_addresses(bank):
             # get registration addresses
-            self.cnfg[bank] = self.session.registers['AI.%s.CNFG' % bank]
-            self.ready[bank] = self.session.registers['AI.%s.VAL.RDY' % bank]
-            self.cnt[bank] = self.session.registers['AI.%s.CNT' % bank]
-            self.cntr[bank] = self.session.registers['AI.%s.CNTR' % bank]
-            self.stat[bank] = self.session.registers['AI.%s.STAT' % bank]
+            registers = self.session.register_map.ai(bank)
+            self.cnfg[bank] = registers.cnfg
+            self.ready[bank] = registers.ready
+            self.cnt[bank] = registers.cnt
+            self.cntr[bank] = registers.cntr
+            self.stat[bank] = registers.stat
 
-            self.dma_enabled[bank] = self.session.registers['AI.%s.DMA_ENA' % bank]
+            self.dma_enabled[bank] = registers.dma_enabled
 
             # continous
-            self.dma_full[bank] = self.session.registers['AI.%s.DMA_FULL' % bank]
-            self.sync[bank] = self.session.registers['%s.SYNC' % bank]
+            self.dma_full[bank] = registers.dma_full
+            self.sync[bank] = registers.sync
 
         configuration_list = { 'A': [], 'B': [] }
 
@@ -194,12 +745,12 @@ class AnalogInput(Analog):
                 if channel['mode']:
                     # differential mode
                     configuration['channel'] = channel['channel'] + 8
-                    configuration['value'] = self.session.registers['AI.DIFF_' + channel['bank'] + '_' + str(channel['channel']) + '.VAL']
+                    configuration['value'] = self.session.register_map.ai_channel(channel['bank'], channel['channel'], True)
                     configuration['cnfgval'] = channel['channel'] | channel['cnfgval']
                 else:
                     # single-ended mode
                     configuration['channel'] = channel['channel']
-                    configuration['value'] = self.session.registers['AI.' + channel['bank'] + '_' + str(channel['channel']) + '.VAL']
+                    configuration['value'] = self.session.register_map.ai_channel(channel['bank'], channel['channel'])
                     configuration['cnfgval'] = int(bin(channel['channel']), 2) | int('1000', 2) | channel['cnfgval']
                 self.channel_list.append(configuration)
         
@@ -207,7 +758,8 @@ class AnalogInput(Analog):
         __calculate_configuration_values(configuration_list[Bank.A.value])
         __calculate_configuration_values(configuration_list[Bank.B.value])
 
-    def read(self, *args):
+    @trace_api
+    def read(self, *args, return_type='list'):
         """
         Reads values from one or more analog input channels. Use the read()
         function to read a single point of data back from the channel. Use the
@@ -220,8 +772,11 @@ class AnalogInput(Analog):
             If you want to read multiple points (n samples) of data at one
             time, arguments should contain:
                 number_of_samples (number): 
-                    Specifies the number of samples to read. Valid values are
-                    between 0 and 10,000. 
+                    Specifies the number of samples to read. Valid values must
+                    be greater than or equal to 0. The samples are drained
+                    from the FPGA in chunks while the acquisition runs; to
+                    read more samples than fit in memory, use read_into() or
+                    read_to_file().
                 sample_rate (number):
                     Specifies the sampling frequency, in hertz, of the input
                     signal.
@@ -235,23 +790,343 @@ class AnalogInput(Analog):
                     the acquisition to complete. If you set Timeout to -1,
                     this function waits indefinitely. An error occurs if
                     acquisition time is longer than timeout. 
+            return_type (string):
+                Specifies the type of the values returned by the multiple
+                points reads. 'list' returns the lists described below.
+                'numpy' returns a float64 NumPy array whose shape is
+                (channels, samples) and whose rows hold the channels of bank
+                A, then the channels of bank B, each bank in the order you
+                open its channels. 'raw' returns the same array of the
+                integer codes of the FIFO, without scaling them to volts;
+                convert the codes with to_volts(). 'waveform' returns a
+                list of one Waveform per bank, which holds the time of the
+                first sample, the sample period from the tick count of the
+                FPGA, and the channels of the rows. The default is 'list'.
 
         Returns:
             return_value (array):
                 Returns the value that this function reads from the analog
                 input channel that you select.
         """
+        assert return_type in ('list', 'numpy', 'raw', 'waveform')
+        self.__assert_not_pipelined()
         args_len = len(args)
         if args_len == 0:
             return self.__read_single_point()
         elif args_len == 2:
             if self.is_continuous['A'] or self.is_continuous['B']:
-                return self.__read_multiple_points_continuous(args[0], args[1])
+                return self.__read_multiple_points_continuous(args[0], args[1], return_type)
             else:
-                return self.__read_multiple_points_n_samples(args[0], args[1])
+                return self.__read_multiple_points_n_samples(args[0], args[1], return_type)
         else:
             raise TypeError('read() takes either 0 (single point) or 2 (multiple points) arguments, but given %d' % args_len)
 
+    @trace_api
+    def read_into(self, buffer, *args):
+        """
+        Reads multiple points of data from the analog input channels into a
+        buffer which you allocate, without allocating the values. Use the
+        read_into(buffer, number_of_samples, sample_rate) function for n
+        samples, and the read_into(buffer, number_of_samples, timeout)
+        function after start_continuous_mode().
+
+        Args:
+            buffer (buffer):
+                Specifies the writable, C-contiguous float64 buffer to fill,
+                for example, a NumPy array, an array('d'), or a memoryview of
+                one. The values are stored channel by channel, the channels
+                of bank A first, then the channels of bank B, each bank in
+                the order you open its channels: the values of the first
+                channel fill the first number_of_samples elements, and so
+                on. A NumPy array of shape (channels, number_of_samples)
+                therefore holds one channel per row, in the rows of read().
+            number_of_samples (number):
+                Specifies the number of samples to read per channel.
+            sample_rate (number):
+                Specifies the sampling frequency, in hertz, of the n samples
+                read. See read().
+            timeout (number):
+                Specifies the period of time, in milliseconds, to wait for the
+                continuous acquisition. See read().
+
+        Returns:
+            number_of_samples (number):
+                Returns the number of samples written per channel.
+        """
+        if len(args) != 2:
+            raise TypeError('read_into() takes a buffer and 2 (multiple points) arguments, but given %d' % len(args))
+        self.__assert_not_pipelined()
+        number_of_samples = args[0]
+        view = _float64_view(buffer, len(self.channel_list) * number_of_samples)
+        if self.is_continuous['A'] or self.is_continuous['B']:
+            return self.__read_multiple_points_continuous(number_of_samples, args[1], destination=view)
+        else:
+            return self.__read_multiple_points_n_samples(number_of_samples, args[1], destination=view)
+
+    @trace_api
+    def read_to_file(self, filename, *args):
+        """
+        Reads multiple points of data from the analog input channels into a
+        memory-mapped NumPy .npy file. The samples are written to the file in
+        chunks while the acquisition runs, so the memory used does not grow
+        with number_of_samples. Use the read_to_file(filename,
+        number_of_samples, sample_rate) function for n samples, and the
+        read_to_file(filename, number_of_samples, timeout) function after
+        start_continuous_mode(). This function needs NumPy.
+
+        Args:
+            filename (string):
+                Specifies the path of the file to create. Load the file with
+                numpy.load(filename, mmap_mode='r'); it holds a float64
+                array of shape (channels, number_of_samples) whose rows are
+                in the order of the rows of read().
+            number_of_samples (number):
+                Specifies the number of samples to read per channel.
+            sample_rate (number):
+                Specifies the sampling frequency, in hertz, of the n samples
+                read. See read().
+            timeout (number):
+                Specifies the period of time, in milliseconds, to wait for the
+                continuous acquisition. See read().
+
+        Returns:
+            number_of_samples (number):
+                Returns the number of samples written per channel.
+        """
+        if len(args) != 2:
+            raise TypeError('read_to_file() takes a filename and 2 (multiple points) arguments, but given %d' % len(args))
+        from numpy.lib.format import open_memmap
+        values = open_memmap(filename, mode='w+', dtype='float64', shape=(len(self.channel_list), args[0]))
+        try:
+            return self.read_into(values, *args)
+        finally:
+            values.flush()
+            del values
+
+    @trace_api
+    def prepare(self, number_of_samples, sample_rate):
+        """
+        Prepares an n samples acquisition to repeat many times. This function
+        calculates the configuration and the sample rate once, and configures
+        the banks at the first acquisition. Each acquisition of the returned
+        task only triggers the banks and drains the DMA FIFOs, while a
+        read(number_of_samples, sample_rate) configures the banks, verifies
+        them, and flushes the FIFOs every time. The configuration is written
+        again when another read changes it.
+
+            task = AI.prepare(1000, 10000)
+            for unit in units:
+                values = task.acquire()
+
+        Args:
+            number_of_samples (number):
+                Specifies the number of samples to read per channel.
+            sample_rate (number):
+                Specifies the sampling frequency, in hertz, of the input
+                signal. See read().
+
+        Returns:
+            task (AINSamplesTask):
+                Returns the prepared acquisition.
+        """
+        number_of_channels = len(self.channel_list)
+        if number_of_channels == 1:
+            assert 1 <= sample_rate <= 1000000, 'If you select only 1 channel, then the valid range for sample rate is between 1 Hz and 1 MHz.'
+        else:
+            assert 1 <= sample_rate <= 500000, 'If you select multiple channels, then the valid range for sample rate is between 1 Hz and 500 kHz.'
+        assert 0 <= number_of_samples
+        assert not (self.is_continuous['A'] or self.is_continuous['B']), 'Cannot prepare an n samples acquisition while the continuous acquisition runs.'
+
+        configuration = self.__calculate_multiple_points_cnfg_and_number_of_enabled_channels()
+        count, actual_sample_rate = self.calculate_sample_rate_to_ticks(sample_rate * number_of_channels)
+        first_row = {'A': 0, 'B': configuration[Bank.A.value]['numberOfChannels']}
+        banks = [bank.value for bank in Bank if configuration[bank.value]['numberOfChannels'] > 0]
+
+        for bank in banks:
+            self.__register_and_configure_dma(bank)
+            if not self.is_nsample_opened[bank]:
+                self.is_nsample_opened[bank] = True
+                AnalogInput.number_of_n_sample[bank] += 1
+
+        def __acquire(return_type, destination):
+            self.__assert_not_pipelined()
+            value_type = 'numpy' if return_type == 'waveform' else return_type
+
+            def __acquire_from_specific_bank(bank):
+                return self.__acquire_prepared_bank(bank, configuration[bank]['cnfg'], configuration[bank]['numberOfChannels'], number_of_samples, count, value_type,
+                                                    None if destination is None else (destination, first_row[bank]))
+
+            return_value = self.__for_each_bank(__acquire_from_specific_bank, banks)
+            if destination is not None:
+                return number_of_samples
+            if return_type == 'waveform':
+                return self.__waveforms(banks, return_value, self.__n_samples_periods(configuration, count), self.__trigger_times)
+            return self.__combine_banks(return_value, return_type)
+
+        # each bank scans its own channels, so the bank of the most channels
+        # takes the longest
+        duration = number_of_samples * max(self.__n_samples_periods(configuration, count).values())
+        return AINSamplesTask(self, __acquire, number_of_samples, actual_sample_rate / number_of_channels, duration)
+
+    def acquire_records(self, number_of_samples, sample_rate, number_of_records=None, buffers=2):
+        """
+        Acquires back-to-back n samples records in a thread, so that your code
+        processes one record while the next is acquired, for example,
+
+            with AI.acquire_records(1000, 10000, 100) as records:
+                for record in records:
+                    process(record.values)
+
+        The records need NumPy.
+
+        Args:
+            number_of_samples (number):
+                Specifies the number of samples per channel in each record.
+            sample_rate (number):
+                Specifies the sampling frequency, in hertz, of the input
+                signal. See read().
+            number_of_records (number):
+                Specifies the number of records. If you set
+                number_of_records to None, records are acquired until you
+                call stop(). The default is None.
+            buffers (number):
+                Specifies the number of record buffers. The default is 2.
+
+        Returns:
+            records (AIRecordPipeline):
+                Returns the iterator over the records. Each AIRecord holds
+                the index, the float64 values of shape (channels, samples),
+                the monotonic and wall clock times of the first sample, and
+                the gap, in seconds, after the previous record.
+        """
+        return AIRecordPipeline(self.prepare(number_of_samples, sample_rate), number_of_records, buffers)
+
+    def __assert_not_pipelined(self):
+        """
+        Checks that no AIRecordPipeline acquires with this session, except
+        on the thread of the pipeline itself.
+        """
+        thread = self.pipeline_thread
+        assert thread is None or thread is threading.current_thread(), 'An AIRecordPipeline is acquiring with this analog input session. Call the stop() function of the pipeline before you read from the session.'
+
+    def raw_format(self):
+        """
+        Returns the fixed-point type of the codes that read() returns when
+        return_type is 'raw'. Store it with the codes to convert them later,
+        with raw_format().to_volts(codes), without opening a session.
+
+        Returns:
+            fixed_point_format (FixedPointFormat):
+                Returns the signedness, word length, and integer word length
+                of the codes.
+
+        Raises:
+            TypeError:
+                The DMA FIFOs of the bitfile do not transfer fixed-point
+                elements.
+        """
+        bank = self.channel_list[0]['bank']
+        self.__register_and_configure_dma(bank)
+        return fixed_point_format(AnalogInput.dma[bank])
+
+    def to_volts(self, codes):
+        """
+        Converts the codes that read() returns when return_type is 'raw' into
+        a float64 NumPy array of volts, with one vectorized multiply-add.
+
+        Args:
+            codes (array):
+                Specifies the integer codes to convert.
+
+        Returns:
+            values (array):
+                Returns the values, in volts, in an array of the shape of
+                codes.
+        """
+        return self.raw_format().to_volts(codes)
+
+    def dma_status(self):
+        """
+        Returns the depth and the fill level of the host buffer of the DMA
+        FIFO of each bank which has acquired, to tune configure_dma() against
+        overflow.
+
+        Returns:
+            status (dict):
+                Returns, per bank name, a dictionary of 'depth', the depth in
+                elements, 'elements', the number of elements waiting to be
+                read, and 'fill_level', the fraction of the buffer in use.
+        """
+        status = {}
+        for bank in Bank:
+            bank = bank.value
+            depth = AnalogInput.dma_depth[bank]
+            if AnalogInput.dma[bank] is None or not depth:
+                continue
+            elements = AnalogInput.dma[bank].read(0, timeout_ms=0)[1]
+            status[bank] = {'depth': depth, 'elements': elements, 'fill_level': float(elements) / depth}
+        return status
+
+    def stream(self, block_size, timeout=-1, return_type='list'):
+        """
+        Returns an iterator over fixed-size blocks of the continuous
+        acquisition. Call start_continuous_mode() first. For example,
+
+            stream = AI.stream(1000, return_type='numpy')
+            for block in stream:
+                process(block)
+                stream.release(block)
+
+        Args:
+            block_size (number):
+                Specifies the number of samples per channel in each block.
+            timeout (number):
+                Specifies the period of time, in milliseconds, to wait for
+                each block. If you set timeout to -1, the stream waits
+                indefinitely. The default is -1.
+            return_type (string):
+                Specifies the type of the blocks. 'list' yields the lists
+                that read() returns. 'numpy' yields float64 NumPy arrays of
+                shape (channels, block_size); the channels attribute of the
+                stream describes each row. 'waveform' yields the Waveforms
+                of each bank. The default is 'list'.
+
+        Returns:
+            stream (AIStream):
+                Returns the iterator. It raises OverflowError when the read
+                buffer of a bank has overflowed.
+        """
+        assert self.is_continuous[Bank.A.value] or self.is_continuous[Bank.B.value], 'The continuous acquisition has not started. You must call the start_continuous_mode() function before calling the stream() function.'
+        return AIStream(self, block_size, timeout, return_type)
+
+    def start_background_reader(self, seconds, block_size=None, near_overflow=0.75):
+        """
+        Starts a thread which drains the continuous acquisition into a ring
+        buffer in host memory, so that the read buffer on the FPGA does not
+        overflow while your code is busy. Call start_continuous_mode() first,
+        and stop the reader before stop_continuous_mode(). The reader needs
+        NumPy.
+
+        Args:
+            seconds (number):
+                Specifies the length, in seconds of data, of the ring buffer.
+            block_size (number):
+                Specifies the number of samples per channel to drain at a
+                time. The default is 10 ms of data.
+            near_overflow (number):
+                Specifies the fraction of the read buffer above which a
+                backlog counts as a near-overflow event. The default is 0.75.
+
+        Returns:
+            reader (AIBackgroundReader):
+                Returns the reader. Use latest(), read_since(), and
+                statistics() to get the data and the counters.
+        """
+        assert self.is_continuous[Bank.A.value] or self.is_continuous[Bank.B.value], 'The continuous acquisition has not started. You must call the start_continuous_mode() function before calling the start_background_reader() function.'
+        assert seconds > 0
+        return AIBackgroundReader(self, self.__sample_rate, seconds, block_size, near_overflow)
+
+    @trace_api
     def start_continuous_mode(self, sample_rate):
         """
         Configure the sample rate and start the acquisition. 
@@ -265,6 +1140,7 @@ class AnalogInput(Analog):
                 If you select multiple channels, the valid range for sample
                 rate is between 1 Hz and 250 kHz. 
         """
+        self.__assert_not_pipelined()
         number_of_channels = len(self.channel_list)
 
         if number_of_channels == 1:
@@ -286,26 +1162,39 @@ class AnalogInput(Analog):
         def __start_ai_continuous(configuration):
             self.number_of_channels = max(configuration[Bank.A.value]['numberOfChannels'], configuration[Bank.B.value]['numberOfChannels'])
             count, actual_sample_rate = self.calculate_sample_rate_to_ticks(sample_rate * self.number_of_channels)
+            # a scan of number_of_channels elements takes count ticks of the
+            # 40 MHz clock per element
+            self.__scan_period = count * self.number_of_channels / 40000000.0
 
             def __continuous_config_bank(bank):
+                self.__register_and_configure_dma(bank, actual_sample_rate)
+                self.session.applied_configurations.pop(('AI', bank), None)
                 self.cnt[bank].write(0)
                 self.cnfg[bank].write(configuration[bank]['cnfg'])
                 self.cntr[bank].write(count)
                 self.dma_enabled[bank].write(True)
 
-                while not(self.cnt[bank].read() == 0 and self.cnfg[bank].read() == configuration[bank]['cnfg'] and self.cntr[bank].read() == count and self.dma_enabled[bank].read() == True):
-                    pass
+                self.session.verify(lambda: self.cnt[bank].read() == 0 and self.cnfg[bank].read() == configuration[bank]['cnfg'] and self.cntr[bank].read() == count and self.dma_enabled[bank].read() == True,
+                                    'AI.%s configuration' % bank, (tuple(configuration[bank]['cnfg']), count))
 
             def __reset_buffer(bank_to_reset):
                 AnalogInput.dma[bank_to_reset].start()
                 AnalogInput.dma[bank_to_reset].stop()
 
             def __check_register_values_and_enable_continuous(bank):
-                while not(self.dma_enabled[bank].read() == True and self.cnt[bank].read() == self.number_of_channels):
-                    pass
+                self.session.verify(lambda: self.dma_enabled[bank].read() == True and self.cnt[bank].read() == self.number_of_channels,
+                                    'AI.%s.CNT' % bank, self.number_of_channels)
 
                 AnalogInput.is_continuous_started[bank] = True
 
+            def __record_start_time(banks):
+                # taken right before the register write which starts the
+                # scans, so the configuration time does not delay t0
+                start_time = (time.monotonic(), time.time())
+                for bank in banks:
+                    self.__trigger_times[bank] = start_time
+                    self.__samples_read[bank] = 0
+
             if self.is_continuous[Bank.A.value] and self.is_continuous[Bank.B.value]:
                 __continuous_config_bank(Bank.A.value)
                 __continuous_config_bank(Bank.B.value)
@@ -325,12 +1214,14 @@ class AnalogInput(Analog):
                 __check_register_values_and_enable_continuous(Bank.A.value)
                 __check_register_values_and_enable_continuous(Bank.B.value)
 
+                __record_start_time([Bank.A.value, Bank.B.value])
                 self.session.registers['SYNC'].write(True)
             else:
                 bank = Bank.A.value if self.is_continuous[Bank.A.value] else Bank.B.value
                 __continuous_config_bank(bank)
                 __reset_buffer(bank)
                 self.dma_enabled[bank].write(True)
+                __record_start_time([bank])
                 self.cnt[bank].write(self.number_of_channels)
 
                 __check_register_values_and_enable_continuous(bank)
@@ -349,9 +1240,9 @@ class AnalogInput(Analog):
         self.cnt[bank].write(0)
         self.dma_enabled[bank].write(False)
 
-        while not(self.stat[bank].read() == 0):
-            pass
+        wait_until(lambda: self.stat[bank].read() == 0, 'AI.%s.STAT' % bank)
 
+    @trace_api
     def stop_continuous_mode(self):
         """
         Stops signal acquisition on the FPGA target.
@@ -377,50 +1268,39 @@ class AnalogInput(Analog):
                 Returns the value, in volts, that this function reads from the
                 analog input channel that you select.
         """
-        current_cnfg = { 'A': None, 'B': None }
-        is_opened  = { 'A': None, 'B': None }
-        a_current_cnfg = ""
-        b_current_cnfg = ""
-        a_opened = False
-        b_opened = False
-
-        def __initialize_bank_configuration(bank):
-            if self.is_onesample_opened[bank]:
-                # congifure the AI channels to read
-                self.cnfg[bank].write([8,9,10,11,12,13,14,15,0,1,2,3])
-                # regsiter the number of valid channels
-                self.cnt[bank].write(12)
-                # register the analog sample rate
-                # 1000 = 40 MHz FPGA Clock Frequency / 40 KHz (desired rate)
-                # thus 1000 indicates a sample rate of 40 KHz here
-                self.cntr[bank].write(1000)
-
-        def __get_cnfgval(bank, cnfgval):
-            current_cnfg = self.cnfg[bank].read()
-            current_cnfg[channel['channel']] = cnfgval
-            return current_cnfg
-
-        def __write_to_cnfg_register(bank, cnfg):
-            self.cnfg[bank].write(cnfg)
-            while not(cnfg == self.cnfg[bank].read() and self.ready[bank].read()):
-                pass
-
-            # after the configuration is modified, wait 500 us before applying
-            # the AI registers. 12*1000/40 M = 300 us < 500 us
-            time.sleep(0.5)
+        # 12 elements are scanned at 1000 ticks, which is 40 KHz with the
+        # 40 MHz FPGA clock
+        scan_length = 12
+        scan_counter = 1000
 
+        configurations = {}
         for bank in Bank:
-            __initialize_bank_configuration(bank.value)
-
-        # set the current configuration for all channels within channel_list
+            if self.is_onesample_opened[bank.value]:
+                configurations[bank.value] = [8, 9, 10, 11, 12, 13, 14, 15, 0, 1, 2, 3]
+        # set the configuration of all channels within channel_list
         for channel in self.channel_list:
-            bank = channel['bank']
-            current_cnfg[bank] = __get_cnfgval(bank, channel['cnfgval'])
-            is_opened[bank] = True
-
-        for bank_name in is_opened:
-            if is_opened[bank_name]:
-                __write_to_cnfg_register(bank_name, current_cnfg[bank_name])
+            configurations[channel['bank']][channel['channel']] = channel['cnfgval']
+
+        is_configured = False
+        for bank, cnfg in configurations.items():
+            applied_configuration = (tuple(cnfg), scan_length, scan_counter)
+            if self.session.applied_configurations.get(('AI', bank)) == applied_configuration:
+                continue
+            with self.session.transaction() as transaction:
+                transaction.write(self.cnfg[bank], cnfg)
+                transaction.write(self.cnt[bank], scan_length)
+                transaction.write(self.cntr[bank], scan_counter)
+            self.session.verify(lambda: cnfg == self.cnfg[bank].read(), 'AI.%s.CNFG' % bank, tuple(cnfg))
+            # the ADC status is waited for whatever the verification policy
+            wait_until(lambda: self.ready[bank].read(), 'AI.%s.VAL.RDY' % bank)
+            self.session.applied_configurations[('AI', bank)] = applied_configuration
+            is_configured = True
+
+        if is_configured:
+            # after the configuration is modified, wait for one scan of all
+            # elements plus a margin before reading the AI registers:
+            # 12*1000/40 M = 300 us < 500 us
+            time.sleep(scan_length * scan_counter / 40000000.0 + 0.0002)
 
         # append all the read back values and return the array
         return_value = []
@@ -442,20 +1322,28 @@ class AnalogInput(Analog):
 
         return {'A': bank_A, 'B': bank_B}
 
-    def __register_and_configure_dma(self, bank):
+    def __register_and_configure_dma(self, bank, elements_per_second=None):
         if AnalogInput.dma[bank] is None:
             AnalogInput.dma[bank] = self.session.fifos['AI.%s.DMA' % bank]
-            AnalogInput.dma[bank].configure(self.__max_samples * 100)
+            AnalogInput.dma_depth[bank] = None
+        if elements_per_second is None:
+            return
+        depth = self.calculate_dma_depth(elements_per_second)
+        if depth != AnalogInput.dma_depth[bank]:
+            # the FIFO must be stopped to change its depth
+            AnalogInput.dma[bank].stop()
+            actual_depth = AnalogInput.dma[bank].configure(depth)
+            AnalogInput.dma_depth[bank] = depth if actual_depth is None else actual_depth
 
-    def __read_multiple_points_n_samples(self, number_of_samples, sample_rate):
+    def __read_multiple_points_n_samples(self, number_of_samples, sample_rate, return_type='list', destination=None):
         """
         Reads values from AI channels in AI channel list and popluates the
         output array (values) with the result. (n samples)
 
         Args:
             number_of_samples (number): 
-                Specifies the number of samples to read. Valid values are
-                between 0 and 10,000. 
+                Specifies the number of samples to read. Valid values must be
+                greater than or equal to 0. 
             sample_rate (number):
                 Specifies the sampling frequency, in hertz, of the input
                 signal. 
@@ -463,35 +1351,48 @@ class AnalogInput(Analog):
                 rate is between 1 Hz and 1 MHz. 
                 If you select multiple channels, the valid range for sample
                 rate is between 1 Hz and 500 KHz. 
+            return_type (string):
+                Specifies whether to return lists or a NumPy array.
+            destination (memoryview):
+                Specifies the flat float64 view to fill instead of returning
+                the values.
         Returns:
             return_value (array):
                 Returns the values, in volts, that this function reads from
                 the analog input channel that you select. The structure of the
                 returned values is [ [bank_A_values], [bank_B_values] ].
+                Returns the number of samples per channel when destination is
+                specified.
         """
         number_of_channels = len(self.channel_list)
         if number_of_channels == 1:
             assert 1 <= sample_rate <= 1000000, 'If you select only 1 channel, then the valid range for sample rate is between 1 Hz and 1 MHz.'
         else:
             assert 1 <= sample_rate <= 500000, 'If you select multiple channels, then the valid range for sample rate is between 1 Hz and 500 kHz.'
-        assert 0 <= number_of_samples <= self.__max_samples
+        assert 0 <= number_of_samples
 
         configuration = self.__calculate_multiple_points_cnfg_and_number_of_enabled_channels()
 
         count, actual_sample_rate = self.calculate_sample_rate_to_ticks(sample_rate * number_of_channels)
 
-        return_value = []
+        first_row = {'A': 0, 'B': configuration[Bank.A.value]['numberOfChannels']}
 
-        def __read_values_if_has_enabled_channels(bank):
-            if configuration[bank]['numberOfChannels'] > 0:
-                return_value.append(self.__read_multiple_points_n_samples_from_specific_bank(bank, configuration[bank]['cnfg'], configuration[bank]['numberOfChannels'], number_of_samples, count))
+        value_type = 'numpy' if return_type == 'waveform' else return_type
 
-        __read_values_if_has_enabled_channels(Bank.A.value)
-        __read_values_if_has_enabled_channels(Bank.B.value)
+        def __read_values(bank):
+            return self.__read_multiple_points_n_samples_from_specific_bank(bank, configuration[bank]['cnfg'], configuration[bank]['numberOfChannels'], number_of_samples, count, value_type,
+                                                                            None if destination is None else (destination, first_row[bank]))
 
-        return return_value
+        banks = [bank.value for bank in Bank if configuration[bank.value]['numberOfChannels'] > 0]
+        return_value = self.__for_each_bank(__read_values, banks)
+
+        if destination is not None:
+            return number_of_samples
+        if return_type == 'waveform':
+            return self.__waveforms(banks, return_value, self.__n_samples_periods(configuration, count), self.__trigger_times)
+        return self.__combine_banks(return_value, return_type)
 
-    def __read_multiple_points_n_samples_from_specific_bank(self, bank, configuration, number_of_channels, number_of_samples, count):
+    def __read_multiple_points_n_samples_from_specific_bank(self, bank, configuration, number_of_channels, number_of_samples, count, return_type='list', destination=None):
         """
         Reads values from analog channels specified in the configuration using
         the DMA. (n samples)
@@ -504,12 +1405,16 @@ class AnalogInput(Analog):
             number_of_channels (number):
                 Specifies the number of channels to read.
             number_of_samples (number): 
-                Specifies the number of samples to read. Valid values are
-                between 0 and 10,000. 
+                Specifies the number of samples to read. Valid values must be
+                greater than or equal to 0. 
             count (number):
                 Specifies the actual count for AI.
-            max_samples (number):
-                Specifies the maximum number of samples for the AI n samples.
+            return_type (string):
+                Specifies whether to return lists or a NumPy array.
+            destination (tuple):
+                Specifies the flat float64 view to fill and the row of the
+                first channel of the bank in it, instead of returning the
+                values.
 
         Returns:
             return_value (array):
@@ -518,47 +1423,82 @@ class AnalogInput(Analog):
                 returned values is [ [first_channel_values],
                 [second_channel_values], ...].
         """
-        self.__register_and_configure_dma(bank)
+        # the bank acquires one element every count ticks of the 40 MHz clock
+        self.__register_and_configure_dma(bank, 40000000.0 / count)
 
         if not self.is_nsample_opened[bank]:
             self.is_nsample_opened[bank] = True
             AnalogInput.number_of_n_sample[bank] += 1
 
+        self.session.applied_configurations.pop(('AI', bank), None)
         self.cnt[bank].write(0)
         self.cnfg[bank].write(configuration)
         self.cntr[bank].write(count)
         self.dma_enabled[bank].write(True)
         ## make sure the following registers are set correcrly: cnt, cnfg, cntr, dma_enabled
-        while not(self.cnt[bank].read() == 0 and self.cnfg[bank].read() == configuration and self.cntr[bank].read() == count and self.dma_enabled[bank].read() == True):
-            pass
+        self.session.verify(lambda: self.cnt[bank].read() == 0 and self.cnfg[bank].read() == configuration and self.cntr[bank].read() == count and self.dma_enabled[bank].read() == True,
+                            'AI.%s configuration' % bank, (tuple(configuration), count))
 
         AnalogInput.dma[bank].start()
         AnalogInput.dma[bank].stop()
 
+        return self.__trigger_and_drain(bank, number_of_channels, number_of_samples, return_type, destination)
+
+    def __acquire_prepared_bank(self, bank, configuration, number_of_channels, number_of_samples, count, return_type, destination):
+        """
+        Performs one n samples acquisition of a task of prepare() on a bank.
+        The bank is configured only when its applied configuration differs
+        from the one of the task, and the DMA FIFO is flushed only when it
+        holds elements. See __read_multiple_points_n_samples_from_specific_bank().
+        """
+        applied_configuration = ('n samples', tuple(configuration), count)
+        if self.session.applied_configurations.get(('AI', bank)) != applied_configuration:
+            # the bank acquires one element every count ticks of the 40 MHz clock
+            self.__register_and_configure_dma(bank, 40000000.0 / count)
+            with self.session.transaction() as transaction:
+                transaction.write(self.cnt[bank], 0)
+                transaction.write(self.cnfg[bank], configuration)
+                transaction.write(self.cntr[bank], count)
+            self.session.verify(lambda: self.cnt[bank].read() == 0 and self.cnfg[bank].read() == configuration and self.cntr[bank].read() == count,
+                                'AI.%s configuration' % bank, (tuple(configuration), count))
+            self.session.applied_configurations[('AI', bank)] = applied_configuration
+
+        # the elements acquired after the previous drain are still in the FIFO
+        if AnalogInput.dma[bank].read(0, timeout_ms=0)[1] > 0:
+            AnalogInput.dma[bank].start()
+            AnalogInput.dma[bank].stop()
+
+        self.dma_enabled[bank].write(True)
+        return self.__trigger_and_drain(bank, number_of_channels, number_of_samples, return_type, destination)
+
+    def __trigger_and_drain(self, bank, number_of_channels, number_of_samples, return_type, destination):
+        """
+        Starts the n samples acquisition of a configured bank, reads its DMA
+        FIFO, and stops the bank.
+        """
+        self.__trigger_times[bank] = (time.monotonic(), time.time())
         self.cnt[bank].write(number_of_channels)
-        while not(self.cnt[bank].read() == number_of_channels):
-            pass
+        self.session.verify(lambda: self.cnt[bank].read() == number_of_channels, 'AI.%s.CNT' % bank, number_of_channels)
 
-        max_readback_samples = self.__max_samples
-        number_of_expected_samples = number_of_channels * number_of_samples
-        readvalue = []
-        while number_of_expected_samples > max_readback_samples:
-            readvalue.extend(AnalogInput.dma[bank].read(max_readback_samples, timeout_ms=-1)[0])
-            number_of_expected_samples = number_of_expected_samples - max_readback_samples
-        readvalue.extend(AnalogInput.dma[bank].read(number_of_expected_samples, timeout_ms=-1)[0])
+        if destination is None:
+            readvalue = self.__read_dma_values(bank, number_of_channels * number_of_samples, -1, return_type)
+        else:
+            self.__read_dma_into(bank, destination[0], destination[1], number_of_channels, number_of_channels, number_of_samples, -1)
 
+        # a long acquisition overflows when the host does not keep up
+        overflowed = self.dma_full[bank].read()
         self.dma_enabled[bank].write(False)
 
         self.cnt[bank].write(0)
-        while not(self.stat[bank].read() == 0):
-            pass
+        wait_until(lambda: self.stat[bank].read() == 0, 'AI.%s.STAT' % bank)
+        if overflowed:
+            raise OverflowError('The read buffer of bank %s overflowed during the acquisition, so samples are missing. Lower the sample rate, or read into a buffer with read_into() or read_to_file().' % bank)
 
-        result = []
-        for index in range(0, number_of_channels):
-            result.append(readvalue[index::number_of_channels])
-        return result
+        if destination is not None:
+            return number_of_samples
+        return self.__deinterleave(readvalue, number_of_channels, number_of_channels, return_type)
 
-    def __read_multiple_points_continuous(self, number_of_samples, timeout):
+    def __read_multiple_points_continuous(self, number_of_samples, timeout, return_type='list', destination=None):
         """
         Read values from AI channels in AI channel list and populate the
         output array (values) with the result. (continuous)
@@ -572,11 +1512,18 @@ class AnalogInput(Analog):
                 acquisition to complete. If you set Timeout to -1, this
                 function waits indefinitely. An error occurs if acquisition
                 time is longer than timeout. 
+            return_type (string):
+                Specifies whether to return lists or a NumPy array.
+            destination (memoryview):
+                Specifies the flat float64 view to fill instead of returning
+                the values.
         Returns:
             return_value (array):
                 Returns the values, in volts, that this function reads from
                 the analog input channel that you select. 
                 The value is returned in the following format: [ [bank_A_values], [bank_B_values] ].
+                Returns the number of samples per channel when destination is
+                specified.
         """
         assert 0 <= number_of_samples
         if timeout != -1:
@@ -586,48 +1533,216 @@ class AnalogInput(Analog):
             assert self.cnt[bank].read() == self.number_of_channels, 'The continuous acquisition has not started. You must call the start_continuous_mode() function before calling the read() function.'
             assert not self.dma_full[bank].read(), 'The read buffer has overflowed. This error occurs when you do not call the read() function after the acquisition starts for a while. You must call the read() function before the buffer overflows. This error may also occur when you set a high sample rate, for example, 1 MHz. In this case, you can modify the number of samples to a value between 3,000 and 50,000 to fit the buffer size.'
 
-            read_timeout = timeout
-            max_readback_samples = self.__max_samples
-            number_of_expected_samples = self.number_of_channels * number_of_samples
-            readvalue = []
-
-            while number_of_expected_samples > max_readback_samples:
-                time_to_start_reading = time.time()
-                readvalue.extend(AnalogInput.dma[bank].read(max_readback_samples, timeout_ms=read_timeout)[0])
-                time_taken_to_read_once = time.time() - time_to_start_reading
-                number_of_expected_samples = number_of_expected_samples - max_readback_samples
-
-                if read_timeout != -1:
-                    read_timeout = 0 if read_timeout - time_taken_to_read_once < 0 else read_timeout - time_taken_to_read_once
+            configuration = self.__calculate_multiple_points_cnfg_and_number_of_enabled_channels()
+            number_of_channels = configuration[bank]['numberOfChannels']
+            # the first sample of the block follows the samples read before
+            offset = self.__samples_read[bank] * self.__scan_period
+            start_times[bank] = (self.__trigger_times[bank][0] + offset, self.__trigger_times[bank][1] + offset)
+            if destination is not None:
+                first_row = 0 if bank == Bank.A.value else configuration[Bank.A.value]['numberOfChannels']
+                self.__read_dma_into(bank, destination, first_row, number_of_channels, self.number_of_channels, number_of_samples, timeout)
+                self.__samples_read[bank] += number_of_samples
+                return number_of_samples
+
+            readvalue = self.__read_dma_values(bank, self.number_of_channels * number_of_samples, timeout, value_type)
+            self.__samples_read[bank] += number_of_samples
+            return self.__deinterleave(readvalue, number_of_channels, self.number_of_channels, value_type)
+
+        start_times = {}
+        value_type = 'numpy' if return_type == 'waveform' else return_type
+        banks = [bank.value for bank in Bank if self.is_continuous[bank.value]]
+        return_value = self.__for_each_bank(__read_from_specific_bank, banks)
+
+        if destination is not None:
+            return number_of_samples
+        if return_type == 'waveform':
+            return self.__waveforms(banks, return_value, dict((bank, self.__scan_period) for bank in banks), start_times)
+        return self.__combine_banks(return_value, return_type)
+
+    def __for_each_bank(self, function, banks):
+        """
+        Calls function(bank) for each bank, running the first bank on the
+        calling thread and the others on the bank worker, and returns the
+        results in the order of banks. The DMA reads release the GIL, so the
+        FIFOs of both banks are drained at the same time.
+        """
+        if len(banks) < 2:
+            return [function(bank) for bank in banks]
+
+        with self.__bank_worker_lock:
+            if self.__bank_worker is None:
+                self.__bank_worker = _BankWorker()
+            worker = self.__bank_worker
+        with worker.lock:
+            for bank in banks[1:]:
+                worker.submit(function, bank, tracer.current_api())
+            try:
+                results = [function(banks[0])]
+            finally:
+                outcomes = [worker.outcome() for bank in banks[1:]]
+        for result, error in outcomes:
+            if error is not None:
+                raise error
+            results.append(result)
+        return results
+
+    def __read_dma(self, bank, number_of_elements, timeout, scan_length=1, raw=False):
+        """
+        Reads elements from the DMA FIFO of the bank in chunks of at most
+        10,000 elements and yields each chunk. Each chunk holds whole scans
+        of scan_length elements. When raw is True, the chunks hold the
+        unsigned words of the FIFO instead of values.
 
-            readvalue.extend(AnalogInput.dma[bank].read(number_of_expected_samples, timeout_ms=read_timeout)[0])
-
-            result = []
-            number_of_channels = self.__calculate_multiple_points_cnfg_and_number_of_enabled_channels()[bank]['numberOfChannels']
-            for index in range(0, number_of_channels):
-                result.append(readvalue[index::self.number_of_channels])
-            return result
+        Args:
+            bank (Bank):
+                Specifies the name of the bank to read.
+            number_of_elements (number):
+                Specifies the number of elements to read.
+            timeout (number):
+                Specifies the period of time, in milliseconds, to wait for all
+                chunks. If you set timeout to -1, this function waits
+                indefinitely.
+            scan_length (number):
+                Specifies the number of elements in one scan of the channels.
+        """
+        read_timeout = int(timeout)
+        max_readback_samples = max(self.__max_samples // scan_length, 1) * scan_length
+        while number_of_elements > 0:
+            number_of_elements_to_read = min(number_of_elements, max_readback_samples)
+            time_to_start_reading = time.time()
+            if raw:
+                data = read_raw_fifo(AnalogInput.dma[bank], number_of_elements_to_read, timeout_ms=read_timeout)[0]
+            else:
+                data = AnalogInput.dma[bank].read(number_of_elements_to_read, timeout_ms=read_timeout)[0]
+            number_of_elements -= number_of_elements_to_read
+            if read_timeout != -1:
+                read_timeout = int(max(read_timeout - (time.time() - time_to_start_reading) * 1000, 0))
+            yield data
+
+    def __read_dma_volts(self, bank, number_of_elements, timeout, scan_length=1):
+        """
+        Reads elements from the DMA FIFO of the bank like __read_dma(), and
+        yields each chunk as a float64 NumPy array. The chunks of a
+        fixed-point FIFO are scaled from the raw words in one vectorized
+        multiply, instead of converting each element to a Decimal.
+        """
+        import numpy
+        dma = AnalogInput.dma[bank]
+        if supports_raw_reads(dma):
+            fixed_point = fixed_point_format(dma)
+            for words in self.__read_dma(bank, number_of_elements, timeout, scan_length, raw=True):
+                yield fixed_point.to_volts(fixed_point.to_codes(words))
+        else:
+            for data in self.__read_dma(bank, number_of_elements, timeout, scan_length):
+                yield numpy.array(list(data), dtype=numpy.float64)
+
+    def __read_dma_values(self, bank, number_of_elements, timeout, return_type):
+        """
+        Reads interleaved elements from the DMA FIFO of the bank into a list,
+        into a float64 NumPy array when return_type is 'numpy', or into an
+        integer NumPy array of codes when return_type is 'raw'.
+        """
+        if return_type == 'raw':
+            import numpy
+            fixed_point = fixed_point_format(AnalogInput.dma[bank])
+            readvalue = numpy.empty(number_of_elements, dtype=numpy.int32 if fixed_point.word_length <= 32 else numpy.int64)
+            offset = 0
+            for data in self.__read_dma(bank, number_of_elements, timeout, raw=True):
+                readvalue[offset:offset + len(data)] = fixed_point.to_codes(data)
+                offset += len(data)
+        elif return_type == 'numpy':
+            # NumPy is optional, so it is imported only when it is used
+            import numpy
+            readvalue = numpy.empty(number_of_elements)
+            offset = 0
+            for data in self.__read_dma_volts(bank, number_of_elements, timeout):
+                readvalue[offset:offset + len(data)] = data
+                offset += len(data)
+        else:
+            readvalue = []
+            for data in self.__read_dma(bank, number_of_elements, timeout):
+                readvalue.extend(data)
+        return readvalue
+
+    def __read_dma_into(self, bank, view, first_row, number_of_channels, scan_length, number_of_samples, timeout):
+        """
+        Reads number_of_samples scans of scan_length interleaved elements from
+        the DMA FIFO of the bank, and writes the values of the first
+        number_of_channels elements of each scan into the rows of the flat
+        channel-major view, starting at first_row.
+        """
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        sample = 0
+        if numpy is not None:
+            values = numpy.frombuffer(view, dtype=numpy.float64)
+            for data in self.__read_dma_volts(bank, scan_length * number_of_samples, timeout, scan_length):
+                scans = data.reshape(-1, scan_length)
+                for index in range(number_of_channels):
+                    offset = (first_row + index) * number_of_samples + sample
+                    values[offset:offset + len(scans)] = scans[:, index]
+                sample += len(scans)
+            return
+        for data in self.__read_dma(bank, scan_length * number_of_samples, timeout, scan_length):
+            # the values nifpga reads cannot be sliced
+            data = list(data)
+            number_of_scans = len(data) // scan_length
+            for index in range(number_of_channels):
+                offset = (first_row + index) * number_of_samples + sample
+                view[offset:offset + number_of_scans] = array.array('d', data[index::scan_length])
+            sample += number_of_scans
+
+    def __deinterleave(self, readvalue, number_of_channels, scan_length, return_type):
+        """
+        Splits the interleaved elements of a scan of scan_length elements
+        into the values of the first number_of_channels elements. A NumPy
+        array is split into a (channels, samples) view without copying.
+        """
+        if return_type != 'list':
+            return readvalue.reshape(-1, scan_length).T[:number_of_channels]
+        result = []
+        for index in range(0, number_of_channels):
+            result.append(readvalue[index::scan_length])
+        return result
 
-        return_value = []
+    def __combine_banks(self, return_value, return_type):
+        """
+        Returns the values of each bank as a list, or stacks them into one
+        NumPy array when return_type is 'numpy' or 'raw'.
+        """
+        if return_type != 'list':
+            import numpy
+            return numpy.concatenate(return_value)
+        return return_value
 
-        def __read_values_if_has_enabled_channels(bank):
-            if self.is_continuous[bank]:
-                return_value.append(__read_from_specific_bank(bank))
-        
-        def __get_number_of_channel_per_bank():
-            number_of_channel_per_bank = {'A': 0, 'B':0}
-            for channel in self.channel_list:
-                number_of_channel_per_bank[channel['bank']] += 1
-            return number_of_channel_per_bank
+    def __n_samples_periods(self, configuration, count):
+        """
+        Returns the sample period of each bank of an n samples acquisition.
+        Each bank scans its own channels at count ticks of the 40 MHz clock
+        per element, so the banks of different numbers of channels have
+        different periods.
+        """
+        return dict((bank, count * configuration[bank]['numberOfChannels'] / 40000000.0) for bank in configuration)
 
-        __read_values_if_has_enabled_channels(Bank.A.value)
-        __read_values_if_has_enabled_channels(Bank.B.value)
+    def __waveforms(self, banks, return_value, periods, start_times):
+        """
+        Wraps the NumPy values of each bank into a Waveform, timed by the
+        period and the start time of the bank.
+        """
+        from .waveform import Waveform
+        waveforms = []
+        for bank, values in zip(banks, return_value):
+            channels = [_describe_channel(channel) for channel in self.channel_list if channel['bank'] == bank]
+            t0, wall_t0 = start_times[bank]
+            waveforms.append(Waveform(values, periods[bank], t0, wall_t0, channels))
+        return waveforms
 
-        return return_value
-    
     def _toBinary(self, num):
         return bin(int(num))
 
+    @trace_api
     def close(self):
         def __update_number_of_opened_n_sample(bank):
             if self.is_nsample_opened[bank]:
@@ -636,8 +1751,13 @@ class AnalogInput(Analog):
         def __clear_dma_reference(bank):
             if AnalogInput.number_of_n_sample[bank] == 0:
                 AnalogInput.dma[bank] = None
+                AnalogInput.dma_depth[bank] = None
 
         self.stop_continuous_mode()
+        with self.__bank_worker_lock:
+            if self.__bank_worker is not None:
+                self.__bank_worker.close()
+                self.__bank_worker = None
 
         for bank in Bank:
             __update_number_of_opened_n_sample(bank.value)
@@ -648,9 +1768,11 @@ class AnalogInput(Analog):
 
 class AnalogOutput(Analog):
     dma = { 'A': None, 'B': None }
+    dma_depth = { 'A': None, 'B': None }
     number_of_n_sample = { 'A': 0, 'B': 0 }
     
     """ NI ELVIS III Analog Output (AO) API. """
+    @trace_api
     def __init__(self, *configuration):
         """
         Opens a session to one analog output channel or multiple analog output
@@ -685,18 +1807,19 @@ class AnalogOutput(Analog):
 
             configuration_details['bank'] = configuration_details['bank'].value
             configuration_details['channel'] = configuration_details['channel'].value
-            configuration_details['value_address'] = self.session.registers['AO.' + configuration_details['bank'] + '_' + str(configuration_details['channel']) + '.VAL']
+            configuration_details['value_address'] = self.session.register_map.ao_channel(configuration_details['bank'], configuration_details['channel'])
             self.enamask = configuration_details['channel']^2
             self.channel_list.append(configuration_details)
 
         for bank in Bank:
-            self.dma_idl[bank.value] = self.session.registers['AO.%s.DMA_IDL' % bank.value]
-            self.dma_cntr[bank.value] = self.session.registers['AO.%s.DMA_CNTR' % bank.value]
-            self.dma_ena[bank.value] = self.session.registers['AO.%s.DMA_ENA' % bank.value]
+            registers = self.session.register_map.ao(bank.value)
+            self.dma_idl[bank.value] = registers.dma_idl
+            self.dma_cntr[bank.value] = registers.dma_cntr
+            self.dma_ena[bank.value] = registers.dma_ena
 
             # continuous
-            self.ele_num[bank.value] = self.session.registers['AO.%s.ELE_NUM' % bank.value]
-            self.bank_sync[bank.value] = self.session.registers['AO.%s.SYNC' % bank.value]
+            self.ele_num[bank.value] = registers.ele_num
+            self.bank_sync[bank.value] = registers.sync
             
         self.dma_sys_ready = self.session.registers['DMA.SYS.RDY']
         self.go = self.session.registers['AO.SYS.GO']
@@ -706,6 +1829,7 @@ class AnalogOutput(Analog):
         self.offset = 0.0 / 1E+9
         self.signed = True
 
+    @trace_api
     def write(self, *args):
         """
         Writes values to one or more analog output channels. The function
@@ -772,22 +1896,20 @@ class AnalogOutput(Analog):
         """
         assert type(value) == int or type(value) == float
 
-        while not(self.dma_sys_ready):
-            pass
+        wait_until(lambda: self.dma_sys_ready.read() == True, 'DMA.SYS.RDY')
 
         for channel in self.channel_list:
             bank = channel['bank']
             self.dma_ena[bank].write(0)
-            while not(self.dma_ena[bank].read() == 0):
-                pass
+            self.session.verify(lambda: self.dma_ena[bank].read() == 0, 'AO.%s.DMA_ENA' % bank, 0)
 
             stat_value = not self.stat.read()
             self.value = channel['value_address']
             self.value.write(value)
             self.go.write(True)
-            while not(self.stat.read() == stat_value):
-                pass
+            wait_until(lambda: self.stat.read() == stat_value, 'AO.SYS.STAT')
     
+    @trace_api
     def start_continuous_mode(self, values, sample_rate, timeout):
         """
         Configure the sample rate and timeout, then start the signal generation.
@@ -820,22 +1942,22 @@ class AnalogOutput(Analog):
         def __open_continuous_mode():
             for channel in self.channel_list:
                 self.is_continuous_opened[channel['bank']] = True
-            
+
+            # the whole waveform is written before the generation starts, so
+            # the buffer of each bank must hold all of its elements
+            number_of_samples = max(len(value_list) for value_list in values)
             for bank in Bank:
                 bank = bank.value
                 if self.is_continuous_opened[bank]:
-                    self.__register_and_configure_dma(bank)
+                    number_of_channels = len([channel for channel in self.channel_list if channel['bank'] == bank])
+                    self.__register_and_configure_dma(bank, sample_rate, number_of_samples * number_of_channels)
                     self.__stop_continuous(bank)
 
         def __start_continuous_mode():
-            while not(self.dma_sys_ready.read() == True):
-                pass
+            wait_until(lambda: self.dma_sys_ready.read() == True, 'DMA.SYS.RDY')
 
             count, actual_sample_rate = self.calculate_sample_rate_to_ticks(sample_rate, minimum_sample_rate, maximum_sample_rate)
 
-            while not(self.dma_sys_ready):
-                pass
-
             bitmask = self.__calculate_bitmask()
 
             if self.is_continuous_opened[Bank.A.value] and self.is_continuous_opened[Bank.B.value]:
@@ -851,8 +1973,8 @@ class AnalogOutput(Analog):
 
                 self.dma_cntr[Bank.A.value].write(count)
                 self.dma_cntr[Bank.B.value].write(count)
-                while not(self.dma_cntr[Bank.A.value].read() == count and self.dma_cntr[Bank.B.value].read() == count):
-                    pass
+                self.session.verify(lambda: self.dma_cntr[Bank.A.value].read() == count and self.dma_cntr[Bank.B.value].read() == count,
+                                    'AO.DMA_CNTR', count)
 
                 self.dma_ena[Bank.A.value].write(bitmask[0])
                 self.dma_ena[Bank.B.value].write(bitmask[1])
@@ -865,8 +1987,7 @@ class AnalogOutput(Analog):
                 assert self.ele_num[bank].read() != 0, 'Cannot start the generation without data in the buffer. You must call the write API before calling the start_continuous_mode API.'
 
                 self.dma_cntr[bank].write(count)
-                while not(self.dma_cntr[bank].read() == count):
-                    pass
+                self.session.verify(lambda: self.dma_cntr[bank].read() == count, 'AO.%s.DMA_CNTR' % bank, count)
 
                 self.dma_ena[bank].write(bitmask)
 
@@ -874,6 +1995,7 @@ class AnalogOutput(Analog):
         self.__write_multiple_points_continuous(values, timeout)
         __start_continuous_mode()
 
+    @trace_api
     def stop_continuous_mode(self):
         """
         Stops signal generation on the FPGA target.
@@ -884,6 +2006,7 @@ class AnalogOutput(Analog):
                 self.__stop_continuous(bank)
                 self.is_continuous_opened[bank] = False
                 AnalogOutput.dma[bank] = None
+                AnalogOutput.dma_depth[bank] = None
 
     def __stop_continuous(self, bank):
         """
@@ -915,10 +2038,17 @@ class AnalogOutput(Analog):
 
         return bitmask_in_int
 
-    def __register_and_configure_dma(self, bank):
+    def __register_and_configure_dma(self, bank, sample_rate, minimum_depth=0):
         if AnalogOutput.dma[bank] is None:
             AnalogOutput.dma[bank] = self.session.fifos['AO.%s.DMA' % bank]
-            AnalogOutput.dma[bank].configure(self.maximum_samples * 20)
+            AnalogOutput.dma_depth[bank] = None
+        number_of_channels = len([channel for channel in self.channel_list if channel['bank'] == bank])
+        depth = max(self.calculate_dma_depth(sample_rate * number_of_channels), minimum_depth)
+        if depth != AnalogOutput.dma_depth[bank]:
+            # the FIFO must be stopped to change its depth
+            AnalogOutput.dma[bank].stop()
+            actual_depth = AnalogOutput.dma[bank].configure(depth)
+            AnalogOutput.dma_depth[bank] = depth if actual_depth is None else actual_depth
 
     def __write_multiple_points(self, values, sample_rate):
         """
@@ -943,15 +2073,14 @@ class AnalogOutput(Analog):
         assert type(sample_rate) == int or type(sample_rate) == float
         assert minimum_sample_rate <= sample_rate <= maximum_sample_rate
 
-        while not(self.dma_sys_ready):
-            pass
+        wait_until(lambda: self.dma_sys_ready.read() == True, 'DMA.SYS.RDY')
 
         for channel in self.channel_list:
             bank = channel['bank']
             if not self.is_nsample_opened[bank]:
                 self.is_nsample_opened[bank] = True
                 AnalogOutput.number_of_n_sample[bank] += 1
-            self.__register_and_configure_dma(bank)
+            self.__register_and_configure_dma(bank, sample_rate)
 
         bitmask = self.__calculate_bitmask()
 
@@ -959,8 +2088,7 @@ class AnalogOutput(Analog):
         
         data = self.__convert_write_values_from_float_to_fixed_point(values)
 
-        while not(self.dma_sys_ready.read() == True):
-            pass
+        wait_until(lambda: self.dma_sys_ready.read() == True, 'DMA.SYS.RDY')
 
         if self.is_nsample_opened[Bank.A.value]:
             self.__write_multiple_points_to_specific_bank(Bank.A.value, count, data, bitmask[0])
@@ -989,8 +2117,7 @@ class AnalogOutput(Analog):
 
             self.dma_ena[bank].write(channel_bitmask)
             self.dma_cntr[bank].write(count)
-            while not(self.dma_cntr[bank].read() == count):
-                pass
+            self.session.verify(lambda: self.dma_cntr[bank].read() == count, 'AO.%s.DMA_CNTR' % bank, count)
             
             data_length = len(data)
             max_write_samples = 10000
@@ -1107,6 +2234,7 @@ class AnalogOutput(Analog):
         """
         return [ int(value * int('1000000000000000000000000000', 2)) for value in values ]
 
+    @trace_api
     def close(self):
         def __update_number_of_opened_n_sample(bank):
             if self.is_nsample_opened[bank]:
@@ -1115,6 +2243,7 @@ class AnalogOutput(Analog):
         def __clear_dma_reference(bank):
             if self.is_nsample_opened[bank] and AnalogOutput.number_of_n_sample[bank] == 0:
                 AnalogOutput.dma[bank] = None
+                AnalogOutput.dma_depth[bank] = None
                 self.is_nsample_opened[bank] = False
 
         self.stop_continuous_mode()
@@ -1168,6 +2297,7 @@ class SysSelect(ELVISIII):
 
 class DigitalInputOutput(SysSelect):
     """ NI ELVIS III Digital Input and Output (DIO) API. """
+    @trace_api
     def __init__(self, bank=Bank.A, channels=[]):
         """
         Opens a session to one or more digital input and output channels.
@@ -1184,10 +2314,11 @@ class DigitalInputOutput(SysSelect):
         assert bank in Bank
         assert channels
         bank = bank.value
-        self.write_registration = self.session.registers['DIO.' + bank + '_19:0.OUT']
-        self.read_registration = self.session.registers['DIO.' + bank + '_19:0.IN']
-        self.direction = self.session.registers['DIO.' + bank + '_19:0.DIR']
-        self.select = self.session.registers['SYS.SELECT' + bank]
+        registers = self.session.register_map.dio(bank)
+        self.write_registration = registers.out
+        self.read_registration = registers.input
+        self.direction = registers.direction
+        self.select = registers.select
         self.direction.write(0x00)
 
         for channel in channels:
@@ -1196,6 +2327,7 @@ class DigitalInputOutput(SysSelect):
             self.select.write(system_select_value)
         self.channels = channels
 
+    @trace_api
     def read(self, channels_to_read=[]):
         """
         Reads the logic levels of one or more digital I/O channels. (1 sample)
@@ -1218,6 +2350,7 @@ class DigitalInputOutput(SysSelect):
             return_value.append(int(0 < (int(value) & (1 << channel.value))))
         return return_value
 
+    @trace_api
     def write(self, value, channels_to_write=[]):
         """
         Write the value to all channels initialized. (1 sample)
@@ -1248,6 +2381,7 @@ class DigitalInputOutput(SysSelect):
 
 class Encoder(SysSelect):
     """ NI ELVIS III Encoder API. """
+    @trace_api
     def __init__(self, bank=Bank.A,
                        channel=EncoderChannel.ENC0,
                        encoder_mode=EncoderMode.QUADRATURE):
@@ -1272,10 +2406,11 @@ class Encoder(SysSelect):
         assert encoder_mode in EncoderMode
         bank = bank.value
         channel = channel.value
-        self.cnfg = self.session.registers['ENC.' + bank + '_' + str(channel) + '.CNFG']
-        self.cntr = self.session.registers['ENC.' + bank + '_' + str(channel) + '.CNTR']
-        self.stat = self.session.registers['ENC.' + bank + '_' + str(channel) + '.STAT']
-        self.select = self.session.registers['SYS.SELECT' + bank]
+        registers = self.session.register_map.encoder(bank, channel)
+        self.cnfg = registers.cnfg
+        self.cntr = registers.cntr
+        self.stat = registers.stat
+        self.select = registers.select
 
         if encoder_mode == EncoderMode.QUADRATURE:
             self.cnfg.write(int('00000001', 2))
@@ -1288,6 +2423,7 @@ class Encoder(SysSelect):
         system_select_value = self.set_sys_select(system_select_value, 2 * channel, 2, '10')
         self.select.write(system_select_value)
 
+    @trace_api
     def read(self, reset_counter=False):
         """
         Reads the value of the encoder tick counter and the last direction of
@@ -1337,6 +2473,7 @@ class Encoder(SysSelect):
 
 class PWM(SysSelect):
     """ NI ELVIS III Pulse Width Modulation (PWM) API. """
+    @trace_api
     def __init__(self, bank=Bank.A, channel=DIOChannel.DIO0):
         """
         Opens a session to a pulse width modulation (PWM) channel and
@@ -1355,17 +2492,19 @@ class PWM(SysSelect):
         assert DIOChannel.DIO0 <= channel <= DIOChannel.DIO19
         bank = bank.value
         channel = channel.value
-        self.cs = self.session.registers['PWM.' + bank + '_' + str(channel) + '.CS']
-        self.cnfg = self.session.registers['PWM.' + bank + '_' + str(channel) + '.CNFG']
-        self.cmp = self.session.registers['PWM.' + bank + '_' + str(channel) + '.CMP']
-        self.max = self.session.registers['PWM.' + bank + '_' + str(channel) + '.MAX']
-        self.cntr = self.session.registers['PWM.' + bank + '_' + str(channel) + '.CNTR']
-        self.select = self.session.registers['SYS.SELECT' + bank]
+        registers = self.session.register_map.pwm(bank, channel)
+        self.cs = registers.cs
+        self.cnfg = registers.cnfg
+        self.cmp = registers.cmp
+        self.max = registers.max
+        self.cntr = registers.cntr
+        self.select = registers.select
 
         system_select_value = self.clear_sys_select(self.select.read(), channel, 1)
         system_select_value = self.set_sys_select(system_select_value, channel, 1, '01')
         self.select.write(system_select_value)
 
+    @trace_api
     def generate(self, frequency, duty_cycle):
         """
         Sets the duty cycle value and frequency value of a pulse width
@@ -1400,6 +2539,7 @@ class PWM(SysSelect):
 
 class LEDs(ELVISIII):
     """ NI ELVIS III LED API. """
+    @trace_api
     def __init__(self):
         """
         Open the session to LED and initialize LED registration on NI ELVIS
@@ -1408,6 +2548,7 @@ class LEDs(ELVISIII):
         super(LEDs, self).__init__()
         self.leds = self.session.registers['DO.LED3:0']
 
+    @trace_api
     def write(self, led=Led.LED0, value_to_set=True):
         """
         Sets the states of the LEDs.
@@ -1444,6 +2585,7 @@ class LEDs(ELVISIII):
 
 class I2C(SysSelect):
     """ NI ELVIS III Inter-Integrated Circuit (I2C) API. """
+    @trace_api
     def __init__(self, bank=Bank.A, mode=I2CSpeedMode.STANDARD):
         """
         Opens a session to an Inter-Integrated Circuit (I2C) channel and
@@ -1461,20 +2603,22 @@ class I2C(SysSelect):
         assert bank in Bank
         assert mode in I2CSpeedMode
         bank = bank.value
-        self.select = self.session.registers['SYS.SELECT' + bank]
-        self.cntr = self.session.registers['I2C.' + bank + '.CNTR']
-        self.cnfg = self.session.registers['I2C.' + bank + '.CNFG']
-        self.addr = self.session.registers['I2C.' + bank + '.ADDR']
-        self.cntl = self.session.registers['I2C.' + bank + '.CNTL']
-        self.dato = self.session.registers['I2C.' + bank + '.DATO']
-        self.go = self.session.registers['I2C.' + bank + '.GO']
-        self.stat = self.session.registers['I2C.' + bank + '.STAT']
-        self.dati = self.session.registers['I2C.' + bank + '.DATI']
+        registers = self.session.register_map.i2c(bank)
+        self.select = registers.select
+        self.cntr = registers.cntr
+        self.cnfg = registers.cnfg
+        self.addr = registers.addr
+        self.cntl = registers.cntl
+        self.dato = registers.dato
+        self.go = registers.go
+        self.stat = registers.stat
+        self.dati = registers.dati
         self.configure(mode)
 
         system_select_value = self.set_sys_select(self.select.read(), 14, 2, '11')
         self.select.write(system_select_value)
 
+    @trace_api
     def configure(self, mode):
         """
         Configures the transfer rate of an Inter-Integrated Circuit (I2C)
@@ -1493,6 +2637,17 @@ class I2C(SysSelect):
             self.cntr.write(63 & 0xFF)
         self.cnfg.write(1 & 0xFF)
 
+    def __transfer_done(self):
+        """
+        Returns a tuple of the I2C status when the transfer is no longer busy,
+        otherwise None.
+        """
+        i2c_stat = self.stat.read()
+        if (i2c_stat & int('00000001', 2)) == 0:
+            return (i2c_stat,)
+        return None
+
+    @trace_api
     def write(self, slave_address, bytes_to_write, keep_bus_busy=True, timeout_ms=1000):
         """
         Write to a specified slave device based on the address and keep the
@@ -1541,15 +2696,11 @@ class I2C(SysSelect):
             self.cntl.write(cntl_to_send)
             self.dato.write(bytes_to_write[n])
             self.go.write(True)
-            start_time = time.time()
-            n = True
-            while n:
-                if not timeout_ms < 0:
-                    if (time.time() - start_time) >= timeout_ms:
-                        timeout = True
-                i2c_stat = self.stat.read()
-                if ((i2c_stat & int('00000001', 2)) == 0) or timeout:
-                    n = False
+            try:
+                i2c_stat = wait_until(self.__transfer_done, 'I2C.STAT',
+                                      None if timeout_ms < 0 else timeout_ms / 1000.0)[0]
+            except PollTimeoutError:
+                timeout = True
             if timeout:
                 error = True
             else:
@@ -1563,6 +2714,7 @@ class I2C(SysSelect):
             if error and not keep_bus_busy:
                 self.cntl.write(int('00000101', 2))
 
+    @trace_api
     def read(self, slave_address, num_bytes_to_read, keep_bus_busy=False, timeout_ms=1000):
         """
         Read a specified number of bytes from the slave device based on the
@@ -1620,15 +2772,11 @@ class I2C(SysSelect):
                         cntl_to_send = int('00001001', 2)
             self.cntl.write(cntl_to_send)
             self.go.write(True)
-            start_time = time.time()
-            n = True
-            while n:
-                if not timeout_ms < 0:
-                    if (time.time() - start_time) >= timeout_ms:
-                        timeout = True
-                i2c_stat = self.stat.read()
-                if ((i2c_stat & int('00000001', 2)) == 0) or timeout:
-                    n = False
+            try:
+                i2c_stat = wait_until(self.__transfer_done, 'I2C.STAT',
+                                      None if timeout_ms < 0 else timeout_ms / 1000.0)[0]
+            except PollTimeoutError:
+                timeout = True
             if timeout:
                 error = True
             else:
@@ -1644,6 +2792,7 @@ class I2C(SysSelect):
 
 class SPI(SysSelect):
     """ NI ELVIS III Serial Peripheral Interface Bus (SPI) API. """
+    @trace_api
     def __init__(self, frequency,
                        bank=Bank.A,
                        clock_phase=SPIClockPhase.LEADING,
@@ -1686,16 +2835,18 @@ class SPI(SysSelect):
         clock_phase = clock_phase.value
         clock_polarity = clock_polarity.value
         data_direction = data_direction.value
-        self.select = self.session.registers['SYS.SELECT' + bank]
-        self.cnt = self.session.registers['SPI.' + bank + '.CNT']
-        self.cnfg = self.session.registers['SPI.' + bank + '.CNFG']
-
-        self.go = self.session.registers['SPI.' + bank + '.GO']
-        self.dato = self.session.registers['SPI.' + bank + '.DATO']
-        self.dati = self.session.registers['SPI.' + bank + '.DATI']
+        registers = self.session.register_map.spi(bank)
+        self.select = registers.select
+        self.cnt = registers.cnt
+        self.cnfg = registers.cnfg
+
+        self.go = registers.go
+        self.dato = registers.dato
+        self.dati = registers.dati
         self.bank = bank
         self.configure(frequency, clock_phase, clock_polarity, data_direction, frame_length)
 
+    @trace_api
     def configure(self, frequency, clock_phase, clock_polarity, data_direction, frame_length):
         """
         Set up the SPI configuration on NI ELVIS III. This function is used
@@ -1743,6 +2894,7 @@ class SPI(SysSelect):
 
         return
 
+    @trace_api
     def read(self, bytes_count):
         """
         Read a specified number of frames from a SPI channel.
@@ -1762,6 +2914,7 @@ class SPI(SysSelect):
             bytes_to_read.append(0)
         return self.writeread(bytes_to_read)
 
+    @trace_api
     def write(self, bytes_to_write):
         """
         Writes data to a SPI channel.
@@ -1773,6 +2926,7 @@ class SPI(SysSelect):
         """
         self.writeread(bytes_to_write)
 
+    @trace_api
     def writeread(self, bytes_to_write):
         """
         Writes and reads data through a SPI channel at the same time. The
@@ -1861,6 +3015,7 @@ class ButtonIRQ(IRQ):
     """
     NI ELVIS III Button Interrupt (ButtonIRQ) API.
     """
+    @trace_api
     def __init__(self,
                  callback_function,
                  irq_number=IRQNumber.IRQ1,
@@ -1916,6 +3071,7 @@ class ButtonIRQ(IRQ):
         rise.write(type_rising)
         fall.write(type_falling)
 
+    @trace_api
     def wait(self):
         """
         Configure ButtonIRQ and execute the interrupt events.
@@ -1928,6 +3084,7 @@ class DIIRQ(IRQ):
     """
     NI ELVIS III Digital Input Interrupt (DIIRQ) API.
     """
+    @trace_api
     def __init__(self,
                  channel,
                  callback_function,
@@ -1973,11 +3130,12 @@ class DIIRQ(IRQ):
             assert type_falling != False
         assert 1 <= edge_count <= 4294967295
         channel = channel.value
-        enable = self.session.registers['IRQ.DIO_A_7:0.ENA']
-        rise = self.session.registers['IRQ.DIO_A_7:0.RISE']
-        fall = self.session.registers['IRQ.DIO_A_7:0.FALL']
-        counter = self.session.registers['IRQ.DIO_A_' + str(channel) + '.CNT']
-        irq_num = self.session.registers['IRQ.DIO_A_' + str(channel) + '.NO']
+        registers = self.session.register_map.diirq(channel)
+        enable = registers.enable
+        rise = registers.rise
+        fall = registers.fall
+        counter = registers.counter
+        irq_num = registers.irq_number
 
         counter.write(edge_count)
         rise_value = rise.read()
@@ -1992,6 +3150,7 @@ class DIIRQ(IRQ):
         self.irq_number = irq_number.value
         irq_num.write(self.irq_number)
 
+    @trace_api
     def wait(self):
         """
         Configure DIIRQ and execute the interrupt events.
@@ -2004,6 +3163,7 @@ class AIIRQ(IRQ):
     """
     NI ELVIS III Analog Input Interrupt (AIIRQ) API.
     """
+    @trace_api
     def __init__(self,
                  channel,
                  callback_function,
@@ -2059,10 +3219,11 @@ class AIIRQ(IRQ):
         self.ai.read()
 
         channel = channel.value
-        irq_num = self.session.registers['IRQ.AI_A_' + str(channel) + '.NO']
-        irq_hysteresis = self.session.registers['IRQ.AI_A_' + str(channel) + '.HYSTERESIS']
-        irq_threshold = self.session.registers['IRQ.AI_A_' + str(channel) + '.THRESHOLD']
-        cnfg = self.session.registers['IRQ.AI_A.CNFG']
+        registers = self.session.register_map.aiirq(channel)
+        irq_num = registers.irq_number
+        irq_hysteresis = registers.hysteresis
+        irq_threshold = registers.threshold
+        cnfg = registers.cnfg
         
         irq_number = irq_number.value
         irq_type = irq_type.value
@@ -2088,6 +3249,7 @@ class AIIRQ(IRQ):
         self.timeout = timeout
         self.irq_number = irq_number
 
+    @trace_api
     def wait(self):
         """
         Configure AIIRQ and execute the interrupt events.
@@ -2095,6 +3257,7 @@ class AIIRQ(IRQ):
         self.acknowledge(self.irq_number)
         self.irq_wait(self.timeout, self.irq_number)
 
+    @trace_api
     def close(self):
         """ Close AI IRQ session"""
         self.ai.close()
@@ -2105,6 +3268,7 @@ class TimerIRQ(IRQ):
     """
     NI ELVIS III TimerIRQ API.
     """
+    @trace_api
     def __init__(self, callback_function, irq_interval):
         """
         Initialize TimerIRQ registration.
@@ -2126,6 +3290,7 @@ class TimerIRQ(IRQ):
         self.callback_function = callback_function
         self.irq_interval = irq_interval
 
+    @trace_api
     def wait(self):
         """
         Configure TimerIRQ and execute the interrupt events.
@@ -2140,6 +3305,7 @@ class UART(ELVISIII):
     """
     NI ELVIS III Universal Asynchronous Receiver/Transmitter (UART) API.
     """
+    @trace_api
     def __init__(self,
                  bank=Bank.A,
                  baud_rate=UARTBaudRate.RATE9600,
@@ -2192,20 +3358,22 @@ class UART(ELVISIII):
         self.a_ena.write(False)
         self.b_ena.write(False)
         if bank == Bank.A:
-            while not self.a_ena.read():
-                self.a_ena.write(True)
+            wait_until(lambda: self.a_ena.write(True) or self.a_ena.read(), 'UART.A.ENA')
         else:
-            while not self.b_ena.read():
-                self.b_ena.write(True)
+            wait_until(lambda: self.b_ena.write(True) or self.b_ena.read(), 'UART.B.ENA')
 
+        # pyvisa is slow to import and only used by UART, so it is imported
+        # when the first UART session is opened
+        import pyvisa
         self.resource_manager = pyvisa.ResourceManager()
         self.instrument = self.resource_manager.open_resource(resource_name)
         self.instrument.baud_rate = baud_rate.value
         self.instrument.data_bits = data_bits.value
-        self.instrument.stop_bits = stop_bits.value
-        self.instrument.parity = parity.value
+        self.instrument.stop_bits = pyvisa.constants.StopBits(stop_bits.value)
+        self.instrument.parity = pyvisa.constants.Parity(parity.value)
         self.instrument.flow_control = flow_control.value
 
+    @trace_api
     def write(self, value_to_write):
         """
         Writes the data from write buffer to the device or interface specified
@@ -2217,6 +3385,7 @@ class UART(ELVISIII):
         """
         self.instrument.write_raw(value_to_write)
 
+    @trace_api
     def read(self, bytes_to_read):
         """
         Reads the specified number of bytes from the device or interface
@@ -2237,6 +3406,7 @@ class UART(ELVISIII):
             return_value = self.instrument.read_bytes(bytes_to_read)
         return return_value
 
+    @trace_api
     def close(self):
         """
         Close UART VISA (self.instrument) and UART session (self.session).
@@ -2247,11 +3417,13 @@ class UART(ELVISIII):
 
 class Button(ELVISIII):
     """ NI ELVIS III Button API. """
+    @trace_api
     def __init__(self):
         """ Initialize Button registration on NI ELVIS III. """
         super(Button, self).__init__()
         self.user_button = self.session.registers['DI.BTN']
 
+    @trace_api
     def read(self):
         """
         Read the result back.
@@ -0,0 +1,123 @@
+"""
+asyncio interface of the NI ELVIS III analog input. This module requires
+Python 3.7 or later, so it is not imported by the nielvis package; import it
+with
+
+    from nielvis.asynchronous import AsyncAnalogInput
+"""
+import asyncio
+
+from .enums import Bank
+from .academicIO import AnalogInput
+
+
+class AsyncAnalogInput(object):
+    """
+    Continuous analog input which waits for the data without blocking the
+    event loop. It polls the number of elements in the DMA FIFOs and reads
+    only when the requested samples are already on the host, so no call
+    blocks in the FIFO read.
+    """
+    def __init__(self, analog_input, poll_interval=0.001):
+        """
+        Args:
+            analog_input (AnalogInput):
+                Specifies the analog input session.
+            poll_interval (number):
+                Specifies the time, in seconds, between two polls of the
+                FIFOs. The default is 0.001.
+        """
+        assert poll_interval > 0
+        self.analog_input = analog_input
+        self.poll_interval = poll_interval
+
+    def start_continuous_mode(self, sample_rate):
+        """ Starts the continuous acquisition. See AnalogInput. """
+        self.analog_input.start_continuous_mode(sample_rate)
+
+    def stop_continuous_mode(self):
+        """ Stops the continuous acquisition. See AnalogInput. """
+        self.analog_input.stop_continuous_mode()
+
+    def __is_acquiring(self):
+        return self.analog_input.is_continuous[Bank.A.value] or self.analog_input.is_continuous[Bank.B.value]
+
+    def __missing_elements(self, number_of_samples):
+        """
+        Returns the largest number of elements which a bank still needs to
+        hold number_of_samples scans.
+        """
+        missing = 0
+        for bank in Bank:
+            bank = bank.value
+            if not self.analog_input.is_continuous[bank]:
+                continue
+            if self.analog_input.dma_full[bank].read():
+                raise OverflowError('The read buffer of bank %s has overflowed.' % bank)
+            elements_remaining = AnalogInput.dma[bank].read(0, timeout_ms=0)[1]
+            missing = max(missing, self.analog_input.number_of_channels * number_of_samples - elements_remaining)
+        return missing
+
+    async def __wait(self, number_of_samples, timeout):
+        """
+        Waits until the FIFOs hold number_of_samples scans. Returns False
+        when the acquisition stops while waiting.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout == -1 else loop.time() + timeout / 1000.0
+        while True:
+            if not self.__is_acquiring():
+                return False
+            if self.__missing_elements(number_of_samples) <= 0:
+                return True
+            if deadline is not None and loop.time() >= deadline:
+                raise TimeoutError('The continuous acquisition did not acquire %d samples within %d ms.' % (number_of_samples, timeout))
+            await asyncio.sleep(self.poll_interval)
+
+    async def aread(self, number_of_samples, timeout=-1, return_type='list'):
+        """
+        Reads the samples of the continuous acquisition. See
+        AnalogInput.read().
+
+        Args:
+            number_of_samples (number):
+                Specifies the number of samples to read.
+            timeout (number):
+                Specifies the period of time, in milliseconds, to wait for the
+                samples. If you set timeout to -1, this function waits
+                indefinitely. The default is -1.
+            return_type (string):
+                Specifies whether to return lists or a NumPy array. The
+                default is 'list'.
+
+        Raises:
+            TimeoutError:
+                The samples were not acquired within the timeout.
+        """
+        is_acquiring = await self.__wait(number_of_samples, timeout)
+        assert is_acquiring, 'The continuous acquisition has not started. You must call the start_continuous_mode() function before calling the aread() function.'
+        # the samples are in the FIFOs, so the read does not block
+        return self.analog_input.read(number_of_samples, -1, return_type=return_type)
+
+    async def astream(self, block_size, return_type='list'):
+        """
+        Yields blocks of block_size samples until the acquisition stops. When
+        the consuming task is cancelled, or the consumer leaves the loop or
+        closes the generator, the acquisition is stopped.
+
+            async for block in async_ai.astream(1000):
+                process(block)
+        """
+        try:
+            while await self.__wait(block_size, -1):
+                yield self.analog_input.read(block_size, -1, return_type=return_type)
+        finally:
+            if self.__is_acquiring():
+                self.analog_input.stop_continuous_mode()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exception_type, exception_val, trace):
+        if self.__is_acquiring():
+            self.analog_input.stop_continuous_mode()
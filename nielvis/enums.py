@@ -1,4 +1,3 @@
-from pyvisa import constants
 from enum import Enum, IntEnum
 
 class Bank(Enum):
@@ -148,14 +147,14 @@ class UARTStopBits(Enum):
         ONE: 1 stop bit
         TWO: 2 stop bits
     """
-    ONE = constants.StopBits.one
-    TWO = constants.StopBits.two
+    ONE = 10    # pyvisa.constants.StopBits.one
+    TWO = 20    # pyvisa.constants.StopBits.two
 
 class UARTParity(Enum):
     """ NI ELVIS III UART parity. """
-    NO = constants.Parity.none
-    ODD = constants.Parity.odd
-    EVEN = constants.Parity.even
+    NO = 0      # pyvisa.constants.Parity.none
+    ODD = 1     # pyvisa.constants.Parity.odd
+    EVEN = 2    # pyvisa.constants.Parity.even
 
 class UARTFlowControl(Enum):
     """
@@ -183,10 +182,10 @@ class UARTFlowControl(Enum):
            nearly full, and it controls output flow by suspending the
            transmission when the DSR signal is unasserted.
     """
-    NONE = constants.VI_ASRL_FLOW_NONE
-    XOR_XOFF = constants.VI_ASRL_FLOW_XON_XOFF
-    RTS_CTS = constants.VI_ASRL_FLOW_RTS_CTS
-    DTR_DSR = constants.VI_ASRL_FLOW_DTR_DSR
+    NONE = 0        # pyvisa.constants.VI_ASRL_FLOW_NONE
+    XOR_XOFF = 1    # pyvisa.constants.VI_ASRL_FLOW_XON_XOFF
+    RTS_CTS = 2     # pyvisa.constants.VI_ASRL_FLOW_RTS_CTS
+    DTR_DSR = 4     # pyvisa.constants.VI_ASRL_FLOW_DTR_DSR
 
 class I2CSpeedMode(Enum):
     """
@@ -299,3 +298,40 @@ class DIIRQChannel(IntEnum):
     DIO1 = 1
     DIO2 = 2
     DIO3 = 3
+
+class PollStrategy(Enum):
+    """
+    NI ELVIS III strategy to wait for an FPGA register to reach a value.
+
+    Values:
+        SPIN:
+            Reads the register again immediately. This has the lowest latency
+            and keeps one CPU core busy.
+        SPIN_THEN_YIELD:
+            Spins for a few reads, then yields the CPU to other threads
+            between reads.
+        BACKOFF:
+            Spins for a few reads, then sleeps between reads, doubling the
+            sleep up to a maximum.
+    """
+    SPIN = 'spin'
+    SPIN_THEN_YIELD = 'spin then yield'
+    BACKOFF = 'backoff'
+
+class VerifyPolicy(Enum):
+    """
+    NI ELVIS III policy to read back the configuration registers after they
+    are written.
+
+    Values:
+        ALWAYS:
+            Reads back the registers after every configuration write.
+        ONCE:
+            Reads back the registers only the first time a session applies a
+            given configuration.
+        NEVER:
+            Does not read back the registers.
+    """
+    ALWAYS = 'always'
+    ONCE = 'once'
+    NEVER = 'never'
@@ -0,0 +1,152 @@
+"""
+Bounded polling of FPGA registers.
+
+All waits of the NI ELVIS III APIs for a register to reach a value go through
+wait_until(), which applies the configured PollStrategy, raises
+PollTimeoutError when the deadline passes, and counts the reads and the time
+spent per wait.
+"""
+import time
+import threading
+
+from .enums import PollStrategy
+
+_DEFAULT = object()
+
+
+class PollTimeoutError(TimeoutError):
+    """ Raised when a polled FPGA register does not reach its value in time. """
+
+
+class PollStatistics(object):
+    """ Counters of the waits on one condition. """
+    __slots__ = ('waits', 'iterations', 'seconds', 'timeouts')
+
+    def __init__(self):
+        self.waits = 0
+        self.iterations = 0
+        self.seconds = 0.0
+        self.timeouts = 0
+
+    def as_dict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+
+class Poller(object):
+    """ The polling settings and counters shared by all APIs. """
+    def __init__(self):
+        self.strategy = PollStrategy.SPIN_THEN_YIELD
+        self.timeout = 10.0
+        self.spin_iterations = 100
+        self.max_sleep = 0.001
+        self.lock = threading.Lock()
+        self.statistics = {}
+
+    def record(self, name, iterations, seconds, timed_out=False):
+        with self.lock:
+            statistics = self.statistics.get(name)
+            if statistics is None:
+                statistics = self.statistics[name] = PollStatistics()
+            statistics.waits += 1
+            statistics.iterations += iterations
+            statistics.seconds += seconds
+            statistics.timeouts += int(timed_out)
+
+
+poller = Poller()
+
+
+def configure(strategy=None, timeout=_DEFAULT, spin_iterations=None, max_sleep=None):
+    """
+    Configure how the APIs wait for FPGA registers.
+
+    Args:
+        strategy (PollStrategy):
+            Specifies how to wait between reads. The default is
+            SPIN_THEN_YIELD.
+        timeout (number):
+            Specifies the time, in seconds, to wait before raising
+            PollTimeoutError. None waits indefinitely. The default is 10.
+        spin_iterations (int):
+            Specifies the number of reads before SPIN_THEN_YIELD yields and
+            BACKOFF sleeps. The default is 100.
+        max_sleep (number):
+            Specifies the longest sleep, in seconds, of BACKOFF. The default
+            is 0.001.
+    """
+    if strategy is not None:
+        assert strategy in PollStrategy
+        poller.strategy = strategy
+    if timeout is not _DEFAULT:
+        assert timeout is None or timeout >= 0
+        poller.timeout = timeout
+    if spin_iterations is not None:
+        assert spin_iterations >= 0
+        poller.spin_iterations = spin_iterations
+    if max_sleep is not None:
+        assert max_sleep > 0
+        poller.max_sleep = max_sleep
+
+
+def snapshot():
+    """
+    Return a copy of the counters, which maps the name of each polled
+    condition to a dict of waits, iterations, seconds, and timeouts.
+    """
+    with poller.lock:
+        return dict((name, statistics.as_dict()) for name, statistics in poller.statistics.items())
+
+
+def reset():
+    """ Clear the counters. """
+    with poller.lock:
+        poller.statistics = {}
+
+
+def wait_until(condition, name, timeout=_DEFAULT, strategy=None):
+    """
+    Call condition() until it returns a true value, and return that value.
+
+    Args:
+        condition (function):
+            Specifies the function which reads the registers.
+        name (string):
+            Specifies the name under which the wait is counted and reported.
+        timeout (number):
+            Specifies the time, in seconds, to wait. None waits indefinitely.
+            The default is the configured timeout.
+        strategy (PollStrategy):
+            Specifies how to wait between reads. The default is the configured
+            strategy.
+
+    Raises:
+        PollTimeoutError:
+            The condition is still false when the timeout expires.
+    """
+    value = condition()
+    if value:
+        poller.record(name, 1, 0.0)
+        return value
+
+    timeout = poller.timeout if timeout is _DEFAULT else timeout
+    strategy = strategy or poller.strategy
+    start_time = time.monotonic()
+    deadline = None if timeout is None else start_time + timeout
+    sleep = 0.00001
+    iterations = 1
+    while True:
+        if iterations > poller.spin_iterations:
+            if strategy == PollStrategy.SPIN_THEN_YIELD:
+                time.sleep(0)
+            elif strategy == PollStrategy.BACKOFF:
+                time.sleep(sleep)
+                sleep = min(sleep * 2, poller.max_sleep)
+        value = condition()
+        iterations += 1
+        now = time.monotonic()
+        if value:
+            poller.record(name, iterations, now - start_time)
+            return value
+        if deadline is not None and now >= deadline:
+            poller.record(name, iterations, now - start_time, True)
+            raise PollTimeoutError('%s did not reach the expected value within %g seconds.' % (name, timeout))
@@ -0,0 +1,369 @@
+"""
+Streaming processing of analog input blocks.
+
+The stages keep their state between blocks, so the blocks of a continuous
+acquisition are processed as one signal, for example,
+
+    stage = MultiRateStage(100000, [100000, 100])
+    for block in AI.stream(10000, return_type='numpy'):
+        fast, slow = stage.process(block)
+
+RunningStatistics keeps the mean, RMS, standard deviation, minimum, and
+maximum of each channel, so a monitor can poll snapshot() instead of
+copying the samples.
+
+This module needs NumPy.
+"""
+import threading
+from collections import deque
+
+import numpy
+from numpy.lib.stride_tricks import as_strided
+
+from .waveform import Waveform
+
+
+def _stage_factors(factor, maximum=10):
+    """
+    Splits a decimation factor into the factors of a cascade, each at most
+    maximum when the factor allows it, largest first.
+    """
+    factors = []
+    while factor > 1:
+        divisors = [divisor for divisor in range(min(factor, maximum), 1, -1) if factor % divisor == 0]
+        divisor = divisors[0] if divisors else factor
+        factors.append(divisor)
+        factor //= divisor
+    return factors
+
+
+def lowpass_taps(factor, cutoff=0.8, taps_per_factor=24):
+    """
+    Returns the taps of a linear-phase windowed-sinc low-pass filter for
+    decimation by factor, with unity gain at DC.
+
+    Args:
+        factor (number):
+            Specifies the decimation factor.
+        cutoff (number):
+            Specifies the cutoff frequency as a fraction of the Nyquist
+            frequency of the output. The default is 0.8.
+        taps_per_factor (number):
+            Specifies the number of taps per unit of factor. More taps give
+            a steeper transition. The default is 24.
+    """
+    length = taps_per_factor * factor + 1
+    center = (length - 1) / 2.0
+    taps = numpy.sinc(cutoff / factor * (numpy.arange(length) - center)) * numpy.blackman(length)
+    return taps / taps.sum()
+
+
+class _FIRDecimator(object):
+    """
+    One stage of FIR decimation of the rows of blocks. The last input
+    samples and the phase of the next output are kept between blocks.
+    """
+    def __init__(self, factor, number_of_channels, cutoff, taps_per_factor):
+        self.factor = factor
+        # the outputs are dot products with the taps in reverse order
+        self.taps = lowpass_taps(factor, cutoff, taps_per_factor)[::-1].copy()
+        self.number_of_channels = number_of_channels
+        self.reset()
+
+    def reset(self):
+        self.history = numpy.zeros((self.number_of_channels, len(self.taps) - 1))
+        self.offset = 0
+
+    def process(self, data):
+        """
+        Returns the outputs of the block and the position, in input samples
+        relative to the first sample of the block, of the first output.
+        """
+        length = len(self.taps)
+        extended = numpy.concatenate((self.history, data), axis=1)
+        available = extended.shape[1] - length - self.offset
+        number_of_outputs = available // self.factor + 1 if available >= 0 else 0
+        # the windows of the outputs are strided views of the input
+        start = extended[:, self.offset:]
+        windows = as_strided(start, shape=(self.number_of_channels, number_of_outputs, length),
+                             strides=(start.strides[0], start.strides[1] * self.factor, start.strides[1]))
+        outputs = numpy.dot(windows, self.taps)
+        # an output stands for the center of its window
+        position = self.offset - (length - 1) / 2.0
+        consumed = extended.shape[1] - (length - 1)
+        self.offset += number_of_outputs * self.factor - consumed
+        self.history = extended[:, consumed:].copy()
+        return outputs, position
+
+
+class Decimator(object):
+    """
+    Decimates the rows of the blocks of a stream by one factor with a
+    cascade of anti-alias FIR stages, each decimating by at most 10.
+    """
+    def __init__(self, factor, number_of_channels, cutoff=0.8, taps_per_factor=24):
+        """
+        Args:
+            factor (number):
+                Specifies the decimation factor, an integer of at least 1.
+            number_of_channels (number):
+                Specifies the number of rows of the blocks.
+            cutoff (number):
+                Specifies the cutoff frequency as a fraction of the Nyquist
+                frequency of the output. The default is 0.8.
+            taps_per_factor (number):
+                Specifies the number of taps per unit of the factor of each
+                stage. The default is 24.
+        """
+        assert factor >= 1 and int(factor) == factor
+        assert 0 < cutoff <= 1
+        self.factor = int(factor)
+        self.stages = [_FIRDecimator(stage_factor, number_of_channels, cutoff, taps_per_factor) for stage_factor in _stage_factors(self.factor)]
+
+    def reset(self):
+        """ Forget the state, so the next block starts a new signal. """
+        for stage in self.stages:
+            stage.reset()
+
+    def process(self, data):
+        """
+        Decimates a block of shape (channels, samples).
+
+        Returns:
+            outputs (ndarray):
+                Returns the output samples of the block, of shape (channels,
+                outputs). The number of outputs varies from block to block
+                when the block size is not a multiple of the factor.
+            position (number):
+                Returns the position, in input samples relative to the first
+                sample of the block, that the first output stands for. The
+                filter delay is taken into account.
+        """
+        position = 0.0
+        scale = 1
+        for stage in self.stages:
+            data, stage_position = stage.process(data)
+            position += stage_position * scale
+            scale *= stage.factor
+        return data, position
+
+
+class MultiRateStage(object):
+    """
+    Emits each channel of a stream at its own rate. The channels of the same
+    output rate share one Decimator, which processes them together.
+    """
+    def __init__(self, input_rate, output_rates, cutoff=0.8, taps_per_factor=24):
+        """
+        Args:
+            input_rate (number):
+                Specifies the sample rate, in hertz, of the blocks.
+            output_rates (list):
+                Specifies the output rate, in hertz, of each row of the
+                blocks. The input rate must be an integer multiple of each
+                output rate.
+            cutoff (number):
+                Specifies the cutoff frequency as a fraction of the Nyquist
+                frequency of each output. The default is 0.8.
+            taps_per_factor (number):
+                Specifies the number of taps per unit of decimation factor.
+                The default is 24.
+
+        Raises:
+            ValueError:
+                An output rate does not divide the input rate.
+        """
+        self.input_rate = float(input_rate)
+        self.output_rates = list(output_rates)
+        self.factors = []
+        for output_rate in self.output_rates:
+            factor = int(round(self.input_rate / output_rate))
+            if factor < 1 or abs(factor * output_rate - self.input_rate) > 1e-6 * self.input_rate:
+                raise ValueError('The input rate %g Hz is not an integer multiple of the output rate %g Hz.' % (self.input_rate, output_rate))
+            self.factors.append(factor)
+        # the rows and the decimator of each factor
+        self.groups = []
+        for factor in sorted(set(self.factors)):
+            rows = [row for row, row_factor in enumerate(self.factors) if row_factor == factor]
+            self.groups.append((rows, Decimator(factor, len(rows), cutoff, taps_per_factor)))
+
+    def reset(self):
+        """ Forget the state of every channel. """
+        for rows, decimator in self.groups:
+            decimator.reset()
+
+    def process(self, block):
+        """
+        Processes one block.
+
+        Args:
+            block (ndarray or Waveform):
+                Specifies the block, of shape (channels, samples). For
+                example, a NumPy block or a bank Waveform of AnalogInput.
+
+        Returns:
+            outputs (list):
+                Returns the output samples of each channel, in the order of
+                the rows. The outputs are 1D arrays, or single-channel
+                Waveforms with the output period and the time of their first
+                sample when the block is a Waveform.
+        """
+        data = block.data if isinstance(block, Waveform) else numpy.asarray(block, dtype=numpy.float64)
+        assert data.shape[0] == len(self.factors), 'The block must have one row per output rate.'
+        outputs = [None] * len(self.factors)
+        for rows, decimator in self.groups:
+            values, position = decimator.process(data[rows])
+            for index, row in enumerate(rows):
+                if isinstance(block, Waveform):
+                    offset = position * block.dt
+                    outputs[row] = Waveform(values[index:index + 1], block.dt * decimator.factor, block.t0 + offset,
+                                            None if block.wall_t0 is None else block.wall_t0 + offset, [block.channels[row]])
+                else:
+                    outputs[row] = values[index]
+        return outputs
+
+    def apply(self, blocks):
+        """ Processes the blocks of an iterator, such as AIStream, and yields the outputs. """
+        for block in blocks:
+            yield self.process(block)
+
+
+class _Summary(object):
+    """ The count, mean, sum of squared deviations, minimum and maximum of each channel. """
+    __slots__ = ('count', 'mean', 'm2', 'minimum', 'maximum')
+
+    def __init__(self, count, mean, m2, minimum, maximum):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.minimum = minimum
+        self.maximum = maximum
+
+    @classmethod
+    def empty(cls, number_of_channels):
+        return cls(0, numpy.zeros(number_of_channels), numpy.zeros(number_of_channels),
+                   numpy.full(number_of_channels, numpy.inf), numpy.full(number_of_channels, -numpy.inf))
+
+    @classmethod
+    def of(cls, data):
+        mean = data.mean(axis=1)
+        deviations = data - mean[:, numpy.newaxis]
+        return cls(data.shape[1], mean, numpy.einsum('ij,ij->i', deviations, deviations), data.min(axis=1), data.max(axis=1))
+
+    def merge(self, other):
+        """ Combine with the summary of other samples, with the update of Chan et al. """
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            return other
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        return _Summary(count,
+                        self.mean + delta * (float(other.count) / count),
+                        self.m2 + other.m2 + delta * delta * (float(self.count) * other.count / count),
+                        numpy.minimum(self.minimum, other.minimum),
+                        numpy.maximum(self.maximum, other.maximum))
+
+
+class RunningStatistics(object):
+    """
+    Incremental statistics of each channel of a stream of blocks. Each block
+    is reduced to one summary per channel with vectorized NumPy operations,
+    and the summaries are merged, so the state does not grow with the
+    samples. update() and snapshot() may run on different threads, for
+    example, the reader of a stream and a dashboard.
+    """
+    def __init__(self, number_of_channels, window=None):
+        """
+        Args:
+            number_of_channels (number):
+                Specifies the number of rows of the blocks.
+            window (number):
+                Specifies the number of most recent samples per channel that
+                the statistics cover. The window moves by whole blocks, so it
+                covers at least window samples once enough samples have
+                arrived. If you set window to None, the statistics cover
+                every sample since the start or reset(). The default is None.
+        """
+        assert window is None or window > 0
+        self.number_of_channels = number_of_channels
+        self.window = window
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """ Forget the samples. """
+        with self.lock:
+            # the window is a queue of two stacks, so that evicting a block
+            # and taking a snapshot merge a constant number of summaries:
+            # the newer blocks, pushed on blocks, with their merge in total,
+            # and the older blocks, on evicted_first, each merged with the
+            # newer blocks below it, so the top covers the whole stack.
+            # Without a window, total covers every sample.
+            self.total = _Summary.empty(self.number_of_channels)
+            self.blocks = []
+            self.evicted_first = []
+            # the number of samples of each block in the window, oldest first
+            self.counts = deque()
+            self.window_count = 0
+
+    def update(self, block):
+        """
+        Adds the samples of a block of shape (channels, samples), for
+        example, a NumPy block or a bank Waveform of AnalogInput.
+        """
+        data = block.data if isinstance(block, Waveform) else numpy.asarray(block, dtype=numpy.float64)
+        assert data.shape[0] == self.number_of_channels, 'The block must have %d rows.' % self.number_of_channels
+        if data.shape[1] == 0:
+            return
+        summary = _Summary.of(data)
+        with self.lock:
+            self.total = self.total.merge(summary)
+            if self.window is None:
+                return
+            self.blocks.append(summary)
+            self.counts.append(summary.count)
+            self.window_count += summary.count
+            while self.window_count - self.counts[0] >= self.window:
+                self.window_count -= self.counts.popleft()
+                if not self.evicted_first:
+                    merged = _Summary.empty(self.number_of_channels)
+                    for block in reversed(self.blocks):
+                        merged = block.merge(merged)
+                        self.evicted_first.append(merged)
+                    self.blocks = []
+                    self.total = _Summary.empty(self.number_of_channels)
+                self.evicted_first.pop()
+
+    def apply(self, blocks):
+        """ Adds the blocks of an iterator, such as AIStream, and yields each block. """
+        for block in blocks:
+            self.update(block)
+            yield block
+
+    def snapshot(self):
+        """
+        Returns the statistics of each channel.
+
+        Returns:
+            statistics (dict):
+                Returns 'count', the number of samples per channel, and the
+                arrays, with one element per channel, of 'mean', 'rms',
+                'std' (the population standard deviation), 'min', 'max', and
+                'peak_to_peak'. The arrays hold NaN before the first sample.
+        """
+        with self.lock:
+            summary = self.total
+            if self.evicted_first:
+                summary = self.evicted_first[-1].merge(summary)
+        if summary.count == 0:
+            nan = numpy.full(self.number_of_channels, numpy.nan)
+            return {'count': 0, 'mean': nan, 'rms': nan.copy(), 'std': nan.copy(), 'min': nan.copy(), 'max': nan.copy(), 'peak_to_peak': nan.copy()}
+        variance = summary.m2 / summary.count
+        return {'count': summary.count,
+                'mean': summary.mean,
+                'rms': numpy.sqrt(variance + summary.mean * summary.mean),
+                'std': numpy.sqrt(variance),
+                'min': summary.minimum,
+                'max': summary.maximum,
+                'peak_to_peak': summary.maximum - summary.minimum}
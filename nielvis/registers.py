@@ -0,0 +1,166 @@
+from collections import namedtuple
+
+from .enums import Bank, AIChannel, AOChannel, DIOChannel, EncoderChannel, DIIRQChannel, AIIRQChannel
+
+AIBankRegisters = namedtuple('AIBankRegisters', 'cnfg ready cnt cntr stat dma_enabled dma_full sync')
+AIChannelRegisters = namedtuple('AIChannelRegisters', 'single_ended differential')
+AOBankRegisters = namedtuple('AOBankRegisters', 'dma_idl dma_cntr dma_ena ele_num sync')
+DIORegisters = namedtuple('DIORegisters', 'out input direction select')
+EncoderRegisters = namedtuple('EncoderRegisters', 'cnfg cntr stat select')
+PWMRegisters = namedtuple('PWMRegisters', 'cs cnfg cmp max cntr select')
+I2CRegisters = namedtuple('I2CRegisters', 'select cntr cnfg addr cntl dato go stat dati')
+SPIRegisters = namedtuple('SPIRegisters', 'select cnt cnfg go dato dati')
+DIIRQRegisters = namedtuple('DIIRQRegisters', 'enable rise fall counter irq_number')
+AIIRQRegisters = namedtuple('AIIRQRegisters', 'irq_number hysteresis threshold cnfg')
+
+# The register names of the NI ELVIS III personality are built once at import
+# and indexed by (bank, channel) values. A channel may be given as its IntEnum
+# or its int value because both hash alike.
+_BANKS = [bank.value for bank in Bank]
+
+_AI_BANK_NAMES = dict((bank, AIBankRegisters(
+    'AI.%s.CNFG' % bank, 'AI.%s.VAL.RDY' % bank, 'AI.%s.CNT' % bank, 'AI.%s.CNTR' % bank,
+    'AI.%s.STAT' % bank, 'AI.%s.DMA_ENA' % bank, 'AI.%s.DMA_FULL' % bank, '%s.SYNC' % bank))
+    for bank in _BANKS)
+
+_AI_CHANNEL_NAMES = dict(((bank, channel.value), AIChannelRegisters(
+    'AI.%s_%d.VAL' % (bank, channel.value),
+    'AI.DIFF_%s_%d.VAL' % (bank, channel.value) if channel <= AIChannel.AI3 else None))
+    for bank in _BANKS for channel in AIChannel)
+
+_AO_BANK_NAMES = dict((bank, AOBankRegisters(
+    'AO.%s.DMA_IDL' % bank, 'AO.%s.DMA_CNTR' % bank, 'AO.%s.DMA_ENA' % bank,
+    'AO.%s.ELE_NUM' % bank, 'AO.%s.SYNC' % bank))
+    for bank in _BANKS)
+
+_AO_CHANNEL_NAMES = dict(((bank, channel.value), 'AO.%s_%d.VAL' % (bank, channel.value))
+    for bank in _BANKS for channel in AOChannel)
+
+_DIO_NAMES = dict((bank, DIORegisters(
+    'DIO.%s_19:0.OUT' % bank, 'DIO.%s_19:0.IN' % bank, 'DIO.%s_19:0.DIR' % bank, 'SYS.SELECT%s' % bank))
+    for bank in _BANKS)
+
+_ENCODER_NAMES = dict(((bank, channel.value), EncoderRegisters(
+    'ENC.%s_%d.CNFG' % (bank, channel.value), 'ENC.%s_%d.CNTR' % (bank, channel.value),
+    'ENC.%s_%d.STAT' % (bank, channel.value), 'SYS.SELECT%s' % bank))
+    for bank in _BANKS for channel in EncoderChannel)
+
+_PWM_NAMES = dict(((bank, channel.value), PWMRegisters(
+    *(['PWM.%s_%d.%s' % (bank, channel.value, name) for name in ('CS', 'CNFG', 'CMP', 'MAX', 'CNTR')]
+      + ['SYS.SELECT%s' % bank])))
+    for bank in _BANKS for channel in DIOChannel)
+
+_I2C_NAMES = dict((bank, I2CRegisters(
+    *(['SYS.SELECT%s' % bank]
+      + ['I2C.%s.%s' % (bank, name) for name in ('CNTR', 'CNFG', 'ADDR', 'CNTL', 'DATO', 'GO', 'STAT', 'DATI')])))
+    for bank in _BANKS)
+
+_SPI_NAMES = dict((bank, SPIRegisters(
+    *(['SYS.SELECT%s' % bank]
+      + ['SPI.%s.%s' % (bank, name) for name in ('CNT', 'CNFG', 'GO', 'DATO', 'DATI')])))
+    for bank in _BANKS)
+
+_DIIRQ_NAMES = dict((channel.value, DIIRQRegisters(
+    'IRQ.DIO_A_7:0.ENA', 'IRQ.DIO_A_7:0.RISE', 'IRQ.DIO_A_7:0.FALL',
+    'IRQ.DIO_A_%d.CNT' % channel.value, 'IRQ.DIO_A_%d.NO' % channel.value))
+    for channel in DIIRQChannel)
+
+_AIIRQ_NAMES = dict((channel.value, AIIRQRegisters(
+    'IRQ.AI_A_%d.NO' % channel.value, 'IRQ.AI_A_%d.HYSTERESIS' % channel.value,
+    'IRQ.AI_A_%d.THRESHOLD' % channel.value, 'IRQ.AI_A.CNFG'))
+    for channel in AIIRQChannel)
+
+# registers which only the host writes, so a shadow copy in host memory stays
+# valid until the session is reset
+SHADOWABLE_REGISTERS = frozenset(
+    ['DO.LED3:0']
+    + ['SYS.SELECT%s' % bank for bank in _BANKS]
+    + ['IRQ.DIO_A_7:0.%s' % name for name in ('ENA', 'RISE', 'FALL')]
+    + ['IRQ.DI_BTN.%s' % name for name in ('ENA', 'RISE', 'FALL')]
+    + ['IRQ.AI_A.CNFG'])
+
+
+def _bank_value(bank):
+    return bank.value if isinstance(bank, Bank) else bank
+
+
+class RegisterMap(object):
+    """
+    Typed index of the register handles of one FPGA session, for example,
+    register_map.pwm(bank, channel).cs. Each group of registers is looked up
+    in the session the first time it is used and reused afterwards.
+    """
+    def __init__(self, registers):
+        """
+        Args:
+            registers (dict):
+                Specifies the registers of the FPGA session, indexed by name.
+        """
+        self.registers = registers
+        self.__resolved = {}
+
+    def __resolve(self, group, key, names):
+        handles = self.__resolved.get((group, key))
+        if handles is None:
+            if isinstance(names, tuple):
+                handles = type(names)(*[None if name is None else self.registers[name] for name in names])
+            else:
+                handles = self.registers[names]
+            self.__resolved[(group, key)] = handles
+        return handles
+
+    def ai(self, bank):
+        """ Return the AI configuration registers of the bank. """
+        bank = _bank_value(bank)
+        return self.__resolve('ai', bank, _AI_BANK_NAMES[bank])
+
+    def ai_channel(self, bank, channel, differential=False):
+        """ Return the value register of the single-ended or differential AI channel. """
+        key = (_bank_value(bank), channel)
+        names = _AI_CHANNEL_NAMES[key]
+        name = names.differential if differential else names.single_ended
+        assert name is not None, 'the valid range for channel is AI0 to AI3 in differential mode'
+        return self.__resolve('ai_channel', key + (differential,), name)
+
+    def ao(self, bank):
+        """ Return the AO DMA registers of the bank. """
+        bank = _bank_value(bank)
+        return self.__resolve('ao', bank, _AO_BANK_NAMES[bank])
+
+    def ao_channel(self, bank, channel):
+        """ Return the value register of the AO channel. """
+        key = (_bank_value(bank), channel)
+        return self.__resolve('ao_channel', key, _AO_CHANNEL_NAMES[key])
+
+    def dio(self, bank):
+        """ Return the DIO registers of the bank. """
+        bank = _bank_value(bank)
+        return self.__resolve('dio', bank, _DIO_NAMES[bank])
+
+    def encoder(self, bank, channel):
+        """ Return the registers of the encoder channel. """
+        key = (_bank_value(bank), channel)
+        return self.__resolve('encoder', key, _ENCODER_NAMES[key])
+
+    def pwm(self, bank, channel):
+        """ Return the registers of the PWM channel. """
+        key = (_bank_value(bank), channel)
+        return self.__resolve('pwm', key, _PWM_NAMES[key])
+
+    def i2c(self, bank):
+        """ Return the I2C registers of the bank. """
+        bank = _bank_value(bank)
+        return self.__resolve('i2c', bank, _I2C_NAMES[bank])
+
+    def spi(self, bank):
+        """ Return the SPI registers of the bank. """
+        bank = _bank_value(bank)
+        return self.__resolve('spi', bank, _SPI_NAMES[bank])
+
+    def diirq(self, channel):
+        """ Return the interrupt registers of the DI IRQ channel. """
+        return self.__resolve('diirq', channel, _DIIRQ_NAMES[channel])
+
+    def aiirq(self, channel):
+        """ Return the interrupt registers of the AI IRQ channel. """
+        return self.__resolve('aiirq', channel, _AIIRQ_NAMES[channel])
@@ -0,0 +1,544 @@
+import os
+import time
+import threading
+from collections import OrderedDict, namedtuple
+
+from .enums import VerifyPolicy
+from .registers import RegisterMap, SHADOWABLE_REGISTERS
+from .polling import wait_until
+from . import tracing
+
+# the resource name which selects the in-process simulator of the FPGA
+SIMULATOR_RESOURCE = 'SIM'
+
+_MISSING = object()
+
+
+class ShadowCache(object):
+    """
+    Host copies of the registers which only the host writes. The cache is
+    disabled by default; enable it per session, or set the NIELVIS_SHADOW
+    environment variable to 1.
+    """
+    def __init__(self):
+        self.enabled = os.environ.get('NIELVIS_SHADOW', '0') not in ('', '0')
+        self.values = {}
+        self.hits = 0
+        self.skipped_writes = 0
+
+    def invalidate(self, name=None):
+        """
+        Forget the copy of the register, or of all registers when name is
+        None, so that the next read goes to the FPGA.
+        """
+        if name is None:
+            self.values.clear()
+        else:
+            self.values.pop(name, None)
+
+
+class ShadowRegister(object):
+    """
+    A register whose reads are served from the shadow cache and whose writes
+    are skipped when they would not change the value.
+    """
+    def __init__(self, register, name, cache):
+        self.register = register
+        self.name = name
+        self.cache = cache
+
+    def read(self):
+        cache = self.cache
+        if cache.enabled and self.name in cache.values:
+            cache.hits += 1
+            return cache.values[self.name]
+        value = self.register.read()
+        if cache.enabled:
+            cache.values[self.name] = value
+        return value
+
+    def write(self, value):
+        cache = self.cache
+        if cache.enabled:
+            if cache.values.get(self.name, _MISSING) == value:
+                cache.skipped_writes += 1
+                return
+            self.register.write(value)
+            cache.values[self.name] = value
+        else:
+            cache.values.pop(self.name, None)
+            self.register.write(value)
+
+    def __getattr__(self, name):
+        return getattr(self.register, name)
+
+
+def _hashable(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+class RegisterTransaction(object):
+    """
+    Register writes which are staged and then committed in one pass. Use it
+    as a context manager; the writes are committed when the block exits
+    without an exception and discarded otherwise.
+
+    nifpga writes each register separately, so a commit is not faster than
+    the same writes made directly. Use a transaction where the writes must
+    be applied together or not at all, and write registers directly on the
+    paths which run per call, such as PWM.generate().
+    """
+    def __init__(self, session, verify=False):
+        self.session = session
+        self.verify = verify
+        self.writes = OrderedDict()
+
+    def write(self, register, value):
+        """
+        Stage a register write. A register staged again keeps its first
+        position and takes the last value.
+
+        Args:
+            register (Register):
+                Specifies the register to write.
+            value:
+                Specifies the value to write.
+        """
+        self.writes[register.name] = (register, value)
+
+    def commit(self):
+        """
+        Write the staged values in the order they were first staged, then read
+        them back once if the transaction verifies, as the verification
+        policy of the session requires.
+        """
+        writes = list(self.writes.items())
+        self.writes.clear()
+        for name, (register, value) in writes:
+            register.write(value)
+        if self.verify and writes:
+            self.session.verify(lambda: all(register.read() == value for name, (register, value) in writes),
+                                ', '.join(name for name, _ in writes),
+                                tuple((name, _hashable(value)) for name, (register, value) in writes))
+
+    def discard(self):
+        """ Drop the staged writes. """
+        self.writes.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception_val, trace):
+        if exception_type is None:
+            self.commit()
+        else:
+            self.discard()
+
+
+class FixedPointFormat(namedtuple('FixedPointFormat', 'signed word_length integer_word_length')):
+    """
+    The fixed-point type of the elements of a DMA FIFO. The integer code c of
+    an element stands for the value c * 2 ** (integer_word_length -
+    word_length).
+    """
+    __slots__ = ()
+
+    @property
+    def lsb_weight(self):
+        """ The value of one code. """
+        return 2.0 ** (self.integer_word_length - self.word_length)
+
+    def to_codes(self, words):
+        """
+        Converts the FIFO words, as a NumPy array, into signed integer codes.
+        The bits above the word length, for example, an overflow status bit,
+        are dropped.
+        """
+        import numpy
+        codes = numpy.asarray(words).astype(numpy.int64) & ((1 << self.word_length) - 1)
+        if self.signed:
+            codes -= (codes & (1 << (self.word_length - 1))) << 1
+        return codes
+
+    def to_volts(self, codes, offset=0.0):
+        """
+        Scales integer codes into float64 values with one vectorized
+        multiply-add.
+        """
+        import numpy
+        values = numpy.multiply(codes, self.lsb_weight, dtype=numpy.float64)
+        if offset:
+            values += offset
+        return values
+
+
+def _is_fixed_point_fifo(fifo):
+    """
+    Returns whether the nifpga FIFO transfers fixed-point elements. nifpga
+    transfers them as 64-bit words, with the overflow status bit, if any,
+    above the word length.
+    """
+    return str(getattr(fifo, 'datatype', '')) == 'Fxp' and hasattr(fifo, '_type') and hasattr(fifo, '_read_func')
+
+
+def supports_raw_reads(fifo):
+    """
+    Returns whether read_raw_fifo() can read the DMA FIFO, that is, whether
+    the FIFO transfers fixed-point elements.
+    """
+    if isinstance(fifo, tracing.TracedFifo):
+        fifo = fifo.fifo
+    return hasattr(fifo, 'read_raw') or _is_fixed_point_fifo(fifo)
+
+
+def fixed_point_format(fifo):
+    """
+    Returns the FixedPointFormat of the elements of the DMA FIFO, as the
+    bitfile declares it.
+
+    Raises:
+        TypeError:
+            The FIFO does not transfer fixed-point elements.
+    """
+    if isinstance(fifo, tracing.TracedFifo):
+        fifo = fifo.fifo
+    fixed_point = getattr(fifo, 'fixed_point_format', None)
+    if fixed_point is not None:
+        return fixed_point
+    if not _is_fixed_point_fifo(fifo):
+        raise TypeError('The %s FIFO does not transfer fixed-point elements, so it does not support raw reads.' % getattr(fifo, 'name', 'DMA'))
+    fixed_point_type = fifo._type
+    return FixedPointFormat(fixed_point_type._signed, fixed_point_type._word_length, fixed_point_type._integer_word_length)
+
+
+def _read_fifo_words(fifo, number_of_elements, timeout_ms):
+    """
+    Reads the elements of a fixed-point nifpga FIFO into a NumPy uint64 array
+    with one call of NiFpga_ReadFifoU64, instead of converting each element
+    to a Decimal as the read() function of the FIFO does.
+    """
+    import ctypes
+    import numpy
+    if not _is_fixed_point_fifo(fifo):
+        raise TypeError('The %s FIFO does not transfer fixed-point elements, so it does not support raw reads.' % getattr(fifo, 'name', 'DMA'))
+    words = numpy.empty(number_of_elements, dtype=numpy.uint64)
+    elements_remaining = ctypes.c_size_t()
+    fifo._read_func(fifo._session, fifo._number, words.ctypes.data_as(ctypes.POINTER(ctypes.c_uint64)),
+                    number_of_elements, timeout_ms, elements_remaining)
+    return words, elements_remaining.value
+
+
+def read_raw_fifo(fifo, number_of_elements, timeout_ms=0):
+    """
+    Reads the elements of a fixed-point DMA FIFO as a NumPy array of unsigned
+    words, without converting them to floats. Returns the words and the
+    number of elements remaining, like the read() function of the FIFO.
+
+    Raises:
+        TypeError:
+            The FIFO does not transfer fixed-point elements.
+    """
+    is_traced = isinstance(fifo, tracing.TracedFifo) and tracing.tracer.enabled
+    if isinstance(fifo, tracing.TracedFifo):
+        name = fifo.name
+        fifo = fifo.fifo
+    start_time = time.perf_counter()
+    if hasattr(fifo, 'read_raw'):
+        read_values = fifo.read_raw(number_of_elements, timeout_ms=timeout_ms)
+    else:
+        read_values = _read_fifo_words(fifo, number_of_elements, timeout_ms)
+    if is_traced:
+        tracing.tracer.record(name, 1, 0, number_of_elements * tracing.FIFO_ELEMENT_SIZE, time.perf_counter() - start_time)
+    return read_values
+
+
+class _RegisterView(object):
+    """
+    The registers of a session, indexed by name. The returned registers count
+    their accesses while tracing is enabled, so the handles which the APIs
+    keep are traced when tracing is enabled later, and the registers which
+    only the host writes go through the shadow cache.
+    """
+    def __init__(self, registers, traced_type, shadow_cache=None):
+        self.registers = registers
+        self.traced_type = traced_type
+        self.shadow_cache = shadow_cache
+
+    def __getitem__(self, name):
+        register = self.traced_type(self.registers[name], name)
+        if self.shadow_cache is not None and name in SHADOWABLE_REGISTERS:
+            register = ShadowRegister(register, name, self.shadow_cache)
+        return register
+
+    def __contains__(self, name):
+        return name in self.registers
+
+    def __iter__(self):
+        return iter(self.registers)
+
+    def __len__(self):
+        return len(self.registers)
+
+    def keys(self):
+        return self.registers.keys()
+
+
+class SharedSession(object):
+    """
+    A reference-counted FPGA session which is shared by every NI ELVIS III
+    API opened on the same bitfile and resource.
+    """
+    def __init__(self, key, session):
+        """
+        Args:
+            key (tuple):
+                Specifies the (bitfile, resource) pair of the session.
+            session (Session):
+                Specifies the FPGA session opened on the target.
+        """
+        self.key = key
+        self.fpga_session = session
+        self.shadow_cache = ShadowCache()
+        self.registers = _RegisterView(session.registers, tracing.TracedRegister, self.shadow_cache)
+        self.fifos = _RegisterView(session.fifos, tracing.TracedFifo)
+        self.register_map = RegisterMap(self.registers)
+        self.reference_count = 0
+        # the configurations that the APIs last applied to the FPGA, keyed by
+        # the API and bank; they are lost when the FPGA is reset on close
+        self.applied_configurations = {}
+        self.verify_policy = VerifyPolicy(os.environ.get('NIELVIS_VERIFY', 'always'))
+        self.verify_sample_interval = 0
+        self.verified_configurations = set()
+        self.verify_lock = threading.Lock()
+        self.verifications = 0
+        self.skipped_verifications = 0
+
+    def transaction(self, verify=False):
+        """
+        Return a transaction which stages register writes and commits them in
+        one pass, for example,
+
+            with session.transaction() as transaction:
+                transaction.write(cnfg, value)
+
+        Args:
+            verify (bool):
+                Specifies whether to read back the written registers once
+                after the commit.
+        """
+        return RegisterTransaction(self, verify)
+
+    def enable_shadow_cache(self, enabled=True):
+        """
+        Serve the reads of the registers which only the host writes, such as
+        the LEDs, SYS.SELECT, and the DI and AI IRQ configuration, from host
+        memory, and skip the writes which do not change their value.
+
+        Args:
+            enabled (bool):
+                Specifies whether to use the shadow cache. Disabling the cache
+                also clears it.
+        """
+        self.shadow_cache.enabled = enabled
+        if not enabled:
+            self.shadow_cache.invalidate()
+
+    def invalidate_shadow_cache(self, name=None):
+        """
+        Read the register, or all registers when name is None, from the FPGA
+        again. Call it after the FPGA is reset or when another process writes
+        the registers.
+
+        Args:
+            name (string):
+                Specifies the name of the register, for example, 'DO.LED3:0'.
+        """
+        self.shadow_cache.invalidate(name)
+
+    def configure_verification(self, policy=None, sample_interval=None):
+        """
+        Configure when the APIs read back the configuration registers they
+        write. The default policy is ALWAYS, or the NIELVIS_VERIFY environment
+        variable.
+
+        Args:
+            policy (VerifyPolicy):
+                Specifies when to read back the registers.
+            sample_interval (int):
+                Specifies a debug mode which still reads back one in every
+                sample_interval writes that the policy skips. 0 disables the
+                debug mode.
+        """
+        if policy is not None:
+            assert policy in VerifyPolicy
+            self.verify_policy = policy
+            with self.verify_lock:
+                self.verified_configurations.clear()
+        if sample_interval is not None:
+            assert sample_interval >= 0
+            self.verify_sample_interval = sample_interval
+
+    def verify(self, condition, name, configuration=None):
+        """
+        Wait until condition() reads back the values just written, as the
+        verification policy requires.
+
+        Args:
+            condition (function):
+                Specifies the function which reads back the registers.
+            name (string):
+                Specifies the name of the polled registers.
+            configuration (hashable):
+                Specifies the values written, which identify the
+                configuration for the ONCE policy.
+        """
+        policy = self.verify_policy
+        key = (name, configuration)
+        # the banks of one read are configured on their own threads, so the
+        # counters are updated under the lock, but the registers are polled
+        # outside of it
+        with self.verify_lock:
+            is_verified = policy == VerifyPolicy.ALWAYS or (policy == VerifyPolicy.ONCE and key not in self.verified_configurations)
+            if not is_verified:
+                self.skipped_verifications += 1
+                is_verified = bool(self.verify_sample_interval) and self.skipped_verifications % self.verify_sample_interval == 0
+        if not is_verified:
+            return
+        wait_until(condition, name)
+        with self.verify_lock:
+            if policy == VerifyPolicy.ONCE:
+                self.verified_configurations.add(key)
+            self.verifications += 1
+
+    def wait_on_irqs(self, irqs, timeout):
+        return self.fpga_session.wait_on_irqs(irqs, timeout)
+
+    def acknowledge_irqs(self, irqs):
+        self.fpga_session.acknowledge_irqs(irqs)
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_cache_directory():
+    """
+    Return the directory where the parsed bitfile metadata is cached. The
+    directory is NIELVIS_CACHE_DIR if it is set, otherwise nielvis in the
+    user cache directory.
+    """
+    if 'NIELVIS_CACHE_DIR' in os.environ:
+        return os.environ['NIELVIS_CACHE_DIR']
+    cache_home = os.environ.get('XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'nielvis')
+
+
+def _hash_file(path):
+    import hashlib
+    digest = hashlib.sha256()
+    with open(path, 'rb') as bitfile:
+        for block in iter(lambda: bitfile.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _parse_bitfile(path):
+    from nifpga.bitfile import Bitfile
+    return Bitfile(path)
+
+
+def load_bitfile(path):
+    """
+    Return the parsed bitfile, which holds the register names, offsets,
+    datatypes, and FIFO descriptors of the FPGA personality. Parsing the
+    bitfile XML is slow on the target, so the parsed bitfile is cached on
+    disk, keyed by the hash of the bitfile content, and later processes load
+    it with a single unpickle.
+
+    Args:
+        path (string):
+            Specifies the path of the bitfile.
+
+    Returns:
+        bitfile (Bitfile):
+            Returns the parsed bitfile.
+    """
+    import pickle
+    cache_path = os.path.join(get_cache_directory(), _hash_file(path) + '.pickle')
+    try:
+        with open(cache_path, 'rb') as cache:
+            bitfile = pickle.load(cache)
+        if bitfile.filepath == path:
+            return bitfile
+    except Exception:
+        # a missing, stale, or unreadable cache entry is parsed again below
+        pass
+
+    bitfile = _parse_bitfile(path)
+    temporary_path = '%s.%d.tmp' % (cache_path, os.getpid())
+    try:
+        if not os.path.isdir(os.path.dirname(cache_path)):
+            os.makedirs(os.path.dirname(cache_path))
+        with open(temporary_path, 'wb') as cache:
+            pickle.dump(bitfile, cache, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, cache_path)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        # the cache is only an optimization, so the session still opens
+        # when the cache directory is read-only or the bitfile cannot be
+        # pickled
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+    return bitfile
+
+
+def open_session(bitfile, resource):
+    """
+    Borrow the FPGA session for the bitfile and resource. The session is
+    opened by the first caller and shared by all following callers until
+    every caller releases it.
+
+    Args:
+        bitfile (string):
+            Specifies the path of the bitfile to download to the target.
+        resource (string):
+            Specifies the resource name of the target, for example, RIO0.
+            Pass SIMULATOR_RESOURCE, or set the NIELVIS_BACKEND environment
+            variable to 'simulator', to open a simulated session.
+
+    Returns:
+        shared_session (SharedSession):
+            Returns the session shared by all APIs on the target.
+    """
+    key = (bitfile, resource)
+    with _sessions_lock:
+        shared_session = _sessions.get(key)
+        if shared_session is None:
+            if resource == SIMULATOR_RESOURCE or os.environ.get('NIELVIS_BACKEND') == 'simulator':
+                from .simulator import SimulatedSession
+                fpga_session = SimulatedSession(bitfile, resource)
+            else:
+                # nifpga is imported when the first session is opened so that
+                # importing nielvis stays fast
+                from nifpga import Session
+                fpga_session = Session(load_bitfile(bitfile), resource)
+            shared_session = SharedSession(key, fpga_session)
+            _sessions[key] = shared_session
+        shared_session.reference_count += 1
+        return shared_session
+
+
+def release_session(shared_session):
+    """
+    Return a session borrowed by open_session(). The FPGA session is closed,
+    and the FPGA is reset, only when the last user releases it.
+
+    Args:
+        shared_session (SharedSession):
+            Specifies the session to release.
+    """
+    with _sessions_lock:
+        assert shared_session.reference_count > 0, 'The session has already been released by all of its users.'
+        shared_session.reference_count -= 1
+        if shared_session.reference_count == 0:
+            del _sessions[shared_session.key]
+            shared_session.fpga_session.close(True)
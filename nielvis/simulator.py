@@ -0,0 +1,555 @@
+"""
+In-process simulation of the NI ELVIS III FPGA personality.
+
+The simulator provides the part of the nifpga Session API used by nielvis, so
+every API can run off-target, for example, to test or benchmark the Python
+code on a computer without an NI ELVIS III. Open the APIs with
+ELVISIII.ResourceName set to SIMULATOR_RESOURCE, or set the NIELVIS_BACKEND
+environment variable to 'simulator'.
+"""
+import time
+import threading
+from collections import namedtuple
+
+from .enums import Bank, AIChannel, AOChannel, DIOChannel, EncoderChannel, DIIRQChannel, AIIRQChannel
+from . import registers as names
+from .session import SIMULATOR_RESOURCE, FixedPointFormat
+
+FPGA_CLOCK_RATE = 40000000
+
+FifoReadValues = namedtuple('FifoReadValues', 'data elements_remaining')
+IrqStatus = namedtuple('IrqStatus', 'irqs_asserted timed_out')
+
+# the AI configuration written for one point reads
+DEFAULT_AI_CNFG = [8, 9, 10, 11, 12, 13, 14, 15, 0, 1, 2, 3]
+# the range, in volts, of bits 4 and 5 of an AI configuration element
+AI_RANGES = [10.0, 5.0, 2.0, 1.0]
+# the fixed-point type of the elements of the AI DMA FIFOs
+AI_FIFO_FORMAT = FixedPointFormat(True, 24, 5)
+AO_DONE_IRQ = { 'A': 31, 'B': 30 }
+SPI_DONE_IRQ = { 'A': 27, 'B': 26 }
+TIMER_IRQ = 0
+
+
+class SimulatedRegister(object):
+    """ A register of the simulated FPGA personality. """
+    def __init__(self, name, value=0, on_read=None, on_write=None):
+        self.name = name
+        self.value = value
+        self.on_read = on_read
+        self.on_write = on_write
+
+    def read(self):
+        if self.on_read is not None:
+            return self.on_read()
+        if isinstance(self.value, list):
+            return list(self.value)
+        return self.value
+
+    def write(self, value):
+        self.value = list(value) if isinstance(value, (list, tuple)) else value
+        if self.on_write is not None:
+            self.on_write(value)
+
+
+class _SimulatedAIBank(object):
+    """
+    Analog input bank. The bank acquires while CNT is greater than zero and
+    DMA_ENA is set, and it fills the DMA FIFO at FPGA_CLOCK_RATE / CNTR
+    elements per second, scanning the first CNT elements of CNFG.
+    """
+    def __init__(self, simulator, bank):
+        self.simulator = simulator
+        self.bank = bank
+        register_names = names._AI_BANK_NAMES[bank]
+        self.cnfg = simulator.add(register_names.cnfg, list(DEFAULT_AI_CNFG))
+        self.ready = simulator.add(register_names.ready, True)
+        self.cnt = simulator.add(register_names.cnt, 0, on_write=self.__update)
+        self.cntr = simulator.add(register_names.cntr, 1000, on_write=self.__update)
+        self.stat = simulator.add(register_names.stat, on_read=lambda: int(self.start_time is not None))
+        self.dma_enabled = simulator.add(register_names.dma_enabled, False, on_write=self.__update)
+        self.dma_full = simulator.add(register_names.dma_full, on_read=lambda: self.__backlog()[1])
+        self.sync = simulator.add(register_names.sync, False)
+        self.fifo = simulator.add_fifo('AI.%s.DMA' % bank, SimulatedAIFifo(self))
+        for channel in AIChannel:
+            channel_names = names._AI_CHANNEL_NAMES[(bank, channel.value)]
+            simulator.add(channel_names.single_ended, on_read=self.__value_reader(channel.value))
+            if channel_names.differential is not None:
+                simulator.add(channel_names.differential, on_read=self.__value_reader(channel.value + 8))
+        self.start_time = None
+        self.rate = 0.0
+        self.scan = []
+        self.produced = 0
+        self.consumed = 0
+        self.overflowed = False
+
+    def __update(self, value):
+        with self.simulator.lock:
+            running = self.cnt.value > 0 and bool(self.dma_enabled.value) and self.cntr.value > 0
+            if running and self.start_time is None:
+                self.start_time = self.simulator.now()
+                self.rate = float(FPGA_CLOCK_RATE) / self.cntr.value
+                self.scan = [self.simulator.analog_source(self.bank, element) for element in self.cnfg.value[:self.cnt.value]]
+                self.produced = 0
+                self.consumed = 0
+                self.overflowed = False
+            elif not running and self.start_time is not None:
+                self.produced = self.__produced()
+                self.start_time = None
+
+    def __produced(self):
+        if self.start_time is None:
+            return self.produced
+        return int((self.simulator.now() - self.start_time) * self.rate)
+
+    def __backlog(self):
+        """ Return the number of elements in the FIFO and whether it overflowed. """
+        backlog = self.__produced() - self.consumed
+        if backlog > self.fifo.depth:
+            # the FPGA drops the elements which do not fit into the FIFO
+            self.consumed += backlog - self.fifo.depth
+            backlog = self.fifo.depth
+            self.overflowed = True
+        return backlog, self.overflowed
+
+    def flush(self):
+        with self.simulator.lock:
+            self.consumed += self.__backlog()[0]
+
+    def read(self, number_of_elements, timeout_ms):
+        deadline = None if timeout_ms < 0 else self.simulator.now() + timeout_ms / 1000.0
+        while True:
+            with self.simulator.lock:
+                backlog = self.__backlog()[0]
+                if backlog >= number_of_elements:
+                    first = self.consumed
+                    self.consumed += number_of_elements
+                    scan = self.scan
+                    period = 1.0 / self.rate if self.rate else 0.0
+                    start_time = self.start_time or 0.0
+                    break
+                if self.start_time is None or (deadline is not None and self.simulator.now() >= deadline):
+                    raise TimeoutError('The simulated AI.%s.DMA FIFO timed out before %d elements were available.' % (self.bank, number_of_elements))
+                wait = (number_of_elements - backlog) / self.rate
+            if deadline is not None:
+                wait = min(wait, max(deadline - self.simulator.now(), 0))
+            time.sleep(wait)
+
+        scan_length = len(scan)
+        data = [scan[index % scan_length](start_time + index * period) for index in range(first, first + number_of_elements)]
+        return FifoReadValues(data, backlog - number_of_elements)
+
+    def __value_reader(self, slot):
+        def read():
+            return self.simulator.analog_source(self.bank, self.cnfg.value[slot])(self.simulator.now())
+        return read
+
+
+class FifoDataAccessor(object):
+    """
+    The values of a FIFO read. Like the values that nifpga returns, they can
+    be iterated and indexed with an integer, but not sliced.
+    """
+    def __init__(self, values):
+        self.values = values
+
+    def __len__(self):
+        return len(self.values)
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __getitem__(self, index):
+        if not isinstance(index, int):
+            raise TypeError('The values of a FIFO read can only be indexed with an integer.')
+        return self.values[index]
+
+
+class SimulatedAIFifo(object):
+    """ Target-to-host DMA FIFO of an analog input bank. """
+    fixed_point_format = AI_FIFO_FORMAT
+
+    def __init__(self, bank):
+        self.bank = bank
+        self.depth = 0
+
+    def configure(self, depth):
+        self.depth = depth
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.bank.flush()
+
+    def read(self, number_of_elements, timeout_ms=0):
+        data, elements_remaining = self.bank.read(number_of_elements, timeout_ms)
+        return FifoReadValues(FifoDataAccessor(data), elements_remaining)
+
+    def read_raw(self, number_of_elements, timeout_ms=0):
+        """
+        Read the elements as the unsigned 64-bit words that nifpga transfers,
+        in a NumPy array.
+        """
+        import numpy
+        data, elements_remaining = self.bank.read(number_of_elements, timeout_ms)
+        word_length = self.fixed_point_format.word_length
+        largest = (1 << (word_length - 1)) - 1
+        codes = numpy.clip(numpy.rint(numpy.asarray(data, dtype=numpy.float64) / self.fixed_point_format.lsb_weight), -largest - 1, largest)
+        words = codes.astype(numpy.int64).astype(numpy.uint64) & numpy.uint64((1 << word_length) - 1)
+        return FifoReadValues(words, elements_remaining)
+
+
+class _SimulatedAOBank(object):
+    """
+    Analog output bank. While DMA_ENA is not zero, the bank drains the DMA
+    FIFO at FPGA_CLOCK_RATE / DMA_CNTR samples per second on each enabled
+    channel, and it asserts the done IRQ when the FIFO runs empty.
+    """
+    def __init__(self, simulator, bank):
+        self.simulator = simulator
+        self.bank = bank
+        register_names = names._AO_BANK_NAMES[bank]
+        self.dma_idl = simulator.add(register_names.dma_idl, True)
+        self.dma_cntr = simulator.add(register_names.dma_cntr, 0, on_write=self.__update)
+        self.dma_ena = simulator.add(register_names.dma_ena, 0, on_write=self.__update)
+        self.ele_num = simulator.add(register_names.ele_num, on_read=self.__pending)
+        self.sync = simulator.add(register_names.sync, False)
+        self.fifo = simulator.add_fifo('AO.%s.DMA' % bank, SimulatedAOFifo(self))
+        for channel in AOChannel:
+            simulator.add(names._AO_CHANNEL_NAMES[(bank, channel.value)], 0.0)
+        self.pending = 0
+        self.last_update = simulator.now()
+        self.written = False
+        self.samples_generated = 0
+
+    def __rate(self):
+        channels = bin(int(self.dma_ena.value) & 3).count('1')
+        if not channels or not self.dma_cntr.value:
+            return 0.0
+        return float(FPGA_CLOCK_RATE) / self.dma_cntr.value * channels
+
+    def __update(self, value=None):
+        with self.simulator.lock:
+            now = self.simulator.now()
+            rate = self.__rate()
+            if rate and self.pending:
+                generated = min(self.pending, int((now - self.last_update) * rate))
+                self.pending -= generated
+                self.samples_generated += generated
+                self.last_update += generated / rate
+            if not rate or not self.pending:
+                self.last_update = now
+            if self.written and not self.pending and self.dma_ena.value:
+                self.written = False
+                self.simulator.assert_irqs([AO_DONE_IRQ[self.bank]])
+
+    def __pending(self):
+        self.__update()
+        return self.pending
+
+    def update(self):
+        self.__update()
+
+    def flush(self):
+        with self.simulator.lock:
+            self.pending = 0
+            self.written = False
+
+    def write(self, data, timeout_ms):
+        with self.simulator.lock:
+            self.__update()
+            space = self.fifo.depth - self.pending
+            if len(data) > space:
+                raise TimeoutError('The simulated AO.%s.DMA FIFO has space for %d of the %d elements.' % (self.bank, space, len(data)))
+            if data:
+                self.pending += len(data)
+                self.written = True
+            return self.fifo.depth - self.pending
+
+
+class SimulatedAOFifo(object):
+    """ Host-to-target DMA FIFO of an analog output bank. """
+    def __init__(self, bank):
+        self.bank = bank
+        self.depth = 0
+
+    def configure(self, depth):
+        self.depth = depth
+
+    def start(self):
+        pass
+
+    def stop(self):
+        self.bank.flush()
+
+    def write(self, data, timeout_ms=0):
+        return self.bank.write(data, timeout_ms)
+
+
+class SimulatedSession(object):
+    """
+    Simulated FPGA session of the NI ELVIS III personality. It models the
+    registers, the AI and AO DMA FIFOs, the IRQ lines, and the STAT handshakes
+    that nielvis uses.
+
+    The inputs of the simulated device are set with set_analog_input(),
+    set_digital_input(), press_button(), set_encoder_count(), and
+    i2c_read_data. The last values written to the analog outputs are kept in
+    analog_outputs.
+    """
+    def __init__(self, bitfile=None, resource=SIMULATOR_RESOURCE):
+        self.bitfile = bitfile
+        self.resource = resource
+        self.lock = threading.RLock()
+        self.irq_condition = threading.Condition(self.lock)
+        self.start_time = time.monotonic()
+        self.registers = {}
+        self.fifos = {}
+        self.asserted_irqs = set()
+        self.analog_inputs = {}
+        self.digital_inputs = { 'A': 0, 'B': 0 }
+        self.analog_outputs = {}
+        self.i2c_read_data = { 'A': [], 'B': [] }
+        self.timer_deadline = None
+
+        self.ai = dict((bank.value, _SimulatedAIBank(self, bank.value)) for bank in Bank)
+        self.ao = dict((bank.value, _SimulatedAOBank(self, bank.value)) for bank in Bank)
+        self.__add_analog_output_registers()
+        self.__add_digital_registers()
+        self.__add_bus_registers()
+        self.__add_irq_registers()
+
+    def now(self):
+        """ Return the time, in seconds, since the session was opened. """
+        return time.monotonic() - self.start_time
+
+    def add(self, name, value=0, on_read=None, on_write=None):
+        register = SimulatedRegister(name, value, on_read, on_write)
+        self.registers[name] = register
+        return register
+
+    def add_fifo(self, name, fifo):
+        self.fifos[name] = fifo
+        return fifo
+
+    def __add_analog_output_registers(self):
+        def go(value):
+            for channel in self.ao_value_registers:
+                self.analog_outputs[channel] = self.ao_value_registers[channel].value
+            self.registers['AO.SYS.STAT'].value = not self.registers['AO.SYS.STAT'].value
+
+        self.ao_value_registers = dict(((bank.value, channel.value), self.registers[names._AO_CHANNEL_NAMES[(bank.value, channel.value)]])
+                                       for bank in Bank for channel in AOChannel)
+        self.add('DMA.SYS.RDY', True)
+        self.add('AO.SYS.GO', False, on_write=go)
+        self.add('AO.SYS.STAT', False)
+        self.add('AO.SYNC', False)
+        self.add('SYNC', False)
+
+    def __add_digital_registers(self):
+        def dio_input(bank):
+            def read():
+                direction = self.registers[names._DIO_NAMES[bank].direction].value
+                output = self.registers[names._DIO_NAMES[bank].out].value
+                return (output & direction) | (self.digital_inputs[bank] & ~direction & 0xFFFFF)
+            return read
+
+        for bank in Bank:
+            dio = names._DIO_NAMES[bank.value]
+            self.add(dio.out, 0)
+            self.add(dio.input, on_read=dio_input(bank.value))
+            self.add(dio.direction, 0)
+            self.add(dio.select, 0)
+            for channel in DIOChannel:
+                for name in names._PWM_NAMES[(bank.value, channel.value)][:-1]:
+                    self.add(name, 0)
+            for channel in EncoderChannel:
+                encoder = names._ENCODER_NAMES[(bank.value, channel.value)]
+                self.add(encoder.cnfg, 0)
+                self.add(encoder.cntr, 0)
+                self.add(encoder.stat, 0)
+        self.add('DO.LED3:0', 0)
+        self.add('DI.BTN', False)
+
+    def __add_bus_registers(self):
+        def i2c_go(bank):
+            def go(value):
+                if self.registers[names._I2C_NAMES[bank].addr].value & 1:
+                    data = self.i2c_read_data[bank]
+                    self.registers[names._I2C_NAMES[bank].dati].value = data.pop(0) if data else 0
+            return go
+
+        def spi_go(bank):
+            def go(value):
+                spi = names._SPI_NAMES[bank]
+                self.registers[spi.dati].value = self.registers[spi.dato].value
+                self.assert_irqs([SPI_DONE_IRQ[bank]])
+            return go
+
+        for bank in Bank:
+            i2c = names._I2C_NAMES[bank.value]
+            for name in (i2c.cntr, i2c.cnfg, i2c.addr, i2c.cntl, i2c.dato, i2c.dati):
+                self.add(name, 0)
+            # the transfer completes immediately, so STAT never reports busy
+            self.add(i2c.stat, 0)
+            self.add(i2c.go, False, on_write=i2c_go(bank.value))
+
+            spi = names._SPI_NAMES[bank.value]
+            for name in (spi.cnt, spi.cnfg, spi.dato, spi.dati):
+                self.add(name, 0)
+            self.add(spi.go, False, on_write=spi_go(bank.value))
+
+            self.add('UART.%s.ENA' % bank.value, False)
+            self.add('UART.%s.STAT' % bank.value, 0)
+        self.add('CONSOLE.ENA', True)
+
+    def __add_irq_registers(self):
+        def set_timer(value):
+            # the timer asserts its IRQ once, one interval after SETTIME
+            if value:
+                self.timer_deadline = self.now() + self.registers['IRQ.TIMER.WRITE'].value / 1000000.0
+
+        for name in ('IRQ.DI_BTN.NO', 'IRQ.DI_BTN.CNT'):
+            self.add(name, 0)
+        for name in ('IRQ.DI_BTN.ENA', 'IRQ.DI_BTN.RISE', 'IRQ.DI_BTN.FALL'):
+            self.add(name, False)
+        diirq = names._DIIRQ_NAMES[DIIRQChannel.DIO0.value]
+        for name in (diirq.enable, diirq.rise, diirq.fall):
+            self.add(name, 0)
+        for channel in DIIRQChannel:
+            self.add(names._DIIRQ_NAMES[channel.value].counter, 1)
+            self.add(names._DIIRQ_NAMES[channel.value].irq_number, 0)
+        for channel in AIIRQChannel:
+            aiirq = names._AIIRQ_NAMES[channel.value]
+            self.add(aiirq.irq_number, 0)
+            self.add(aiirq.hysteresis, 0.0)
+            self.add(aiirq.threshold, 0.0)
+        self.add(names._AIIRQ_NAMES[AIIRQChannel.AI0.value].cnfg, 0)
+        self.add('IRQ.TIMER.WRITE', 0)
+        self.add('IRQ.TIMER.SETTIME', False, on_write=set_timer)
+        self.edge_counts = {}
+
+    def analog_source(self, bank, cnfg_element):
+        """
+        Return a function of time which returns the voltage that the AI
+        configuration element measures on the bank, coerced to its range.
+        """
+        channel = cnfg_element & 0x7
+        differential = not (cnfg_element & 0x8)
+        limit = AI_RANGES[(cnfg_element >> 4) & 0x3]
+        source = self.analog_inputs.get((bank, channel, differential), 0.0)
+        if callable(source):
+            return lambda t: max(-limit, min(limit, float(source(t))))
+        value = max(-limit, min(limit, float(source)))
+        return lambda t: value
+
+    def set_analog_input(self, bank, channel, value, differential=False):
+        """
+        Set the voltage on an analog input channel.
+
+        Args:
+            bank (Bank):
+                Specifies the bank of the channel.
+            channel (AIChannel):
+                Specifies the channel.
+            value (float or function):
+                Specifies the voltage, or a function which returns the voltage
+                at the time, in seconds, since the session was opened.
+            differential (bool):
+                Specifies whether to set the differential channel.
+        """
+        bank = bank.value if isinstance(bank, Bank) else bank
+        with self.lock:
+            previous = self.analog_source(bank, int(channel) | (0 if differential else 8))(self.now())
+            self.analog_inputs[(bank, int(channel), differential)] = value
+            current = self.analog_source(bank, int(channel) | (0 if differential else 8))(self.now())
+            if bank == Bank.A.value and not differential and int(channel) in (AIIRQChannel.AI0, AIIRQChannel.AI1):
+                self.__check_analog_irq(int(channel), previous, current)
+
+    def __check_analog_irq(self, channel, previous, current):
+        aiirq = names._AIIRQ_NAMES[channel]
+        cnfg = self.registers[aiirq.cnfg].value >> (2 * channel)
+        if not cnfg & 0x1:
+            return
+        threshold = self.registers[aiirq.threshold].value
+        rising = bool(cnfg & 0x2)
+        if (rising and previous < threshold <= current) or (not rising and previous > threshold >= current):
+            self.assert_irqs([self.registers[aiirq.irq_number].value])
+
+    def set_digital_input(self, bank, channel, level):
+        """
+        Drive a digital input channel. A DI IRQ registered on the channel
+        counts the edge.
+        """
+        bank = bank.value if isinstance(bank, Bank) else bank
+        channel = int(channel)
+        with self.lock:
+            previous = bool(self.digital_inputs[bank] & (1 << channel))
+            if level:
+                self.digital_inputs[bank] |= 1 << channel
+            else:
+                self.digital_inputs[bank] &= ~(1 << channel)
+            if bank == Bank.A.value and channel in list(DIIRQChannel) and previous != bool(level):
+                diirq = names._DIIRQ_NAMES[channel]
+                edge = diirq.rise if level else diirq.fall
+                if self.registers[diirq.enable].value & (1 << channel) and self.registers[edge].value & (1 << channel):
+                    self.__count_edge(('DIO', channel), diirq.counter, diirq.irq_number)
+
+    def press_button(self, pressed=True):
+        """ Press or release the user button. A ButtonIRQ counts the edge. """
+        with self.lock:
+            previous = bool(self.registers['DI.BTN'].value)
+            self.registers['DI.BTN'].value = pressed
+            edge = 'IRQ.DI_BTN.RISE' if pressed else 'IRQ.DI_BTN.FALL'
+            if previous != bool(pressed) and self.registers['IRQ.DI_BTN.ENA'].value and self.registers[edge].value:
+                self.__count_edge('BTN', 'IRQ.DI_BTN.CNT', 'IRQ.DI_BTN.NO')
+
+    def __count_edge(self, key, counter, irq_number):
+        self.edge_counts[key] = self.edge_counts.get(key, 0) + 1
+        if self.edge_counts[key] >= self.registers[counter].value:
+            self.edge_counts[key] = 0
+            self.assert_irqs([self.registers[irq_number].value])
+
+    def set_encoder_count(self, bank, channel, count):
+        """ Set the tick counter of an encoder channel. """
+        bank = bank.value if isinstance(bank, Bank) else bank
+        self.registers[names._ENCODER_NAMES[(bank, int(channel))].cntr].value = count & 0xFFFFFFFF
+
+    def assert_irqs(self, irqs):
+        with self.irq_condition:
+            self.asserted_irqs.update(irqs)
+            self.irq_condition.notify_all()
+
+    def __poll_timed_irqs(self):
+        if self.timer_deadline is not None and self.now() >= self.timer_deadline:
+            self.timer_deadline = None
+            self.asserted_irqs.add(TIMER_IRQ)
+        for bank in self.ao.values():
+            bank.update()
+
+    def wait_on_irqs(self, irqs, timeout):
+        """
+        Wait until any of the IRQs is asserted or the timeout, in
+        milliseconds, expires. A timeout of -1 waits indefinitely.
+        """
+        irqs = [irqs] if isinstance(irqs, int) else list(irqs)
+        deadline = None if timeout < 0 else self.now() + timeout / 1000.0
+        with self.irq_condition:
+            while True:
+                self.__poll_timed_irqs()
+                asserted = [irq for irq in irqs if irq in self.asserted_irqs]
+                if asserted:
+                    return IrqStatus(asserted, False)
+                remaining = None if deadline is None else deadline - self.now()
+                if remaining is not None and remaining <= 0:
+                    return IrqStatus([], True)
+                # timed IRQs are polled, so wake up at least every millisecond
+                self.irq_condition.wait(0.001 if remaining is None else min(remaining, 0.001))
+
+    def acknowledge_irqs(self, irqs):
+        with self.irq_condition:
+            self.asserted_irqs.difference_update(irqs)
+
+    def close(self, reset_if_last_session=False):
+        pass
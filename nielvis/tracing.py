@@ -0,0 +1,225 @@
+"""
+Opt-in counting of the register and FIFO accesses of the NI ELVIS III APIs.
+
+Call enable(), or set the NIELVIS_TRACE environment variable to 1. Every read
+and write of a register or FIFO, including those of the APIs which are
+already open, is then counted per register name and per public API call, for
+example, 'AnalogInput.read'. Use snapshot() to get the counters and reset() to
+clear them.
+"""
+import os
+import time
+import threading
+import weakref
+import functools
+
+# estimated size, in bytes, of one FIFO element, which nifpga transfers as a
+# 64-bit word
+FIFO_ELEMENT_SIZE = 8
+
+
+class AccessStatistics(object):
+    """
+    Counters of the accesses to one register or FIFO, or by one API. seconds
+    is the time spent in the accesses; calls and elapsed are the number and
+    the total duration of the API calls.
+    """
+    __slots__ = ('calls', 'elapsed', 'reads', 'writes', 'bytes', 'seconds')
+
+    def __init__(self):
+        self.calls = 0
+        self.elapsed = 0.0
+        self.reads = 0
+        self.writes = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+    def as_dict(self):
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+
+class Tracer(object):
+    """ Collects the access statistics of all sessions in the process. """
+    def __init__(self):
+        self.enabled = os.environ.get('NIELVIS_TRACE', '0') not in ('', '0')
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.registers = {}
+            self.apis = {}
+            self.call_sites = {}
+
+    def current_api(self):
+        return getattr(self.local, 'api', None)
+
+    def record(self, name, reads, writes, size, seconds):
+        api = self.current_api()
+        with self.lock:
+            for table, key in ((self.registers, name), (self.apis, api), (self.call_sites, (api, name))):
+                statistics = table.get(key)
+                if statistics is None:
+                    statistics = table[key] = AccessStatistics()
+                statistics.reads += reads
+                statistics.writes += writes
+                statistics.bytes += size
+                statistics.seconds += seconds
+
+    def record_call(self, api, seconds):
+        with self.lock:
+            statistics = self.apis.get(api)
+            if statistics is None:
+                statistics = self.apis[api] = AccessStatistics()
+            statistics.calls += 1
+            statistics.elapsed += seconds
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'registers': dict((key, value.as_dict()) for key, value in self.registers.items()),
+                'apis': dict((key, value.as_dict()) for key, value in self.apis.items()),
+                'call_sites': dict((key, value.as_dict()) for key, value in self.call_sites.items()),
+            }
+
+
+tracer = Tracer()
+
+
+# the traced registers and FIFOs which are open, rebound by enable() and
+# disable()
+_handles = weakref.WeakSet()
+_handles_lock = threading.Lock()
+
+
+def _bind_handles(enabled):
+    with _handles_lock:
+        tracer.enabled = enabled
+        for handle in list(_handles):
+            handle.bind(enabled)
+
+
+def enable():
+    """ Count the accesses of the registers and FIFOs from now on. """
+    _bind_handles(True)
+
+
+def disable():
+    """ Stop counting accesses. The counters are kept until reset(). """
+    _bind_handles(False)
+
+
+def reset():
+    """ Clear all counters. """
+    tracer.reset()
+
+
+def snapshot():
+    """
+    Return a copy of the counters.
+
+    Returns:
+        statistics (dict):
+            'registers' maps each register or FIFO name, 'apis' maps each
+            public API call, and 'call_sites' maps each (API call, register
+            name) pair to a dict of calls, elapsed, reads, writes, bytes, and
+            seconds.
+            Accesses outside of a public API call are counted under None.
+    """
+    return tracer.snapshot()
+
+
+def _size_of(value):
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (list, tuple)):
+        return sum(_size_of(element) for element in value)
+    return 8
+
+
+def trace_api(function):
+    """
+    Attribute the register accesses made inside a public API method to the
+    method, for example, 'AnalogInput.read'. Nested API calls are attributed
+    to the outermost call.
+    """
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def traced(*args, **kwargs):
+        if not tracer.enabled or tracer.current_api() is not None:
+            return function(*args, **kwargs)
+        tracer.local.api = name
+        start_time = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            tracer.local.api = None
+            tracer.record_call(name, time.perf_counter() - start_time)
+    return traced
+
+
+class _TracedHandle(object):
+    """
+    A register or FIFO whose read and write are bound directly to the
+    wrapped handle while tracing is disabled, so an access costs no extra
+    call, and to the counting methods while tracing is enabled. enable() and
+    disable() rebind the handles which are already open.
+    """
+    def __init__(self, handle, name):
+        self.handle = handle
+        self.name = name
+        with _handles_lock:
+            _handles.add(self)
+            self.bind(tracer.enabled)
+
+    def bind(self, enabled):
+        for accessor in ('read', 'write'):
+            method = getattr(self.handle, accessor, None)
+            if method is None:
+                # e.g. the host side of a FIFO only reads or only writes
+                continue
+            if enabled:
+                method = getattr(self, 'traced_' + accessor)
+            setattr(self, accessor, method)
+
+    def __getattr__(self, name):
+        return getattr(self.handle, name)
+
+
+class TracedRegister(_TracedHandle):
+    """ A register which counts its reads and writes. """
+    @property
+    def register(self):
+        return self.handle
+
+    def traced_read(self):
+        start_time = time.perf_counter()
+        value = self.handle.read()
+        tracer.record(self.name, 1, 0, _size_of(value), time.perf_counter() - start_time)
+        return value
+
+    def traced_write(self, value):
+        start_time = time.perf_counter()
+        self.handle.write(value)
+        tracer.record(self.name, 0, 1, _size_of(value), time.perf_counter() - start_time)
+
+
+class TracedFifo(_TracedHandle):
+    """ A DMA FIFO which counts the elements it transfers. """
+    @property
+    def fifo(self):
+        return self.handle
+
+    def traced_read(self, number_of_elements, timeout_ms=0):
+        start_time = time.perf_counter()
+        read_values = self.handle.read(number_of_elements, timeout_ms=timeout_ms)
+        tracer.record(self.name, 1, 0, number_of_elements * FIFO_ELEMENT_SIZE, time.perf_counter() - start_time)
+        return read_values
+
+    def traced_write(self, data, timeout_ms=0):
+        start_time = time.perf_counter()
+        empty_elements_remaining = self.handle.write(data, timeout_ms=timeout_ms)
+        tracer.record(self.name, 0, 1, len(data) * FIFO_ELEMENT_SIZE, time.perf_counter() - start_time)
+        return empty_elements_remaining
@@ -0,0 +1,103 @@
+"""
+Timed blocks of analog input samples.
+
+AnalogInput.read() returns one Waveform per bank when return_type is
+'waveform'. A Waveform keeps the time of its first sample and the sample
+period from the tick count of the FPGA, so the samples can be aligned with
+other clocks without repeating the tick arithmetic. This module needs NumPy.
+"""
+import numpy
+
+
+class Waveform(object):
+    """
+    Samples of one or more channels, acquired at the same times.
+
+    Attributes:
+        t0 (number):
+            The time.monotonic() time, in seconds, of the first sample.
+        wall_t0 (number):
+            The time.time() time, in seconds, of the first sample.
+        dt (number):
+            The time, in seconds, between two samples of a channel.
+        channels (list):
+            The description of each row of data, for example, {'bank':
+            Bank.A, 'channel': AIChannel.AI0, 'mode': AIMode.SINGLE_ENDED}.
+        data (ndarray):
+            The values, in an array of shape (channels, samples).
+    """
+    __slots__ = ('t0', 'wall_t0', 'dt', 'channels', 'data')
+
+    def __init__(self, data, dt, t0=0.0, wall_t0=None, channels=None):
+        self.data = data
+        self.dt = dt
+        self.t0 = t0
+        self.wall_t0 = wall_t0
+        self.channels = channels if channels is not None else [{} for row in range(data.shape[0])]
+
+    def __len__(self):
+        return self.data.shape[1]
+
+    @property
+    def duration(self):
+        """ The time, in seconds, that the samples cover. """
+        return len(self) * self.dt
+
+    def times(self):
+        """ Returns the time.monotonic() time of each sample. """
+        return self.t0 + numpy.arange(len(self)) * self.dt
+
+    def __getitem__(self, key):
+        """
+        Returns a Waveform of some of the samples, or of some of the channels
+        and samples with waveform[channels, samples], where channels is an
+        integer or a slice. The data of the result is a view of the data of
+        the waveform, so no values are copied.
+        """
+        rows = slice(None)
+        if isinstance(key, tuple):
+            rows, key = key
+        if not isinstance(key, slice):
+            raise TypeError('Waveform indices must be slices of samples, but given %s' % type(key).__name__)
+        if isinstance(rows, slice):
+            channels = self.channels[rows]
+        elif isinstance(rows, (int, numpy.integer)):
+            channels = [self.channels[rows]]
+        else:
+            # other indices, such as lists of rows, would copy the data
+            raise TypeError('Waveform channel indices must be integers or slices, but given %s' % type(rows).__name__)
+        start, stop, step = key.indices(len(self))
+        data = self.data[rows, key]
+        if data.ndim == 1:
+            data = data[numpy.newaxis, :]
+        offset = start * self.dt
+        return Waveform(data, self.dt * step, self.t0 + offset,
+                        None if self.wall_t0 is None else self.wall_t0 + offset, channels)
+
+    @staticmethod
+    def concatenate(waveforms):
+        """
+        Joins consecutive blocks of the same channels, for example, the
+        blocks of one bank which a continuous acquisition returns, into one
+        Waveform.
+
+        Raises:
+            ValueError:
+                The waveforms are not consecutive blocks of the same channels.
+        """
+        waveforms = list(waveforms)
+        if not waveforms:
+            raise ValueError('concatenate() needs at least one waveform.')
+        first = waveforms[0]
+        end_time = first.t0
+        for waveform in waveforms:
+            if waveform.channels != first.channels or abs(waveform.dt - first.dt) > first.dt * 1e-9:
+                raise ValueError('Only waveforms of the same channels and sample period can be concatenated.')
+            if abs(waveform.t0 - end_time) > first.dt / 2:
+                raise ValueError('The waveforms are not consecutive: a block starts %g s after the end of the previous block.' % (waveform.t0 - end_time))
+            end_time = waveform.t0 + waveform.duration
+        return Waveform(numpy.concatenate([waveform.data for waveform in waveforms], axis=1),
+                        first.dt, first.t0, first.wall_t0, first.channels)
+
+    def __repr__(self):
+        return 'Waveform(%d channels, %d samples, dt=%g, t0=%g)' % (self.data.shape[0], len(self), self.dt, self.t0)
@@ -13,7 +13,9 @@ setup(name="nielvis",
       version='2.2.8',
       packages=find_packages(),
       package_data={'': ['./bitfile/*.lvbitx']},
+      python_requires='>=3.4',
       install_requires=['nifpga', 'pyvisa'],
+      extras_require={'numpy': ['numpy']},
       author='National Instruments',
       author_email="opensource@ni.com",
       maintainer="National Instruments",
@@ -25,9 +27,8 @@ setup(name="nielvis",
         "Intended Audience :: Education",
         "Operating System :: POSIX :: Linux",
         "Programming Language :: Python",
-        "Programming Language :: Python :: 2",
-        "Programming Language :: Python :: 2.7",
         "Programming Language :: Python :: 3",
+        "Programming Language :: Python :: 3 :: Only",
         "Programming Language :: Python :: 3.4",
         "License :: OSI Approved :: MIT License",
         "Natural Language :: English",
@@ -0,0 +1,62 @@
+import asyncio
+import unittest
+import pytest
+
+from tests.simulated import setUpModule, tearDownModule
+from nielvis import AnalogInput, Bank, AIChannel
+from nielvis.asynchronous import AsyncAnalogInput
+
+class Test_AsyncAnalogInput(unittest.TestCase):
+    def setUp(self):
+        self.AI = AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI0},
+                              {'bank': Bank.B, 'channel': AIChannel.AI1})
+        self.AI.session.fpga_session.set_analog_input(Bank.B, AIChannel.AI1, 4.0)
+        self.async_ai = AsyncAnalogInput(self.AI)
+        self.async_ai.start_continuous_mode(1000)
+
+    def tearDown(self):
+        self.AI.stop_continuous_mode()
+        self.AI.close()
+
+    def test_Aread_DoesNotBlockEventLoop(self):
+        ticks = []
+        async def ticker():
+            while True:
+                ticks.append(1)
+                await asyncio.sleep(0.005)
+        async def main():
+            task = asyncio.ensure_future(ticker())
+            value_array = await self.async_ai.aread(50, 1000)
+            task.cancel()
+            return value_array
+        value_array = asyncio.run(main())
+        self.assertEqual(value_array[1][0], pytest.approx([4.0] * 50))
+        self.assertGreater(len(ticks), 5)
+
+    def test_AreadTooLong_RaisesTimeoutError(self):
+        with self.assertRaises(TimeoutError):
+            asyncio.run(self.async_ai.aread(1000, 10))
+
+    def test_CancelStream_StopsAcquisition(self):
+        blocks = []
+        async def consume():
+            async for block in self.async_ai.astream(10):
+                blocks.append(block)
+        async def main():
+            task = asyncio.ensure_future(consume())
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        asyncio.run(main())
+        self.assertGreater(len(blocks), 0)
+        self.assertFalse(self.AI.is_continuous[Bank.A.value])
+
+    def test_CloseStream_StopsAcquisition(self):
+        async def main():
+            stream = self.async_ai.astream(10)
+            async for block in stream:
+                break
+            await stream.aclose()
+        asyncio.run(main())
+        self.assertFalse(self.AI.is_continuous[Bank.A.value])
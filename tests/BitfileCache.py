@@ -0,0 +1,74 @@
+"""
+Checks the on-disk cache of the parsed bitfile. Neither the NI ELVIS III nor
+nifpga is needed; the parser is replaced by a counting one.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from nielvis import session
+
+class ParsedBitfile(object):
+    """ Stands for the nifpga Bitfile, which the cache pickles. """
+    def __init__(self, path):
+        self.filepath = path
+        with open(path, 'rb') as bitfile:
+            self.content = bitfile.read()
+
+class Test_BitfileCache(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_directory = os.path.join(self.directory, 'cache')
+        self.previous_cache_directory = os.environ.get('NIELVIS_CACHE_DIR')
+        os.environ['NIELVIS_CACHE_DIR'] = self.cache_directory
+        self.path = os.path.join(self.directory, 'personality.lvbitx')
+        self.write_bitfile(b'<Bitfile>1</Bitfile>')
+        patcher = mock.patch.object(session, '_parse_bitfile', side_effect=ParsedBitfile)
+        self.parse = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        if self.previous_cache_directory is None:
+            del os.environ['NIELVIS_CACHE_DIR']
+        else:
+            os.environ['NIELVIS_CACHE_DIR'] = self.previous_cache_directory
+        shutil.rmtree(self.directory)
+
+    def write_bitfile(self, content):
+        with open(self.path, 'wb') as bitfile:
+            bitfile.write(content)
+
+    def test_LoadTwice_SecondLoadSkipsParsing(self):
+        parsed = session.load_bitfile(self.path)
+        cached = session.load_bitfile(self.path)
+        self.assertEqual(self.parse.call_count, 1)
+        self.assertIsNot(cached, parsed)
+        self.assertEqual(cached.content, b'<Bitfile>1</Bitfile>')
+        self.assertEqual(len(os.listdir(self.cache_directory)), 1)
+
+    def test_EditBitfile_ParsesNewContent(self):
+        session.load_bitfile(self.path)
+        self.write_bitfile(b'<Bitfile>2</Bitfile>')
+        bitfile = session.load_bitfile(self.path)
+        self.assertEqual(self.parse.call_count, 2)
+        self.assertEqual(bitfile.content, b'<Bitfile>2</Bitfile>')
+
+    def test_CorruptCache_ParsesAgainAndRewritesCache(self):
+        session.load_bitfile(self.path)
+        cache_file = os.path.join(self.cache_directory, os.listdir(self.cache_directory)[0])
+        with open(cache_file, 'wb') as cache:
+            cache.write(b'corrupt')
+        bitfile = session.load_bitfile(self.path)
+        self.assertEqual(self.parse.call_count, 2)
+        self.assertEqual(bitfile.content, b'<Bitfile>1</Bitfile>')
+        session.load_bitfile(self.path)
+        self.assertEqual(self.parse.call_count, 2)
+
+    def test_CopyOfBitfileAtOtherPath_ParsesAgain(self):
+        other_path = os.path.join(self.directory, 'copy.lvbitx')
+        shutil.copyfile(self.path, other_path)
+        session.load_bitfile(self.path)
+        self.assertEqual(session.load_bitfile(other_path).filepath, other_path)
+        self.assertEqual(self.parse.call_count, 2)
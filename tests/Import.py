@@ -0,0 +1,39 @@
+"""
+Checks that importing nielvis stays fast. Set NIELVIS_IMPORT_BUDGET_MS to
+change the budget of the cumulative import time, in milliseconds.
+"""
+import os
+import sys
+import unittest
+import subprocess
+
+package_directory = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+import_budget_ms = float(os.environ.get('NIELVIS_IMPORT_BUDGET_MS', 200))
+lazy_modules = ['pyvisa', 'nifpga', 'numpy']
+
+def run_python(*arguments):
+    return subprocess.run([sys.executable] + list(arguments),
+                          cwd=package_directory,
+                          stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE,
+                          universal_newlines=True,
+                          check=True)
+
+class Test_Import(unittest.TestCase):
+    def test_ImportNielvis_DoesNotImportLazyModules(self):
+        script = 'import sys, nielvis; print(" ".join(sorted(sys.modules)))'
+        imported_modules = run_python('-c', script).stdout.split()
+        for module in lazy_modules:
+            self.assertNotIn(module, imported_modules)
+
+    @unittest.skipIf(sys.version_info < (3, 7), '-X importtime requires Python 3.7')
+    def test_ImportNielvis_CumulativeTimeIsWithinBudget(self):
+        # "import time: self [us] | cumulative | imported package"
+        report = run_python('-X', 'importtime', '-c', 'import nielvis').stderr
+        cumulative_us = None
+        for line in report.splitlines():
+            columns = line.split('|')
+            if len(columns) == 3 and columns[2].strip() == 'nielvis':
+                cumulative_us = int(columns[1])
+        self.assertIsNotNone(cumulative_us)
+        self.assertLess(cumulative_us / 1000.0, import_budget_ms)
@@ -0,0 +1,38 @@
+import unittest
+
+from tests.simulated import setUpModule, tearDownModule
+from nielvis import AnalogInput, I2C, Bank, AIChannel, PollStrategy
+from nielvis import polling
+
+class Test_Polling(unittest.TestCase):
+    def setUp(self):
+        polling.reset()
+
+    def tearDown(self):
+        polling.configure(PollStrategy.SPIN_THEN_YIELD, timeout=10.0)
+        polling.reset()
+
+    def test_WaitUntil_ReturnsTrueValue(self):
+        values = iter([0, 0, 0, 5])
+        self.assertEqual(polling.wait_until(lambda: next(values), 'counter'), 5)
+        self.assertEqual(polling.snapshot()['counter']['iterations'], 4)
+
+    def test_WaitUntilNeverTrue_RaisesPollTimeoutError(self):
+        for strategy in PollStrategy:
+            with self.assertRaises(polling.PollTimeoutError):
+                polling.wait_until(lambda: False, 'never', timeout=0.01, strategy=strategy)
+        self.assertEqual(polling.snapshot()['never']['timeouts'], len(PollStrategy))
+
+    def test_ReadNSamples_CountsRegisterWaits(self):
+        polling.configure(PollStrategy.BACKOFF)
+        with AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI0}) as AI:
+            AI.read(10, 1000)
+        statistics = polling.snapshot()
+        self.assertEqual(statistics['AI.A.STAT']['waits'], 1)
+        self.assertEqual(statistics['AI.A.STAT']['timeouts'], 0)
+
+    def test_I2CWriteWithStuckBus_ReturnsAfterTimeout(self):
+        with I2C(Bank.A) as i2c:
+            i2c.stat = type('StuckStat', (object,), {'read': lambda self: 1})()
+            i2c.write(0x53, [0x00], keep_bus_busy=False, timeout_ms=10)
+        self.assertEqual(polling.snapshot()['I2C.STAT']['timeouts'], 1)
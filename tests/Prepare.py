@@ -0,0 +1,77 @@
+import time
+import array
+import unittest
+import pytest
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from tests.simulated import setUpModule, tearDownModule
+from nielvis import AnalogInput, Bank, AIChannel
+from nielvis import tracing
+
+class Test_PreparedAcquisition(unittest.TestCase):
+    def setUp(self):
+        tracing.reset()
+        tracing.enable()
+        self.AI = AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI0},
+                              {'bank': Bank.B, 'channel': AIChannel.AI1})
+        self.simulator = self.AI.session.fpga_session
+        self.simulator.set_analog_input(Bank.A, AIChannel.AI0, 1.5)
+        self.simulator.set_analog_input(Bank.B, AIChannel.AI1, -2.5)
+        self.task = self.AI.prepare(100, 10000)
+
+    def tearDown(self):
+        self.AI.close()
+        tracing.disable()
+        tracing.reset()
+
+    def test_Acquire_ReturnsValuesOfRead(self):
+        value_array = self.task.acquire()
+        self.assertEqual(value_array[0][0], pytest.approx([1.5] * 100))
+        self.assertEqual(value_array[1][0], pytest.approx([-2.5] * 100))
+        self.assertEqual(value_array, self.AI.read(100, 10000))
+
+    def test_AcquireRepeatedly_ConfiguresBankOnce(self):
+        for index in range(3):
+            self.task.acquire()
+        registers = tracing.snapshot()['registers']
+        self.assertEqual(registers['AI.A.CNFG']['writes'], 1)
+        self.assertEqual(registers['AI.A.CNT']['writes'], 1 + 2 * 3)
+
+    def test_AcquireAfterSinglePointRead_ReconfiguresBank(self):
+        self.task.acquire()
+        self.assertEqual(self.AI.read(), pytest.approx([1.5, -2.5]))
+        buffer = array.array('d', [0.0] * 200)
+        self.assertEqual(self.task.acquire_into(buffer), 100)
+        self.assertEqual(list(buffer), pytest.approx([1.5] * 100 + [-2.5] * 100))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_AcquireRecords_ReturnsConsecutiveRecords(self):
+        records = []
+        with self.AI.acquire_records(100, 10000, 4) as pipeline:
+            for record in pipeline:
+                # the processing of a record overlaps the next acquisition
+                time.sleep(0.005)
+                records.append((record.index, record.start_time, record.gap, list(record.values[:, -1])))
+        # both banks scan one channel at 2000 ticks
+        duration = 100 * 2000 / 40e6
+        self.assertEqual(self.task.duration, pytest.approx(duration))
+        self.assertEqual([record[0] for record in records], [0, 1, 2, 3])
+        self.assertIsNone(records[0][2])
+        for previous, record in zip(records, records[1:]):
+            # the records do not overlap
+            self.assertGreaterEqual(record[2], 0)
+            self.assertGreaterEqual(record[1] - previous[1], duration * 0.99)
+        self.assertEqual(records[3][3], pytest.approx([1.5, -2.5]))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_ReadDuringRecords_RaisesUntilPipelineStops(self):
+        with self.AI.acquire_records(100, 10000) as pipeline:
+            next(pipeline)
+            with self.assertRaises(AssertionError):
+                self.AI.read(100, 10000)
+            with self.assertRaises(AssertionError):
+                self.task.acquire()
+        self.assertEqual(self.AI.read(), pytest.approx([1.5, -2.5]))
@@ -0,0 +1,110 @@
+import unittest
+import pytest
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from tests.simulated import setUpModule, tearDownModule
+from nielvis import AnalogInput, Bank, AIChannel
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class Test_Decimation(unittest.TestCase):
+    def test_DecimateInBlocks_EqualsDecimatingAtOnce(self):
+        from nielvis.processing import Decimator
+        signal = numpy.random.RandomState(0).standard_normal((2, 20000))
+        whole, position = Decimator(100, 2).process(signal)
+        decimator = Decimator(100, 2)
+        parts = [decimator.process(signal[:, start:start + 777])[0] for start in range(0, 20000, 777)]
+        self.assertEqual(whole.shape, (2, 200))
+        self.assertTrue(numpy.allclose(numpy.concatenate(parts, axis=1), whole))
+
+    def test_Decimate_KeepsPassbandAndRejectsAliases(self):
+        from nielvis.processing import Decimator
+        time = numpy.arange(200000) / 100000.0
+        signal = numpy.vstack((numpy.sin(2 * numpy.pi * 10 * time), numpy.sin(2 * numpy.pi * 5050 * time)))
+        outputs, position = Decimator(1000, 2).process(signal)
+        # skip the start-up of the filters
+        self.assertGreater(numpy.abs(outputs[0, 20:]).max(), 0.95)
+        self.assertLess(numpy.abs(outputs[1, 20:]).max(), 0.01)
+
+    def test_MultiRateStageOnStream_EmitsEachChannelAtItsRate(self):
+        from nielvis.processing import MultiRateStage
+        with AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI0},
+                         {'bank': Bank.A, 'channel': AIChannel.AI1}) as AI:
+            AI.session.fpga_session.set_analog_input(Bank.A, AIChannel.AI1, 4.0)
+            stage = MultiRateStage(10000, [10000, 100])
+            AI.start_continuous_mode(10000)
+            blocks = []
+            for block in AI.stream(1000, return_type='waveform'):
+                blocks.append(stage.process(block[0]))
+                if len(blocks) == 5:
+                    AI.stop_continuous_mode()
+        fast, slow = blocks[-1]
+        self.assertEqual(len(fast), 1000)
+        self.assertEqual(len(slow), 10)
+        self.assertEqual(slow.dt, pytest.approx(fast.dt * 100))
+        self.assertEqual(list(slow.data[0]), pytest.approx([4.0] * 10))
+
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class Test_RunningStatistics(unittest.TestCase):
+    def test_UpdateInBlocks_EqualsStatisticsOfAllSamples(self):
+        from nielvis.processing import RunningStatistics
+        signal = numpy.random.RandomState(0).standard_normal((3, 10000)) + [[0.0], [5.0], [-2.0]]
+        statistics = RunningStatistics(3)
+        for start in range(0, 10000, 777):
+            statistics.update(signal[:, start:start + 777])
+        snapshot = statistics.snapshot()
+        self.assertEqual(snapshot['count'], 10000)
+        self.assertTrue(numpy.allclose(snapshot['mean'], signal.mean(axis=1)))
+        self.assertTrue(numpy.allclose(snapshot['std'], signal.std(axis=1)))
+        self.assertTrue(numpy.allclose(snapshot['rms'], numpy.sqrt((signal ** 2).mean(axis=1))))
+        self.assertTrue(numpy.allclose(snapshot['peak_to_peak'], signal.max(axis=1) - signal.min(axis=1)))
+
+    def test_Window_CoversTheLastBlocks(self):
+        from nielvis.processing import RunningStatistics
+        statistics = RunningStatistics(1, window=200)
+        for value in range(5):
+            statistics.update(numpy.full((1, 100), float(value)))
+        snapshot = statistics.snapshot()
+        self.assertEqual(snapshot['count'], 200)
+        self.assertEqual(list(snapshot['min']), [3.0])
+        self.assertEqual(list(snapshot['mean']), [3.5])
+
+    def test_WindowOfBlocksOfVaryingSizes_EqualsStatisticsOfTheLastBlocks(self):
+        from nielvis.processing import RunningStatistics
+        random_state = numpy.random.RandomState(1)
+        statistics = RunningStatistics(2, window=1000)
+        blocks = []
+        for index in range(60):
+            blocks.append(random_state.standard_normal((2, random_state.randint(1, 300))) * (index + 1))
+            statistics.update(blocks[-1])
+            # the window keeps the newest blocks which hold window samples
+            window = [blocks[-1]]
+            for block in reversed(blocks[:-1]):
+                if sum(kept.shape[1] for kept in window) >= 1000:
+                    break
+                window.insert(0, block)
+            signal = numpy.concatenate(window, axis=1)
+            snapshot = statistics.snapshot()
+            self.assertEqual(snapshot['count'], signal.shape[1])
+            self.assertTrue(numpy.allclose(snapshot['mean'], signal.mean(axis=1)))
+            self.assertTrue(numpy.allclose(snapshot['std'], signal.std(axis=1)))
+            self.assertTrue(numpy.allclose(snapshot['min'], signal.min(axis=1)))
+            self.assertTrue(numpy.allclose(snapshot['max'], signal.max(axis=1)))
+
+    def test_StatisticsOfStream_ReportEachChannel(self):
+        from nielvis.processing import RunningStatistics
+        with AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI0},
+                         {'bank': Bank.A, 'channel': AIChannel.AI1}) as AI:
+            AI.session.fpga_session.set_analog_input(Bank.A, AIChannel.AI1, 4.0)
+            statistics = RunningStatistics(2)
+            AI.start_continuous_mode(10000)
+            for index, block in enumerate(statistics.apply(AI.stream(1000, return_type='numpy'))):
+                if index == 2:
+                    AI.stop_continuous_mode()
+        snapshot = statistics.snapshot()
+        self.assertEqual(snapshot['count'], 3000)
+        self.assertEqual(snapshot['mean'][1], pytest.approx(4.0))
+        self.assertEqual(snapshot['peak_to_peak'][1], pytest.approx(0.0, abs=1e-6))
@@ -0,0 +1,83 @@
+"""
+Hardware setup:
+  1. Connect AI2 and +3.3V on connector A.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import pytest
+
+from nielvis import AnalogInput, DigitalInputOutput, LEDs, Led, PWM, Bank, AIChannel, DIOChannel
+from nielvis import session
+
+class Test_SharedSession(unittest.TestCase):
+    def test_OpenMultipleAPIs_ShareOneSession(self):
+        ai = AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI2})
+        dio = DigitalInputOutput(Bank.A, [DIOChannel.DIO0])
+        led = LEDs()
+
+        self.assertIs(ai.session, dio.session)
+        self.assertIs(ai.session, led.session)
+        self.assertEqual(ai.session.reference_count, 3)
+
+        led.close()
+        dio.close()
+        ai.close()
+        self.assertEqual(session._sessions, {})
+
+    def test_CloseOneAPI_OtherAPIsKeepWorking(self):
+        ai = AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI2})
+        led = LEDs()
+        led.write(Led.LED0, True)
+        led.close()
+
+        value_array = ai.read()
+        self.assertEqual(value_array[0], pytest.approx(3.3, 0.1))
+        ai.close()
+
+    def test_CloseTwice_ReleasesSessionOnce(self):
+        first = LEDs()
+        second = LEDs()
+        first.close()
+        first.close()
+        self.assertEqual(second.session.reference_count, 1)
+        second.close()
+
+
+class Test_RegisterMap(unittest.TestCase):
+    def test_OpenSameChannelTwice_ReusesRegisterHandles(self):
+        first = PWM(Bank.A, DIOChannel.DIO13)
+        second = PWM(Bank.A, DIOChannel.DIO13)
+        self.assertIs(first.cs, second.cs)
+        self.assertIs(first.session.register_map.pwm(Bank.A, DIOChannel.DIO13).cmp, first.cmp)
+        second.close()
+        first.close()
+
+
+class Test_BitfileCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_directory = tempfile.mkdtemp()
+        os.environ['NIELVIS_CACHE_DIR'] = self.cache_directory
+        self.path = os.path.join(os.path.dirname(os.path.abspath(session.__file__)), 'bitfile/ELVIS III v2.1 FPGA.lvbitx')
+
+    def tearDown(self):
+        del os.environ['NIELVIS_CACHE_DIR']
+        shutil.rmtree(self.cache_directory)
+
+    def test_LoadBitfileTwice_SecondLoadReadsCache(self):
+        parsed = session.load_bitfile(self.path)
+        self.assertEqual(len(os.listdir(self.cache_directory)), 1)
+
+        cached = session.load_bitfile(self.path)
+        self.assertEqual(sorted(cached.registers.keys()), sorted(parsed.registers.keys()))
+        self.assertEqual(sorted(cached.fifos.keys()), sorted(parsed.fifos.keys()))
+
+    def test_CorruptCache_ParsesBitfileAgain(self):
+        session.load_bitfile(self.path)
+        cache_file = os.path.join(self.cache_directory, os.listdir(self.cache_directory)[0])
+        with open(cache_file, 'wb') as cache:
+            cache.write(b'corrupt')
+
+        bitfile = session.load_bitfile(self.path)
+        self.assertIn('DI.BTN', bitfile.registers)
@@ -0,0 +1,39 @@
+import unittest
+
+from tests.simulated import setUpModule, tearDownModule
+from nielvis import LEDs, Led
+from nielvis import tracing
+
+class Test_ShadowCache(unittest.TestCase):
+    def setUp(self):
+        tracing.reset()
+        tracing.enable()
+        self.LED = LEDs()
+        self.LED.session.enable_shadow_cache()
+
+    def tearDown(self):
+        self.LED.session.enable_shadow_cache(False)
+        self.LED.close()
+        tracing.disable()
+        tracing.reset()
+
+    def test_WriteLEDTwice_ReadsRegisterOnce(self):
+        self.LED.write(Led.LED1, True)
+        self.LED.write(Led.LED2, True)
+        statistics = tracing.snapshot()['registers']['DO.LED3:0']
+        self.assertEqual(statistics['reads'], 1)
+        self.assertEqual(statistics['writes'], 2)
+        self.assertEqual(self.LED.session.fpga_session.registers['DO.LED3:0'].read(), 0x6)
+
+    def test_WriteUnchangedValue_SkipsWrite(self):
+        self.LED.write(Led.LED1, True)
+        self.LED.write(Led.LED1, True)
+        self.assertEqual(tracing.snapshot()['registers']['DO.LED3:0']['writes'], 1)
+        self.assertEqual(self.LED.session.shadow_cache.skipped_writes, 1)
+
+    def test_Invalidate_ReadsRegisterAgain(self):
+        self.LED.write(Led.LED1, True)
+        self.LED.session.fpga_session.registers['DO.LED3:0'].write(0x8)
+        self.LED.session.invalidate_shadow_cache('DO.LED3:0')
+        self.LED.write(Led.LED0, True)
+        self.assertEqual(self.LED.session.fpga_session.registers['DO.LED3:0'].read(), 0x9)
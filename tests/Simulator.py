@@ -0,0 +1,369 @@
+import os
+import sys
+import time
+import array
+import tempfile
+import unittest
+from unittest import mock
+import threading
+import pytest
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from tests.simulated import setUpModule, tearDownModule
+from nielvis import AnalogInput, AnalogOutput, DigitalInputOutput, Encoder, LEDs, Led, PWM, I2C, SPI, Button, ButtonIRQ, DIIRQ, TimerIRQ
+from nielvis import Bank, AIChannel, AIRange, AIMode, AOChannel, DIOChannel, EncoderChannel, DIIRQChannel, IRQNumber
+from nielvis.simulator import SimulatedSession, SimulatedAIFifo
+
+class Test_Simulator_AnalogInput(unittest.TestCase):
+    def setUp(self):
+        self.AI = AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI2},
+                              {'bank': Bank.A, 'channel': AIChannel.AI1, 'mode': AIMode.DIFFERENTIAL},
+                              {'bank': Bank.B, 'channel': AIChannel.AI7, 'range': AIRange.PLUS_OR_MINUS_2V})
+        self.simulator = self.AI.session.fpga_session
+        self.simulator.set_analog_input(Bank.A, AIChannel.AI2, 3.3)
+        self.simulator.set_analog_input(Bank.A, AIChannel.AI1, -1.5, differential=True)
+        self.simulator.set_analog_input(Bank.B, AIChannel.AI7, 5.0)
+
+    def tearDown(self):
+        self.AI.close()
+
+    def test_OpenWithSimulatorBackend_UsesSimulatedSession(self):
+        self.assertIsInstance(self.simulator, SimulatedSession)
+
+    def test_ReadSinglePoint_ReturnInputsCoercedToRange(self):
+        self.assertEqual(self.AI.read(), pytest.approx([3.3, -1.5, 2.0]))
+
+    def test_ReadSinglePointAgain_SkipsReconfiguration(self):
+        self.AI.read()
+        start_time = time.time()
+        for index in range(100):
+            self.AI.read()
+        self.assertLess(time.time() - start_time, 0.5)
+
+    def test_ReadSinglePointWithRangePerChannel_CoercesEachChannel(self):
+        with AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI4, 'range': AIRange.PLUS_OR_MINUS_2V},
+                         {'bank': Bank.A, 'channel': AIChannel.AI5}) as AI:
+            self.simulator.set_analog_input(Bank.A, AIChannel.AI4, 5.0)
+            self.simulator.set_analog_input(Bank.A, AIChannel.AI5, 5.0)
+            self.assertEqual(AI.read(), pytest.approx([2.0, 5.0]))
+
+    def test_ReadSinglePointAfterNSamples_ReconfiguresBank(self):
+        self.AI.read(10, 1000)
+        self.assertEqual(self.AI.read(), pytest.approx([3.3, -1.5, 2.0]))
+
+    def test_ReadNSamplesOfTwoBanks_ReusesOneWorkerUntilClose(self):
+        def bank_workers():
+            return [thread for thread in threading.enumerate() if thread.name == 'AIBankWorker']
+        number_of_workers = len(bank_workers())
+        with AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI0},
+                         {'bank': Bank.B, 'channel': AIChannel.AI0}) as AI:
+            AI.read(10, 1000)
+            AI.read(10, 1000)
+            self.assertEqual(len(bank_workers()), number_of_workers + 1)
+        self.assertEqual(len(bank_workers()), number_of_workers)
+
+    def test_ReadNSamples_ReturnSamplesOfEachChannelPerBank(self):
+        value_array = self.AI.read(100, 10000)
+        self.assertEqual(len(value_array), 2)
+        self.assertEqual(value_array[0][0], pytest.approx([3.3] * 100))
+        self.assertEqual(value_array[0][1], pytest.approx([-1.5] * 100))
+        self.assertEqual(value_array[1][0], pytest.approx([2.0] * 100))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_ReadNSamplesAsNumPy_ReturnChannelsBySamplesArray(self):
+        value_array = self.AI.read(100, 10000, return_type='numpy')
+        self.assertEqual(value_array.shape, (3, 100))
+        self.assertEqual(value_array.dtype, numpy.float64)
+        self.assertEqual(list(value_array[:, 0]), pytest.approx([3.3, -1.5, 2.0]))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_ReadNSamplesAsNumPy_ScalesRawWords(self):
+        with mock.patch.object(SimulatedAIFifo, 'read', side_effect=AssertionError('read the values one by one')):
+            value_array = self.AI.read(100, 10000, return_type='numpy')
+        self.assertEqual(list(value_array[:, 0]), pytest.approx([3.3, -1.5, 2.0], abs=1e-3))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_ReadContinuousAsNumPy_ReturnChannelsBySamplesArray(self):
+        self.AI.start_continuous_mode(1000)
+        value_array = self.AI.read(50, -1, return_type='numpy')
+        self.AI.stop_continuous_mode()
+        self.assertEqual(value_array.shape, (3, 50))
+        self.assertEqual(list(value_array[2]), pytest.approx([2.0] * 50))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_ReadNSamplesAsRaw_ReturnIntegerCodesWhichConvertToVolts(self):
+        codes = self.AI.read(100, 10000, return_type='raw')
+        self.assertEqual(codes.shape, (3, 100))
+        self.assertEqual(codes.dtype, numpy.int32)
+        self.assertLess(codes[1][0], 0)
+        self.assertEqual(list(self.AI.to_volts(codes[:, 0])), pytest.approx([3.3, -1.5, 2.0], abs=1e-5))
+        self.assertEqual(self.AI.raw_format().to_volts(codes).dtype, numpy.float64)
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_ReadRawFromNifpgaFixedPointFifo_ReadsWordsInOneCall(self):
+        from nielvis.session import read_raw_fifo, fixed_point_format
+
+        class FixedPointType(object):
+            _signed = True
+            _word_length = 24
+            _integer_word_length = 5
+
+        class FixedPointFifo(object):
+            # the attributes of a nifpga FIFO of <+/-24,5> elements
+            datatype = 'Fxp'
+            name = 'AI.A.DMA'
+
+            def __init__(self, words):
+                self._type = FixedPointType()
+                self._session = 1
+                self._number = 0
+                self.words = words
+                self.calls = 0
+
+            def _read_func(self, session, number, data, number_of_elements, timeout_ms, elements_remaining):
+                self.calls += 1
+                for index in range(number_of_elements):
+                    data[index] = self.words[index]
+                elements_remaining.value = len(self.words) - number_of_elements
+
+        # 1 V, -1 LSB, and -16 V with the overflow status bit
+        fifo = FixedPointFifo([1 << 19, (1 << 24) - 1, (1 << 24) | (1 << 23)])
+        words, elements_remaining = read_raw_fifo(fifo, 3, 100)
+        self.assertEqual(fifo.calls, 1)
+        self.assertEqual(words.dtype, numpy.uint64)
+        self.assertEqual(elements_remaining, 0)
+        fixed_point = fixed_point_format(fifo)
+        self.assertEqual(list(fixed_point.to_codes(words)), [1 << 19, -1, -(1 << 23)])
+        self.assertEqual(list(fixed_point.to_volts(fixed_point.to_codes(words))), [1.0, -2.0 ** -19, -16.0])
+
+    def test_RawFormatOfFloatingPointFifo_RaisesTypeError(self):
+        from nielvis.session import fixed_point_format, supports_raw_reads
+
+        class FloatingPointFifo(object):
+            datatype = 'Sgl'
+            name = 'AI.A.DMA'
+
+        self.assertFalse(supports_raw_reads(FloatingPointFifo()))
+        with self.assertRaises(TypeError):
+            fixed_point_format(FloatingPointFifo())
+
+    def test_ReadNSamplesIntoArray_FillsChannelsInOrder(self):
+        buffer = array.array('d', [0.0] * 300)
+        self.assertEqual(self.AI.read_into(buffer, 100, 10000), 100)
+        self.assertEqual(list(buffer), pytest.approx([3.3] * 100 + [-1.5] * 100 + [2.0] * 100))
+
+    def test_ReadNSamplesIntoArrayWithoutNumPy_FillsChannelsInOrder(self):
+        buffer = array.array('d', [0.0] * 300)
+        with mock.patch.dict(sys.modules, {'numpy': None}):
+            self.assertEqual(self.AI.read_into(buffer, 100, 10000), 100)
+        self.assertEqual(list(buffer), pytest.approx([3.3] * 100 + [-1.5] * 100 + [2.0] * 100))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_ReadNSamplesIntoNumPyAcrossChunks_FillsEachRow(self):
+        with AnalogInput({'bank': Bank.B, 'channel': AIChannel.AI0},
+                         {'bank': Bank.B, 'channel': AIChannel.AI1},
+                         {'bank': Bank.B, 'channel': AIChannel.AI2}) as AI:
+            for channel, value in enumerate([1.0, 2.0, 3.0]):
+                self.simulator.set_analog_input(Bank.B, channel, value)
+            buffer = numpy.zeros((3, 5000))
+            AI.read_into(buffer, 5000, 100000)
+        self.assertEqual(list(buffer[:, -1]), pytest.approx([1.0, 2.0, 3.0]))
+        self.assertTrue((buffer[1] == buffer[1][0]).all())
+
+    def test_ReadContinuousIntoArray_FillsChannelsInOrder(self):
+        buffer = array.array('d', [0.0] * 150)
+        self.AI.start_continuous_mode(1000)
+        self.AI.read_into(buffer, 50, -1)
+        self.AI.stop_continuous_mode()
+        self.assertEqual(list(buffer[100:]), pytest.approx([2.0] * 50))
+
+    def test_ReadNSamplesAboveTenThousand_ReturnAllSamples(self):
+        with AnalogInput({'bank': Bank.B, 'channel': AIChannel.AI7}) as AI:
+            value_array = AI.read(25000, 200000)
+        self.assertEqual(len(value_array[0][0]), 25000)
+        self.assertEqual(value_array[0][0][-1], pytest.approx(5.0))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_ReadNSamplesToFile_WritesMemoryMappedArray(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'record.npy')
+            self.assertEqual(self.AI.read_to_file(filename, 12000, 200000), 12000)
+            values = numpy.load(filename, mmap_mode='r')
+            self.assertEqual(values.shape, (3, 12000))
+            self.assertEqual(list(values[:, -1]), pytest.approx([3.3, -1.5, 2.0]))
+            del values
+
+    def test_ReadNSamples_TakesTheAcquisitionTime(self):
+        # bank A acquires 2000 elements at 30 kS/s, which takes at least
+        # 66 ms, and bank B is drained at the same time
+        start_time = time.time()
+        self.AI.read(1000, 10000)
+        self.assertGreaterEqual(time.time() - start_time, 0.06)
+
+    def test_ReadContinuous_ReturnRequestedSamples(self):
+        self.AI.start_continuous_mode(1000)
+        value_array = self.AI.read(50, -1)
+        self.AI.stop_continuous_mode()
+        self.assertEqual(len(value_array[0][0]), 50)
+        self.assertEqual(value_array[1][0], pytest.approx([2.0] * 50))
+
+    def test_StartContinuous_SizesBufferFromRateAndLatency(self):
+        self.AI.configure_dma(latency=2.0)
+        self.AI.start_continuous_mode(10000)
+        time.sleep(0.01)
+        status = self.AI.dma_status()
+        self.AI.stop_continuous_mode()
+        # 2 elements per scan at 10 kS/s hold 2 s in 40,000 elements
+        self.assertEqual(status['A']['depth'], 40000)
+        self.assertGreater(status['A']['elements'], 0)
+        self.assertEqual(status['A']['fill_level'], status['A']['elements'] / 40000.0)
+
+    def test_ConfigureDmaDepth_OverridesAutomaticDepth(self):
+        self.AI.start_continuous_mode(1000)
+        self.AI.stop_continuous_mode()
+        self.assertEqual(AnalogInput.dma_depth['B'], AnalogInput.minimum_dma_depth)
+        self.AI.configure_dma(depth=50000)
+        self.AI.read(10, 1000)
+        self.assertEqual(AnalogInput.dma_depth['B'], 50000)
+
+    def test_StreamContinuous_YieldsBlocksUntilStopped(self):
+        self.AI.start_continuous_mode(1000)
+        blocks = []
+        for block in self.AI.stream(20):
+            blocks.append(block)
+            if len(blocks) == 3:
+                self.AI.stop_continuous_mode()
+        self.assertEqual(len(blocks), 3)
+        self.assertEqual(blocks[2][1][0], pytest.approx([2.0] * 20))
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_StreamReleasedBlock_IsReused(self):
+        self.AI.start_continuous_mode(1000)
+        stream = self.AI.stream(20, return_type='numpy')
+        first_block = next(stream)
+        stream.release(first_block)
+        second_block = next(stream)
+        self.AI.stop_continuous_mode()
+        self.assertIs(second_block, first_block)
+        self.assertEqual(second_block.shape, (3, 20))
+        self.assertEqual(stream.channels[1], {'bank': Bank.A, 'channel': AIChannel.AI1, 'mode': AIMode.DIFFERENTIAL})
+
+    def test_StreamAfterOverflow_RaisesOverflowError(self):
+        self.AI.start_continuous_mode(1000)
+        stream = self.AI.stream(20)
+        self.AI.dma['A'].configure(10)
+        time.sleep(0.05)
+        with self.assertRaises(OverflowError):
+            next(stream)
+        self.AI.stop_continuous_mode()
+
+    @unittest.skipIf(numpy is None, 'NumPy is not installed')
+    def test_BackgroundReader_DrainsIntoRingBuffer(self):
+        self.AI.start_continuous_mode(10000)
+        with self.AI.start_background_reader(0.05) as reader:
+            time.sleep(0.1)
+            latest = reader.latest(100)
+            values, cursor = reader.read_since(0)
+        self.AI.stop_continuous_mode()
+        self.assertEqual(latest.shape, (3, 100))
+        self.assertEqual(list(latest[:, -1]), pytest.approx([3.3, -1.5, 2.0]))
+        self.assertEqual(values.shape[1], reader.capacity)
+        statistics = reader.statistics()
+        self.assertGreaterEqual(statistics['drained_samples'], cursor)
+        self.assertEqual(statistics['missed_samples'], cursor - reader.capacity)
+        self.assertIsNone(reader.error)
+
+    def test_ReadSignalFunction_ReturnTimeVaryingValues(self):
+        self.simulator.set_analog_input(Bank.A, AIChannel.AI3, lambda t: t)
+        with AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI3}) as AI:
+            value_array = AI.read(100, 1000)
+        samples = value_array[0][0]
+        self.assertEqual(samples[1] - samples[0], pytest.approx(0.001, rel=0.01))
+
+class Test_Simulator_AnalogOutput(unittest.TestCase):
+    def test_WriteSinglePoint_UpdatesOutput(self):
+        with AnalogOutput({'bank': Bank.A, 'channel': AOChannel.AO0}) as AO:
+            AO.write(2.5)
+            self.assertEqual(AO.session.fpga_session.analog_outputs[('A', 0)], 2.5)
+
+    def test_WriteNSamples_ReturnsAfterGeneration(self):
+        with AnalogOutput({'bank': Bank.A, 'channel': AOChannel.AO0}) as AO:
+            start_time = time.time()
+            AO.write([0.1] * 1000, 10000)
+            self.assertGreaterEqual(time.time() - start_time, 0.09)
+
+    def test_StartContinuousWithLongWaveform_SizesBufferForWaveform(self):
+        with AnalogOutput({'bank': Bank.A, 'channel': AOChannel.AO0}) as AO:
+            AO.start_continuous_mode([[0.5] * 50000], 1000, 1000)
+            self.assertGreaterEqual(AnalogOutput.dma_depth['A'], 50000)
+            AO.stop_continuous_mode()
+
+class Test_Simulator_Digital(unittest.TestCase):
+    def test_WriteAndReadDIO_ReturnsWrittenAndDrivenLevels(self):
+        with DigitalInputOutput(Bank.A, [DIOChannel.DIO0, DIOChannel.DIO1]) as DIO:
+            DIO.session.fpga_session.set_digital_input(Bank.A, DIOChannel.DIO1, True)
+            DIO.write(True, [DIOChannel.DIO0])
+            self.assertEqual(DIO.read([DIOChannel.DIO0, DIOChannel.DIO1]), [1, 1])
+
+    def test_WriteLED_UpdatesRegister(self):
+        with LEDs() as LED:
+            LED.write(Led.LED2, True)
+            self.assertEqual(LED.leds.read(), 0x4)
+
+    def test_GeneratePWM_WritesCounterRegisters(self):
+        with PWM(Bank.A, DIOChannel.DIO13) as pwm:
+            pwm.generate(1000, 0.5)
+            self.assertEqual(pwm.cmp.read(), pwm.max.read() // 2)
+
+    def test_ReadEncoder_ReturnsSignedCount(self):
+        with Encoder(Bank.A, EncoderChannel.ENC0) as encoder:
+            encoder.session.fpga_session.set_encoder_count(Bank.A, EncoderChannel.ENC0, -5)
+            self.assertEqual(encoder.read()[0], -5)
+
+    def test_ReadButton_ReturnsButtonState(self):
+        with Button() as button:
+            button.session.fpga_session.press_button()
+            self.assertTrue(button.read())
+            button.session.fpga_session.press_button(False)
+
+class Test_Simulator_Bus(unittest.TestCase):
+    def test_I2CRead_ReturnsDeviceData(self):
+        with I2C(Bank.A) as i2c:
+            i2c.session.fpga_session.i2c_read_data['A'].extend([0xE5, 0x01])
+            i2c.write(0x53, [0x00])
+            self.assertEqual(i2c.read(0x53, 2), [0xE5, 0x01])
+
+    def test_SPIWriteRead_ReturnsLoopbackData(self):
+        with SPI(1000000, Bank.A) as spi:
+            self.assertEqual(spi.writeread([0x12, 0xAB]), ['12', 'ab'])
+
+class Test_Simulator_IRQ(unittest.TestCase):
+    def setUp(self):
+        self.called = False
+
+    def irq_handler(self):
+        self.called = True
+
+    def test_TimerIRQ_CallsCallback(self):
+        with TimerIRQ(self.irq_handler, 10000) as timer_irq:
+            timer_irq.wait()
+        self.assertTrue(self.called)
+
+    def test_ButtonIRQ_CallsCallbackOnPress(self):
+        with ButtonIRQ(self.irq_handler, IRQNumber.IRQ2, 2000) as button_irq:
+            simulator = button_irq.session.fpga_session
+            threading.Timer(0.1, simulator.press_button).start()
+            button_irq.irq_wait(button_irq.timeout, button_irq.irq_number)
+            simulator.press_button(False)
+        self.assertTrue(self.called)
+
+    def test_DIIRQ_CallsCallbackAfterEdgeCount(self):
+        with DIIRQ(DIIRQChannel.DIO1, self.irq_handler, IRQNumber.IRQ3, 2000, edge_count=2) as di_irq:
+            simulator = di_irq.session.fpga_session
+            for level in [True, False, True]:
+                simulator.set_digital_input(Bank.A, DIIRQChannel.DIO1, level)
+            di_irq.irq_wait(di_irq.timeout, di_irq.irq_number)
+        self.assertTrue(self.called)
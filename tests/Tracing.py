@@ -0,0 +1,65 @@
+import unittest
+
+from tests.simulated import setUpModule, tearDownModule
+from nielvis import AnalogInput, LEDs, Led, PWM, Bank, AIChannel, DIOChannel
+from nielvis import tracing
+
+class Test_Tracing(unittest.TestCase):
+    def setUp(self):
+        tracing.reset()
+        tracing.enable()
+
+    def tearDown(self):
+        tracing.disable()
+        tracing.reset()
+
+    def test_ReadNSamples_CountsRegisterAndFifoAccessesPerAPI(self):
+        with AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI0}) as AI:
+            AI.read(100, 1000)
+        statistics = tracing.snapshot()
+
+        read_statistics = statistics['apis']['AnalogInput.read']
+        self.assertEqual(read_statistics['calls'], 1)
+        self.assertGreater(read_statistics['reads'], 0)
+        self.assertGreater(read_statistics['writes'], 0)
+        self.assertGreater(read_statistics['elapsed'], 0)
+        self.assertEqual(statistics['call_sites'][('AnalogInput.read', 'AI.A.DMA')]['bytes'], 100 * tracing.FIFO_ELEMENT_SIZE)
+        self.assertIn('AI.A.CNFG', statistics['registers'])
+
+    def test_WriteLED_CountsOneReadAndOneWrite(self):
+        with LEDs() as LED:
+            tracing.reset()
+            LED.write(Led.LED1, True)
+        statistics = tracing.snapshot()
+        self.assertEqual(statistics['call_sites'][('LEDs.write', 'DO.LED3:0')]['reads'], 1)
+        self.assertEqual(statistics['call_sites'][('LEDs.write', 'DO.LED3:0')]['writes'], 1)
+
+    def test_Reset_ClearsCounters(self):
+        with LEDs() as LED:
+            LED.write(Led.LED1, True)
+        tracing.reset()
+        self.assertEqual(tracing.snapshot(), {'registers': {}, 'apis': {}, 'call_sites': {}})
+
+    def test_Disable_StopsCounting(self):
+        with LEDs() as LED:
+            tracing.disable()
+            tracing.reset()
+            LED.write(Led.LED1, True)
+        self.assertEqual(tracing.snapshot()['registers'], {})
+
+    def test_EnableAfterOpen_CountsAccessesOfOpenSession(self):
+        tracing.disable()
+        with PWM(Bank.A, DIOChannel.DIO3) as pwm:
+            tracing.enable()
+            pwm.generate(1000, 0.5)
+        statistics = tracing.snapshot()
+        self.assertEqual(statistics['call_sites'][('PWM.generate', 'PWM.A_3.CMP')]['writes'], 1)
+        self.assertEqual(statistics['call_sites'][('PWM.generate', 'PWM.A_3.CS')]['writes'], 1)
+
+    def test_Disabled_AccessesTheFifoDirectly(self):
+        tracing.disable()
+        with AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI0}) as AI:
+            fifo = AI.session.fifos['AI.A.DMA']
+            self.assertEqual(fifo.read, fifo.fifo.read)
+            tracing.enable()
+            self.assertNotEqual(fifo.read, fifo.fifo.read)
@@ -0,0 +1,48 @@
+import unittest
+
+from tests.simulated import setUpModule, tearDownModule
+from nielvis import PWM, Bank, DIOChannel
+from nielvis import tracing
+
+class Test_Transaction(unittest.TestCase):
+    def setUp(self):
+        self.pwm = PWM(Bank.A, DIOChannel.DIO13)
+        self.session = self.pwm.session
+
+    def tearDown(self):
+        self.pwm.close()
+
+    def test_StageTwice_WritesLastValueInFirstPosition(self):
+        written = []
+        class Register(object):
+            def __init__(self, name):
+                self.name = name
+            def write(self, value):
+                written.append((self.name, value))
+        first, second = Register('FIRST'), Register('SECOND')
+        with self.session.transaction() as transaction:
+            transaction.write(first, 1)
+            transaction.write(second, 2)
+            transaction.write(first, 3)
+        self.assertEqual(written, [('FIRST', 3), ('SECOND', 2)])
+
+    def test_ExceptionInBlock_DiscardsWrites(self):
+        with self.assertRaises(ValueError):
+            with self.session.transaction() as transaction:
+                transaction.write(self.pwm.cmp, 1234)
+                raise ValueError()
+        self.assertNotEqual(self.pwm.cmp.read(), 1234)
+
+    def test_CommitWithVerify_ReadsBackOnce(self):
+        tracing.reset()
+        tracing.enable()
+        try:
+            cmp = self.session.registers['PWM.A_13.CMP']
+            with self.session.transaction(verify=True) as transaction:
+                transaction.write(cmp, 100)
+            statistics = tracing.snapshot()['registers']['PWM.A_13.CMP']
+        finally:
+            tracing.disable()
+            tracing.reset()
+        self.assertEqual(statistics['writes'], 1)
+        self.assertEqual(statistics['reads'], 1)
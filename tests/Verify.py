@@ -0,0 +1,69 @@
+import unittest
+import threading
+import pytest
+
+from tests.simulated import setUpModule, tearDownModule
+from nielvis import AnalogInput, Bank, AIChannel, VerifyPolicy
+from nielvis import tracing
+
+class Test_VerifyPolicy(unittest.TestCase):
+    def setUp(self):
+        self.AI = AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI0})
+        self.AI.session.fpga_session.set_analog_input(Bank.A, AIChannel.AI0, 1.25)
+        self.session = self.AI.session
+        self.session.verifications = 0
+        self.session.skipped_verifications = 0
+
+    def tearDown(self):
+        self.session.configure_verification(VerifyPolicy.ALWAYS, 0)
+        self.AI.close()
+
+    def test_PolicyAlways_VerifiesEveryRead(self):
+        self.AI.read(10, 1000)
+        self.AI.read(10, 1000)
+        self.assertEqual(self.session.verifications, 4)
+        self.assertEqual(self.session.skipped_verifications, 0)
+
+    def test_PolicyOnce_VerifiesFirstReadOnly(self):
+        self.session.configure_verification(VerifyPolicy.ONCE)
+        self.AI.read(10, 1000)
+        value_array = self.AI.read(10, 1000)
+        self.assertEqual(self.session.verifications, 2)
+        self.assertEqual(self.session.skipped_verifications, 2)
+        self.assertEqual(value_array[0][0], pytest.approx([1.25] * 10))
+
+    def test_PolicyNeverWithSampling_VerifiesSampledWrites(self):
+        self.session.configure_verification(VerifyPolicy.NEVER, sample_interval=2)
+        self.AI.read(10, 1000)
+        self.AI.read(10, 1000)
+        self.assertEqual(self.session.verifications, 2)
+        self.assertEqual(self.session.skipped_verifications, 4)
+
+    def test_PolicyNever_StillWaitsForReadyStatus(self):
+        self.session.configure_verification(VerifyPolicy.NEVER)
+        tracing.reset()
+        tracing.enable()
+        try:
+            self.assertEqual(self.AI.read(), pytest.approx([1.25]))
+        finally:
+            tracing.disable()
+        statistics = tracing.snapshot()
+        tracing.reset()
+        self.assertEqual(self.session.verifications, 0)
+        self.assertGreater(statistics['call_sites'][('AnalogInput.read', 'AI.A.VAL.RDY')]['reads'], 0)
+        self.assertNotIn(('AnalogInput.read', 'AI.A.CNFG'), [key for key, value in statistics['call_sites'].items() if value['reads']])
+
+    def test_VerifyFromThreads_CountsEveryVerification(self):
+        self.session.configure_verification(VerifyPolicy.NEVER, sample_interval=3)
+
+        def __verify():
+            for index in range(3000):
+                self.session.verify(lambda: True, 'AI.A.CNT')
+
+        workers = [threading.Thread(target=__verify) for index in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.session.skipped_verifications, 12000)
+        self.assertEqual(self.session.verifications, 4000)
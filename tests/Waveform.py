@@ -0,0 +1,63 @@
+import unittest
+import pytest
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from tests.simulated import setUpModule, tearDownModule
+from nielvis import AnalogInput, Bank, AIChannel, AIMode
+
+@unittest.skipIf(numpy is None, 'NumPy is not installed')
+class Test_Waveform(unittest.TestCase):
+    def setUp(self):
+        self.AI = AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI0},
+                              {'bank': Bank.A, 'channel': AIChannel.AI1},
+                              {'bank': Bank.B, 'channel': AIChannel.AI2})
+        self.AI.session.fpga_session.set_analog_input(Bank.B, AIChannel.AI2, 4.0)
+
+    def tearDown(self):
+        self.AI.stop_continuous_mode()
+        self.AI.close()
+
+    def test_ReadNSamplesAsWaveform_ReturnsPeriodOfEachBank(self):
+        waveform_a, waveform_b = self.AI.read(100, 10000, return_type='waveform')
+        # 3 channels at 10 kS/s are 1333 ticks per element, and each bank
+        # scans its own channels
+        self.assertEqual(waveform_a.dt, pytest.approx(2 * 1333 / 40e6))
+        self.assertEqual(waveform_b.dt, pytest.approx(1333 / 40e6))
+        self.assertEqual(waveform_a.data.shape, (2, 100))
+        self.assertEqual(waveform_b.channels, [{'bank': Bank.B, 'channel': AIChannel.AI2, 'mode': AIMode.SINGLE_ENDED}])
+        self.assertEqual(list(waveform_b.data[0]), pytest.approx([4.0] * 100))
+
+    def test_ConcatenateContinuousBlocks_JoinsConsecutiveBlocks(self):
+        self.AI.start_continuous_mode(1000)
+        blocks = [self.AI.read(20, -1, return_type='waveform')[1] for index in range(3)]
+        self.assertEqual(blocks[1].t0, pytest.approx(blocks[0].t0 + 20 * blocks[0].dt))
+        waveform = blocks[0].concatenate(blocks)
+        self.assertEqual(len(waveform), 60)
+        self.assertEqual(waveform.t0, blocks[0].t0)
+        with self.assertRaises(ValueError):
+            blocks[0].concatenate([blocks[0], blocks[2]])
+
+    def test_SliceWaveform_SharesDataAndShiftsTime(self):
+        waveform = self.AI.read(100, 10000, return_type='waveform')[0]
+        part = waveform[1, 10:50:2]
+        self.assertTrue(numpy.shares_memory(part.data, waveform.data))
+        self.assertEqual(part.data.shape, (1, 20))
+        self.assertEqual(part.t0, pytest.approx(waveform.t0 + 10 * waveform.dt))
+        self.assertEqual(part.dt, pytest.approx(2 * waveform.dt))
+        self.assertEqual(part.channels, waveform.channels[1:])
+        with self.assertRaises(TypeError):
+            waveform[[0, 1], :]
+
+    def test_ReadContinuous_TimesFirstSampleAtStart(self):
+        with AnalogInput({'bank': Bank.A, 'channel': AIChannel.AI3}) as AI:
+            simulator = AI.session.fpga_session
+            AI.start_continuous_mode(1000)
+            # the time.monotonic() time at which the simulated bank started
+            start_time = simulator.start_time + simulator.ai['A'].start_time
+            waveform = AI.read(10, -1, return_type='waveform')[0]
+            AI.stop_continuous_mode()
+        self.assertLessEqual(waveform.t0, start_time)
+        self.assertLess(start_time - waveform.t0, 0.1)
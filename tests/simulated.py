@@ -0,0 +1,24 @@
+"""
+Shared setup of the test modules which run against the in-process simulator
+of the FPGA personality, so no hardware is needed. Import the module fixtures
+into a test module with
+
+    from tests.simulated import setUpModule, tearDownModule
+
+The simulator backend is selected only while the tests of the module run, so
+the hardware tests which run in the same process still open the target.
+"""
+import os
+
+_previous_backends = []
+
+def setUpModule():
+    _previous_backends.append(os.environ.get('NIELVIS_BACKEND'))
+    os.environ['NIELVIS_BACKEND'] = 'simulator'
+
+def tearDownModule():
+    previous_backend = _previous_backends.pop()
+    if previous_backend is None:
+        del os.environ['NIELVIS_BACKEND']
+    else:
+        os.environ['NIELVIS_BACKEND'] = previous_backend